@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         bench_parser.py
+# Description:  PiDbCard parser benchmark (lines/sec) on bundled data
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pypirccua.pidbcard import PiDbCard
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+#
+# class LegacyPiDbCard - reference regex-per-line relay parser (pre tokenizer)
+#
+class LegacyPiDbCard(PiDbCard):
+
+    def parse_file(self):
+        """Parse the file and populate card_data."""
+        with open(self.file_path, "r") as file:
+            for line_no, line in enumerate(file):
+                line = line.strip()
+                if not line or line.startswith("H") or line.startswith("E"):
+                    continue
+
+                prefix = line[0]
+                if prefix == "P":
+                    self.parse_header(line, line_no)
+                elif prefix == "G":
+                    self.parse_generation(line, line_no)
+                elif prefix == "A":
+                    self.parse_architecture(line, line_no)
+                elif prefix == "S":
+                    self.parse_subunits(line, line_no)
+                elif prefix == "R":
+                    self.parse_relay(line, line_no)
+
+        return self.card_data
+
+    def parse_relay(self, line, line_no):
+        """Parse the relay line."""
+        match = re.match(r"R;([LP]);([SL][0-9]+)BIT([0-9]+);([0-9]+)", line)
+        if match:
+            layer_type, subunit_or_layer, bit, count = match.groups()
+            bit, count = int(bit), int(count)
+
+            if layer_type == "L":
+                subunit_id = int(re.sub(r"[^0-9]", "", subunit_or_layer))
+                for subunit in self.card_data["subunits"]:
+                    if subunit["layer_id"] == subunit_id:
+                        cols = subunit["cols"]
+                        row, col = (bit - 1) // cols, (bit - 1) % cols
+                        subunit["relays"][(row, col)] = count
+                        self.line_mapping[line_no] = {"type": "logical", "row": row, "col": col}
+                        break
+
+            elif layer_type == "P":
+                loop_id = int(re.sub(r"[^0-9]", "", subunit_or_layer))
+                for loop in self.card_data["physical_layers"]:
+                    if loop["loop_id"] == loop_id:
+                        loop["relays"][(bit - 1, 0)] = count
+                        self.line_mapping[line_no] = {"type": "physical", "row": bit - 1, "col": 0}
+                        break
+
+def count_lines(file_path):
+    """Count lines of the file."""
+    with open(file_path, "rb") as file:
+        return sum(1 for _ in file)
+
+def bench(card_class, file_path, repeat):
+    """Return the best wall time of parsing the file."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        card_class(file_path).parse_file()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="PiDbCard parser benchmark")
+    parser.add_argument("files", nargs="*", help="DB files (default: bundled pypirccua/data)")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs per file (best is taken)")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(DATA_DIR, "*.db")))
+
+    print(f"{'File':<40} {'Lines':>7} {'Before l/s':>12} {'After l/s':>12} {'Speedup':>8}")
+    print("-" * 83)
+    for file_path in files:
+        lines = count_lines(file_path)
+        before = bench(LegacyPiDbCard, file_path, args.repeat)
+        after = bench(PiDbCard, file_path, args.repeat)
+        name = os.path.basename(file_path)
+        print(f"{name:<40} {lines:>7} {lines / before:>12,.0f} {lines / after:>12,.0f} {before / after:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
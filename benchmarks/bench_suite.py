@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         bench_suite.py
+# Description:  Benchmark suite of the parser, cli and table view hot paths (JSON results)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# the table view runs headless
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+
+import pypirccua
+from pypirccua import pidbreader
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pirccli import pirc_stats_lines, pirc_generate_stats
+from pypirccua.pidbsynth import write_synth_file
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+# synthetic cards, name -> (subunit geometries, physical loop allocations)
+SYNTHETIC_CARDS = {
+    "synthetic-100k": ([(400, 250)], [64] * 8),
+}
+
+# a result is reported as slower when its median grows by more than this factor
+DEFAULT_THRESHOLD = 1.25
+
+def measure(func, repeat, setup=None):
+    """Return the wall times (s) of repeated calls, setup runs untimed before each."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def summary(times, **extra):
+    result = {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "repeat": len(times),
+    }
+    result.update(extra)
+    return result
+
+def count_lines(file_path):
+    with open(file_path, "rb") as file:
+        return sum(1 for _ in file)
+
+def drop_readers():
+    """Forget the shared readers, the next parse maps and scans the file again."""
+    with pidbreader.open_readers_lock:
+        pidbreader.open_readers.clear()
+
+def bench_parser(files, repeat):
+    """parse_file of a file opened for the first time (cold) and of a reader already open (warm)."""
+    results = {}
+    for name, file_path in files.items():
+        lines = count_lines(file_path)
+        times = measure(lambda: PiDbCard(file_path).parse_file(), repeat, setup=drop_readers)
+        results[f"parse_file[{name}]"] = summary(times, lines=lines, lines_per_sec=lines / statistics.median(times))
+        times = measure(lambda: PiDbCard(file_path).parse_file(), repeat)
+        results[f"parse_file_warm[{name}]"] = summary(times, lines=lines, lines_per_sec=lines / statistics.median(times))
+    return results
+
+def bench_cli(files, repeat):
+    results = {}
+    for name, file_path in files.items():
+        data = PiDbCard(file_path).parse_file()
+        results[f"pirc_stats_lines[{name}]"] = summary(measure(lambda: pirc_stats_lines(file_path, data), repeat))
+
+        def generate_stats():
+            with redirect_stdout(io.StringIO()):
+                pirc_generate_stats(file_path)
+        results[f"pirc_generate_stats[{name}]"] = summary(measure(generate_stats, repeat))
+    return results
+
+def bench_table_view(files, repeat):
+    """populate_tabs (lazy) and building every tab, then reload_heatmap over all tables."""
+    from PyQt5.QtWidgets import QApplication
+    from pypirccua.heatmaprange import HeatMapRange
+    from pypirccua.pitableview import PiTableView
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    heatmap = HeatMapRange()
+    view = PiTableView(heatmap)
+    view.resize(1200, 800)
+    view.show()
+
+    results = {}
+    for name, file_path in files.items():
+        view.parsed_data = PiDbCard(file_path).parse_file()
+
+        def populate():
+            view.populate_tabs()
+            app.processEvents()
+
+        def populate_all():
+            populate()
+            for index in range(view.tab_widget.count()):
+                view.tab_widget.setCurrentIndex(index)
+                app.processEvents()
+
+        results[f"populate_tabs[{name}]"] = summary(measure(populate, repeat))
+        results[f"populate_all_tabs[{name}]"] = summary(measure(populate_all, max(1, repeat // 4)))
+
+        ranges = iter([[1000 + i, 100000 + i] for i in range(repeat)])
+
+        def reload():
+            view.reload_heatmap(next(ranges))
+            app.processEvents()
+
+        results[f"reload_heatmap[{name}]"] = summary(measure(reload, repeat), tables=len(view.tables))
+
+    view.close()
+    return results
+
+def environment():
+    """Describe the versions the results were measured with."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "pypirccua": pypirccua.__version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def compare(results, baseline, threshold):
+    """Print the median ratio against a baseline, return the slower benchmarks."""
+    slower = []
+    print(f"{'Benchmark':<60} {'Baseline':>10} {'Current':>10} {'Ratio':>7}")
+    print("-" * 90)
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        flag = " SLOWER" if ratio > threshold else ""
+        print(f"{name:<60} {base['median'] * 1000:>8.2f}ms {result['median'] * 1000:>8.2f}ms {ratio:>6.2f}x{flag}")
+        if ratio > threshold:
+            slower.append(name)
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description="pypirccua benchmark suite")
+    parser.add_argument("-o", "--output", default=None, help="Path of the JSON results (default: stdout)")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs per benchmark")
+    parser.add_argument("--compare", default=None, help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Slowdown factor reported as a regression")
+    parser.add_argument("--no-gui", action="store_true", help="Skip the table view benchmarks")
+    parser.add_argument("--no-synthetic", action="store_true", help="Skip the synthetic large cards")
+    args = parser.parse_args()
+
+    files = {os.path.basename(path): path for path in sorted(glob.glob(os.path.join(DATA_DIR, "*.db")))}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if not args.no_synthetic:
+            for name, (geometries, loops) in SYNTHETIC_CARDS.items():
+                file_path = os.path.join(temp_dir, f"{name}.db")
+                write_synth_file(file_path, geometries, loops, seed=0)
+                files[name] = file_path
+
+        results = {}
+        results.update(bench_parser(files, args.repeat))
+        results.update(bench_cli(files, args.repeat))
+        if not args.no_gui:
+            results.update(bench_table_view(files, args.repeat))
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        slower = compare(results, baseline, args.threshold)
+        if slower:
+            print(f"{len(slower)} benchmarks slower than {args.threshold:.2f}x the baseline", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
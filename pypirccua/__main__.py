@@ -24,15 +24,19 @@
 
 import sys
 import argparse
+import cProfile
 
-from PyQt5.QtWidgets import QApplication
-from .pircviewer import PircViewer
 from .pirccli import *
+from .pidbsynth import DISTRIBUTIONS
+from .piprofiler import profiler, PROFILE_ENV
 
 def main():
     """Main entry point for the pypirccua application."""
     
     parser = argparse.ArgumentParser(description="pypirccua utility")
+    parser.add_argument("--profile", action="store_true", help=f"Print timers and counters of the hot paths (or set {PROFILE_ENV}=1)")
+    parser.add_argument("--profile-json", default=None, help="Save the profile timers and counters as JSON (implies --profile)")
+    parser.add_argument("--cprofile", default=None, help="Dump cProfile statistics (pstats) of the whole run into a file")
     subparsers = parser.add_subparsers(dest="command")
     
     # stats cmd
@@ -44,19 +48,149 @@ def main():
     export_parser.add_argument("file", help="Path to the DB file")
     export_parser.add_argument("output", help="Path to save the exported statistics")
 
+    # fleet command
+    fleet_parser = subparsers.add_parser("fleet", help="Generate statistics for all DB files in a directory or glob")
+    fleet_parser.add_argument("target", help="Directory (searched recursively) or glob pattern of DB files")
+    fleet_parser.add_argument("-o", "--output", help="Path to save the CSV report (default: stdout)")
+    fleet_parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+
+    # convert command
+    convert_parser = subparsers.add_parser("convert", help="Convert DB files into the compact binary format (*.pirc)")
+    convert_parser.add_argument("target", help="DB file, directory (searched recursively) or glob pattern")
+    convert_parser.add_argument("-o", "--output-dir", help="Directory of the converted files (default: next to the DB file)")
+
+    # inventory command
+    inventory_parser = subparsers.add_parser("inventory", help="Catalogue the card headers of a directory tree (sidecar index)")
+    inventory_parser.add_argument("target", help="Directory of the card files (searched recursively)")
+    inventory_parser.add_argument("-o", "--index", default=None, help="Path of the index (default: .pypirccua-inventory.json in the directory)")
+    inventory_parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker threads")
+    inventory_parser.add_argument("--list", action="store_true", help="Write the catalogued cards as CSV to stdout")
+
+    # watch command
+    watch_parser = subparsers.add_parser("watch", help="Watch a folder for new dumps, stream statistics and alerts as NDJSON")
+    watch_parser.add_argument("target", help="Directory of the dumps (watched recursively)")
+    watch_parser.add_argument("--ok-level", type=int, default=100000, help="Relays above this count raise a warning (default: 100000)")
+    watch_parser.add_argument("--warning-level", type=int, default=100000000, help="Relays above this count are critical (default: 100000000)")
+    watch_parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    watch_parser.add_argument("--poll", action="store_true", help="Poll instead of inotify (network shares)")
+    watch_parser.add_argument("--interval", type=float, default=2.0, help="Polling interval in seconds (default: 2)")
+    watch_parser.add_argument("--initial", action="store_true", help="Also report the dumps already in the folder")
+    watch_parser.add_argument("-o", "--output", help="Append the NDJSON records to a file (default: stdout)")
+
+    # diff command
+    diff_parser = subparsers.add_parser("diff", help="Compare two snapshots of the same card")
+    diff_parser.add_argument("file_a", help="Path to the older DB file")
+    diff_parser.add_argument("file_b", help="Path to the newer DB file")
+    diff_parser.add_argument("-n", "--top", type=int, default=10, help="Number of fastest wearing relays to list")
+    diff_parser.add_argument("--days", type=float, default=None, help="Days between the snapshots (default: file modification times)")
+
+    # history command
+    history_parser = subparsers.add_parser("history", help="Relay count history of card snapshots")
+    history_parser.add_argument("--db", default=None, help="Path to the history database (default: per-user data directory)")
+    history_commands = history_parser.add_subparsers(dest="history_command", required=True)
+    ingest_parser = history_commands.add_parser("ingest", help="Add new snapshots from a DB file, directory or glob")
+    ingest_parser.add_argument("target", help="DB file, directory (searched recursively) or glob pattern")
+    history_commands.add_parser("cards", help="List the known cards")
+    above_parser = history_commands.add_parser("above", help="Relays of the latest snapshots above a count")
+    above_parser.add_argument("min_count", type=int, help="Minimum relay count")
+    above_parser.add_argument("-n", "--limit", type=int, default=None, help="Maximum number of relays")
+    growth_parser = history_commands.add_parser("growth", help="Relay count growth over the last days")
+    growth_parser.add_argument("--days", type=float, default=90, help="Window in days (default: 90)")
+    growth_parser.add_argument("-n", "--limit", type=int, default=None, help="Maximum number of relays")
+    series_parser = history_commands.add_parser("series", help="Count series of one relay")
+    series_parser.add_argument("card_id", help="Card ID")
+    series_parser.add_argument("card_sn", help="Card serial number")
+    series_parser.add_argument("layer", choices=["L", "P"], help="Logical or physical layer")
+    series_parser.add_argument("layer_id", type=int, help="Subunit or loop id")
+    series_parser.add_argument("bit", type=int, help="Relay bit as in the R; record")
+
+    # forecast command
+    forecast_parser = subparsers.add_parser("forecast", help="Forecast the days until relays reach their rated life")
+    forecast_parser.add_argument("--db", default=None, help="Path to the history database (default: per-user data directory)")
+    forecast_parser.add_argument("--limit", type=int, default=None, help="Rated life of a relay in cycles (default: 100000000)")
+    forecast_parser.add_argument("--card", nargs=2, metavar=("CARD_ID", "CARD_SN"), default=None, help="Forecast a single card")
+    forecast_parser.add_argument("-o", "--output", help="Path to save the CSV report (default: stdout)")
+
+    # synth command
+    synth_parser = subparsers.add_parser("synth", help="Generate synthetic DB files for load testing")
+    synth_parser.add_argument("output", help="Path of the generated DB file ('-' for stdout)")
+    synth_parser.add_argument("-g", "--geometry", action="append", default=None, help="Subunit geometry ROWSxCOLS, repeatable (default: 12x12)")
+    synth_parser.add_argument("-s", "--subunits", type=int, default=None, help="Number of subunits, geometries are cycled (default: one per geometry)")
+    synth_parser.add_argument("--loops", type=int, default=0, help="Number of physical loops")
+    synth_parser.add_argument("--loop-size", type=int, default=64, help="Relays per physical loop")
+    synth_parser.add_argument("-c", "--cards", type=int, default=1, help="Number of concatenated cards")
+    synth_parser.add_argument("--seed", type=int, default=None, help="Random seed (reproducible output)")
+    synth_parser.add_argument("-d", "--distribution", choices=DISTRIBUTIONS, default="uniform", help="Relay count distribution")
+    synth_parser.add_argument("--max-count", type=int, default=1000000, help="Maximum relay count")
+    synth_parser.add_argument("--fill", type=float, default=1.0, help="Fraction of relays with a count record")
+    synth_parser.add_argument("--card-id", default="40-000-SYNTH", help="Card ID of the header")
+    synth_parser.add_argument("--generation", type=int, default=1, help="Card generation")
+
 	# args
     args = parser.parse_args()
+    if args.profile or args.profile_json:
+        profiler.enable()
+
+    runner = cProfile.Profile() if args.cprofile else None
+    if runner:
+        runner.enable()
+    try:
+        status = run_command(args, parser)
+    finally:
+        if runner:
+            runner.disable()
+            runner.dump_stats(args.cprofile)
+            print(f"cProfile statistics saved to {args.cprofile}", file=sys.stderr)
+        if profiler.enabled:
+            print("\n".join(profiler.summary_lines()), file=sys.stderr)
+            if args.profile_json:
+                profiler.save_json(args.profile_json)
+    sys.exit(status)
+
+def run_command(args, parser):
+    """Run the selected command, returns the exit status."""
     if args.command == "help":
         parser.print_help()
     elif args.command == "stats":
         pirc_generate_stats(args.file)
     elif args.command == "export-stats":
         pirc_export_stats(args.file, args.output)
+    elif args.command == "fleet":
+        return pirc_fleet_stats(args.target, args.output, args.workers)
+    elif args.command == "convert":
+        return pirc_convert(args.target, args.output_dir)
+    elif args.command == "inventory":
+        return pirc_inventory(args.target, args.index, args.workers, args.list)
+    elif args.command == "watch":
+        return pirc_watch(
+            args.target, [args.ok_level, args.warning_level], args.workers, args.poll, args.interval, args.initial, args.output
+        )
+    elif args.command == "diff":
+        return pirc_diff(args.file_a, args.file_b, args.top, args.days)
+    elif args.command == "synth":
+        return pirc_synth(
+            args.output, args.geometry or ["12x12"], args.subunits, args.loops, args.loop_size, args.cards, args.seed,
+            args.distribution, args.max_count, args.fill, args.card_id, args.generation,
+        )
+    elif args.command == "forecast":
+        return pirc_forecast(args.db, args.limit, args.output, args.card)
+    elif args.command == "history":
+        if args.history_command == "ingest":
+            return pirc_history_ingest(args.target, args.db)
+        return pirc_history_report(args.history_command, args.db, **{
+            key: value for key, value in vars(args).items()
+            if key not in ("command", "history_command", "db", "profile", "profile_json", "cprofile")
+        })
     else:
+        # the GUI stack is only imported for the viewer
+        from PyQt5.QtWidgets import QApplication
+        from .pircviewer import PircViewer
+
         app = QApplication(sys.argv)
         viewer = PircViewer()
         viewer.show()
-        sys.exit(app.exec_())
+        return app.exec_()
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -23,8 +23,33 @@
 """
 
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QSpinBox, QPushButton, QSplitter
-from PyQt5.QtGui import QColor
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtGui import QColor, QBrush
+from PyQt5.QtCore import pyqtSignal, QTimer
+
+import numpy as np
+
+# heatmap levels
+LEVEL_NO_COUNT = 0
+LEVEL_OK = 1
+LEVEL_WARNING = 2
+LEVEL_CRITICAL = 3
+
+# heatmap level colors
+HEATMAP_COLORS = [
+    (128, 128, 128),    # gray for no count
+    (0, 255, 0),        # green for ok Level
+    (255, 255, 0),      # yellow for warning Level
+    (255, 0, 0),        # red for critical Level
+]
+
+# shared brushes (index by level), one per level instead of one per cell
+HEATMAP_BRUSHES = [QBrush(QColor(*color)) for color in HEATMAP_COLORS]
+
+# days to limit heatmap ranges (critical, warning) of the forecast view
+FORECAST_RANGES = [90, 365]
+
+# spinner changes are emitted after this idle time (ms)
+RANGE_CHANGED_DELAY = 150
 
 # helper func
 def get_heatmap_color(value, ranges):
@@ -38,6 +63,21 @@ def get_heatmap_color(value, ranges):
     else:
         return QColor(255, 0, 0)        # red for critical Level
 
+def heatmap_levels(counts, ranges):
+    """Classify a count array into heatmap levels (vectorized get_heatmap_color)."""
+    levels = np.full(counts.shape, LEVEL_OK, dtype=np.uint8)
+    levels += counts > ranges[0]
+    levels += counts > max(ranges[0], ranges[1])
+    levels[counts == 0] = LEVEL_NO_COUNT
+    return levels
+
+def days_levels(days, ranges):
+    """Classify days to limit into heatmap levels, ranges are (critical, warning) days."""
+    levels = np.full(days.shape, LEVEL_CRITICAL, dtype=np.uint8)
+    levels -= days > ranges[0]
+    levels -= days > max(ranges[0], ranges[1])
+    return levels
+
 #
 # class HeatMapRange
 #
@@ -73,9 +113,19 @@ class HeatMapRange(QWidget):
         self.layout.addWidget(QLabel("Warning Level (Max)"))
         self.layout.addWidget(self.warning_spinner)
 
+        # debounce spinner ticks, the heatmap is recolored once the value settles
+        self.range_timer = QTimer(self)
+        self.range_timer.setSingleShot(True)
+        self.range_timer.setInterval(RANGE_CHANGED_DELAY)
+        self.range_timer.timeout.connect(self.emit_range_changed)
+
         # connect signals
-        self.ok_spinner.valueChanged.connect(self.emit_range_changed)
-        self.warning_spinner.valueChanged.connect(self.emit_range_changed)
+        self.ok_spinner.valueChanged.connect(self.schedule_range_changed)
+        self.warning_spinner.valueChanged.connect(self.schedule_range_changed)
+
+    def schedule_range_changed(self):
+        """(Re)start the debounce timer of range_changed."""
+        self.range_timer.start()
 
     def emit_range_changed(self):
         """Emit signal with updated ranges."""
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbarchive.py
+# Description:  Compressed (gz, xz, bz2, zst) and archived (zip, tar) card files
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .piprofiler import profiler
+
+from contextlib import contextmanager, ExitStack
+import threading
+import io
+import os
+
+# zipfile, tarfile and the decompressors are imported when a file needs them,
+# plain *.db files never load them
+
+# 'archive.zip::rack1/card.db' names a card inside an archive
+MEMBER_SEPARATOR = "::"
+
+# magic bytes of the compressed streams (zstd needs the optional zstandard package)
+COMPRESSION_MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+MAGIC_BYTES = max(len(magic) for magic, _ in COMPRESSION_MAGIC)
+ZIP_MAGIC = b"PK\x03\x04"
+TAR_MAGIC = b"ustar"
+TAR_MAGIC_OFFSET = 257
+
+# a compressed tar up to this size is decompressed once for all its members
+TAR_CACHE_BYTES = 256 * 1024 * 1024
+
+# file names picked up by the batch commands
+CARD_SUFFIXES = (".db", ".pirc")
+COMPRESSED_SUFFIXES = (".gz", ".xz", ".bz2", ".zst")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tgz", ".tar.gz", ".tar.xz", ".tar.bz2", ".tar.zst")
+
+def split_member(path):
+    """Return (file path, member name or None) of a card path."""
+    file_path, separator, member = path.partition(MEMBER_SEPARATOR)
+    return file_path, member if separator else None
+
+def member_path(archive_path, member):
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+def source_path(path):
+    """Return the file on disk behind a card path (the archive of a member)."""
+    return split_member(path)[0]
+
+def strip_compression(name):
+    """Return a file name without its compression suffix (card.db.gz -> card.db)."""
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def is_card_name(name, suffixes=CARD_SUFFIXES):
+    """Return True for card file names, also compressed ones (card.db.gz)."""
+    return strip_compression(name).lower().endswith(suffixes)
+
+def is_archive_name(name):
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+def compression(head):
+    """Return the compression of a stream from its first bytes, None for plain data."""
+    for magic, name in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+def open_decompressed(file, kind):
+    """Wrap a binary file object into a decompressing stream."""
+    if kind == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=file, mode="rb")
+    if kind == "xz":
+        import lzma
+        return lzma.LZMAFile(file)
+    if kind == "bz2":
+        import bz2
+        return bz2.BZ2File(file)
+    if kind == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("reading zstd files needs the zstandard package (pip install zstandard)") from None
+        # buffered, the zstd reader alone cannot iterate lines or peek
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(file))
+    raise ValueError(f"unknown compression {kind}")
+
+def read_head(stream, size):
+    """Read up to size bytes, streams may return short reads."""
+    head = b""
+    while len(head) < size:
+        data = stream.read(size - len(head))
+        if not data:
+            break
+        head += data
+    return head
+
+def sniff(file_path):
+    """Return (compression, archive) of a file from its magic bytes, e.g. ("gzip", "tar")."""
+    with open(file_path, "rb") as file:
+        head = file.read(TAR_MAGIC_OFFSET + len(TAR_MAGIC))
+        if head.startswith(ZIP_MAGIC):
+            return None, "zip"
+
+        kind = compression(head)
+        if kind is not None:
+            # a compressed tar shows its magic once decompressed
+            import lzma
+            file.seek(0)
+            try:
+                with open_decompressed(file, kind) as stream:
+                    head = read_head(stream, TAR_MAGIC_OFFSET + len(TAR_MAGIC))
+            except (OSError, EOFError, ValueError, lzma.LZMAError):
+                head = b""  # corrupt (or zstd without zstandard), reported when the card is read
+
+    is_tar = head[TAR_MAGIC_OFFSET:TAR_MAGIC_OFFSET + len(TAR_MAGIC)] == TAR_MAGIC
+    return kind, "tar" if is_tar else None
+
+def is_compressed(path):
+    """Return True when a card path has to be decompressed (not mapped) to be read."""
+    file_path, member = split_member(path)
+    return member is not None or sniff(file_path) != (None, None)
+
+# decompressed bytes of the last compressed tar, (path, size, mtime_ns) -> bytes,
+# only kept while a batch runs (cached_archives)
+tar_cache = {}
+tar_cache_batches = 0
+tar_cache_lock = threading.Lock()
+
+@contextmanager
+def cached_archives():
+    """Decompress a compressed tar once for all of its members read in the block (a batch).
+
+    The bytes are released when the last running batch ends, outside of a
+    batch members are read by walking the archive.
+    """
+    global tar_cache_batches
+    with tar_cache_lock:
+        tar_cache_batches += 1
+    try:
+        yield
+    finally:
+        with tar_cache_lock:
+            tar_cache_batches -= 1
+            if not tar_cache_batches:
+                tar_cache.clear()
+
+def tar_bytes(file_path, kind):
+    """Return the decompressed bytes of a compressed tar kept for the running batch.
+
+    None outside of a batch or when the tar is over TAR_CACHE_BYTES.
+    """
+    if not tar_cache_batches:
+        return None
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with tar_cache_lock:
+        data = tar_cache.get(key)
+    if data is not None:
+        return data
+
+    with open(file_path, "rb") as file, open_decompressed(file, kind) as stream:
+        data = read_head(stream, TAR_CACHE_BYTES + 1)
+    if len(data) > TAR_CACHE_BYTES:
+        return None  # members are read by walking the stream instead
+
+    with tar_cache_lock:
+        if tar_cache_batches:
+            tar_cache.clear()
+            tar_cache[key] = data
+    return data
+
+def open_member(stack, stream):
+    """Return an archive member stream, decompressed when the member is compressed (card.db.gz)."""
+    kind = compression(stream.peek(MAGIC_BYTES))
+    return stack.enter_context(open_decompressed(stream, kind)) if kind else stream
+
+def iter_tar_cards(stream):
+    """Yield (TarInfo, tar) of the card members of a tar stream, read sequentially."""
+    import tarfile
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        for info in tar:
+            if info.isfile() and is_card_name(info.name):
+                yield info, tar
+
+def list_members(path):
+    """Return the card member names of a zip/tar archive ([] for other files)."""
+    kind, archive = sniff(path)
+    if archive == "zip":
+        import zipfile
+        with zipfile.ZipFile(path) as zip_file:
+            return [info.filename for info in zip_file.infolist() if not info.is_dir() and is_card_name(info.filename)]
+    if archive == "tar":
+        with open(path, "rb") as file:
+            stream = open_decompressed(file, kind) if kind else file
+            with stream:
+                return [info.name for info, _ in iter_tar_cards(stream)]
+    return []
+
+@contextmanager
+def open_stream(path):
+    """Open a card path as a binary stream, decompressed as given by the magic bytes.
+
+    Archive members are named 'archive::member', an archive alone opens its
+    first card member. Plain files open as they are, compressed members of
+    an archive are decompressed too.
+    """
+    file_path, member = split_member(path)
+    kind, archive = sniff(file_path)
+    with ExitStack() as stack:
+        file = stack.enter_context(open(file_path, "rb"))
+        if archive == "zip":
+            import zipfile
+            zip_file = stack.enter_context(zipfile.ZipFile(file))
+            if member is None:
+                members = [name for name in zip_file.namelist() if is_card_name(name)]
+                if not members:
+                    raise ValueError(f"no card in {file_path}")
+                member = members[0]
+            try:
+                member_file = stack.enter_context(zip_file.open(member))
+            except KeyError:
+                raise ValueError(f"no card {member} in {file_path}") from None
+            yield open_member(stack, member_file)
+            return
+
+        if archive == "tar" and member is not None:
+            # random access, a compressed tar is decompressed once for all its members
+            data = tar_bytes(file_path, kind) if kind else None
+            if data is not None or kind is None:
+                import tarfile
+                tar = stack.enter_context(tarfile.open(fileobj=io.BytesIO(data) if kind else file, mode="r:"))
+                try:
+                    info = tar.getmember(member)
+                except KeyError:
+                    raise ValueError(f"no card {member} in {file_path}") from None
+                yield open_member(stack, tar.extractfile(info))
+                return
+
+        stream = stack.enter_context(open_decompressed(file, kind)) if kind else file
+        if archive == "tar":
+            for info, tar in iter_tar_cards(stream):
+                if member is None or info.name == member:
+                    yield open_member(stack, tar.extractfile(info))
+                    return
+            raise ValueError(f"no card {member} in {file_path}" if member else f"no card in {file_path}")
+        if member is not None:
+            raise ValueError(f"{file_path} is not an archive")
+        yield stream
+
+def iter_archive_members(path):
+    """Yield (member path, stream) of the card members of a zip/tar archive, read in one pass.
+
+    A stream is only valid until the next member is yielded.
+    """
+    kind, archive = sniff(path)
+    with ExitStack() as stack:
+        file = stack.enter_context(open(path, "rb"))
+        if archive == "zip":
+            import zipfile
+            zip_file = stack.enter_context(zipfile.ZipFile(file))
+            for info in zip_file.infolist():
+                if not info.is_dir() and is_card_name(info.filename):
+                    with ExitStack() as member_stack:
+                        stream = member_stack.enter_context(zip_file.open(info))
+                        yield member_path(path, info.filename), open_member(member_stack, stream)
+        elif archive == "tar":
+            stream = stack.enter_context(open_decompressed(file, kind)) if kind else file
+            for info, tar in iter_tar_cards(stream):
+                with ExitStack() as member_stack:
+                    yield member_path(path, info.name), open_member(member_stack, tar.extractfile(info))
+
+def read_card_bytes(path):
+    """Return the (decompressed) bytes of a card path."""
+    with profiler.timer("decompress"):
+        with open_stream(path) as stream:
+            data = stream.read()
+    profiler.count("bytes decompressed", len(data))
+    return data
+
+def expand_archives(files):
+    """Replace zip/tar archives in a file list by their card members."""
+    expanded = []
+    for file_path in files:
+        if is_archive_name(file_path):
+            import tarfile
+            import zipfile
+            try:
+                members = list_members(file_path)
+            except (OSError, ValueError, tarfile.TarError, zipfile.BadZipFile):
+                members = []
+            if members:
+                expanded.extend(member_path(file_path, member) for member in members)
+                continue
+        expanded.append(file_path)
+    return expanded
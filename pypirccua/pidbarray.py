@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbarray.py
+# Description:  Dense NumPy relay count arrays and layer statistics
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .piprofiler import profiler
+
+from itertools import chain
+
+import numpy as np
+
+UINT32_MAX = np.iinfo(np.uint32).max
+
+# keys this module caches on a layer, derived from its relays
+DERIVED_KEYS = ("counts", "mask", "histogram")
+
+# bins of the layer count histograms
+HISTOGRAM_BINS = 20
+
+# rows a layer may grow past its declared geometry, relays further out are
+# taken as corrupted lines and left out of the arrays
+GEOMETRY_MARGIN = 64
+
+def relay_array(layer):
+    """Build a dense (rows, cols) count array and a presence mask for a layer.
+
+    The shape comes from the S;/A; geometry; bits without an R; record stay
+    0 in counts and False in mask. Bits past the geometry grow the arrays by
+    at most GEOMETRY_MARGIN rows, the rest is dropped (and counted).
+    """
+    relays = layer["relays"]
+    rows, cols = layer["rows"], layer["cols"]
+    num = len(relays)
+
+    positions = np.fromiter(chain.from_iterable(relays.keys()), dtype=np.int64, count=2 * num).reshape(num, 2)
+    values = np.fromiter(relays.values(), dtype=np.uint64, count=num)
+
+    inside = (positions[:, 0] < rows + GEOMETRY_MARGIN) & (positions[:, 1] < max(cols, 1))
+    if not inside.all():
+        # a single corrupted bit must not allocate gigabytes
+        profiler.count("relays outside geometry", int(num - inside.sum()))
+        positions, values = positions[inside], values[inside]
+        num = len(values)
+
+    if num:
+        # grow to fit bits slightly outside of the declared geometry
+        rows = max(rows, int(positions[:, 0].max()) + 1)
+        cols = max(cols, int(positions[:, 1].max()) + 1)
+
+    dtype = np.uint32 if not num or values.max() <= UINT32_MAX else np.uint64
+    counts = np.zeros((rows, cols), dtype=dtype)
+    mask = np.zeros((rows, cols), dtype=bool)
+    counts[positions[:, 0], positions[:, 1]] = values
+    mask[positions[:, 0], positions[:, 1]] = True
+    return counts, mask
+
+def layer_arrays(layer):
+    """Return (counts, mask) of a layer, building them on first use."""
+    if "counts" not in layer:
+        layer["counts"], layer["mask"] = relay_array(layer)
+    return layer["counts"], layer["mask"]
+
+def attach_arrays(card_data):
+    """Attach dense 'counts' and 'mask' arrays to every subunit and loop."""
+    for layer in card_data.get("subunits", []) + card_data.get("physical_layers", []):
+        layer_arrays(layer)
+    return card_data
+
+def layer_values(layer):
+    """Return a flat array of the counts present in a layer."""
+    counts, mask = layer_arrays(layer)
+    return counts[mask]
+
+def layer_histogram(layer, bins=HISTOGRAM_BINS):
+    """Return (hist, bin_edges) of the layer counts, computed once per layer."""
+    histogram = layer.get("histogram")
+    if histogram is None or histogram[0].size != bins:
+        histogram = layer["histogram"] = np.histogram(layer_values(layer), bins=bins)
+    return histogram
+
+def layer_statistics(layer, ddof=0):
+    """Compute relay, max, mean, sum and std of a layer counts (vectorized)."""
+    values = layer_values(layer)
+    num = int(values.size)
+    if not num:
+        return {"relays": 0, "max": 0, "mean": 0.0, "sum": 0, "std": 0.0}
+
+    return {
+        "relays": num,
+        "max": int(values.max()),
+        "mean": float(values.mean()),
+        "sum": int(values.sum(dtype=np.uint64 if values.dtype.kind == "u" else np.int64)),
+        "std": float(values.std(ddof=ddof)) if num > ddof else 0.0,
+    }
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbbinary.py
+# Description:  Compact columnar binary format of parsed PXI Cards (*.pirc)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+#
+# File layout (all little-endian, blocks aligned to 8 bytes):
+#
+#   header      magic 'PIRCBIN1', u32 version, u32 meta length, u32 number of layers
+#   meta        json: header, generation, architecture and layer descriptions
+#   geometry    per layer: u8 kind, u8 count itemsize, u32 layer id, u32 rows, u32 cols,
+#               u64 counts offset, u64 mask offset
+#   data        per layer: rows * cols counts (uint32/uint64), packed presence bitmap
+#
+
+from .pidbreader import BINARY_MAGIC
+from .pidbarchive import split_member, strip_compression
+from .pidbarray import layer_arrays, DERIVED_KEYS
+from .pidbtokenizer import (
+    HeaderRecord, GenerationRecord, ArchitectureRecord, SubunitRecord, RelayRecord, EndRecord,
+    LAYER_LOGICAL, LAYER_PHYSICAL
+)
+
+import struct
+import json
+import os
+
+import numpy as np
+
+BINARY_VERSION = 1
+BINARY_EXTENSION = ".pirc"
+
+HEADER_STRUCT = struct.Struct("<8sIII")
+LAYER_STRUCT = struct.Struct("<BBxxIIIQQ")
+
+KIND_SUBUNIT = 0
+KIND_LOOP = 1
+
+# layer keys stored as arrays (or rebuilt) instead of json metadata
+ARRAY_KEYS = ("relays", "relay_lines") + DERIVED_KEYS
+
+def align(offset, boundary=8):
+    return (offset + boundary - 1) // boundary * boundary
+
+def card_layers(card_data):
+    """Return (kind, layer id, layer) of all subunits and loops."""
+    layers = [(KIND_SUBUNIT, subunit["layer_id"], subunit) for subunit in card_data["subunits"]]
+    layers += [(KIND_LOOP, loop["loop_id"], loop) for loop in card_data["physical_layers"]]
+    return layers
+
+def layer_description(layer):
+    return {key: value for key, value in layer.items() if key not in ARRAY_KEYS}
+
+def save_binary(file_path, card_data):
+    """Write parsed card_data in the columnar binary format."""
+    layers = card_layers(card_data)
+    meta = json.dumps({
+        "header": card_data["header"],
+        "generation": card_data["generation"],
+        "architecture": card_data["architecture"],
+        "logical_layers": card_data["logical_layers"],
+        "subunits": [layer_description(layer) for layer in card_data["subunits"]],
+        "physical_layers": [layer_description(layer) for layer in card_data["physical_layers"]],
+    }).encode("utf-8")
+
+    # place the blocks
+    offset = align(align(HEADER_STRUCT.size + len(meta)) + LAYER_STRUCT.size * len(layers))
+    geometry = []
+    blocks = []
+    for kind, layer_id, layer in layers:
+        counts, mask = layer_arrays(layer)
+        counts = counts.astype(counts.dtype.newbyteorder("<"), copy=False)
+        bitmap = np.packbits(mask, axis=None)
+
+        counts_offset = offset
+        mask_offset = align(counts_offset + counts.nbytes)
+        offset = align(mask_offset + bitmap.nbytes)
+
+        rows, cols = counts.shape
+        geometry.append(LAYER_STRUCT.pack(kind, counts.itemsize, layer_id, rows, cols, counts_offset, mask_offset))
+        blocks.append((counts_offset, counts))
+        blocks.append((mask_offset, bitmap))
+
+    # written aside and replaced, readers may still map the previous file
+    temp_path = file_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(HEADER_STRUCT.pack(BINARY_MAGIC, BINARY_VERSION, len(meta), len(layers)))
+            file.write(meta)
+            file.write(b"\0" * (align(file.tell()) - file.tell()))
+            file.write(b"".join(geometry))
+            for block_offset, array in blocks:
+                file.write(b"\0" * (block_offset - file.tell()))
+                file.write(array.tobytes())
+            file.write(b"\0" * (offset - file.tell()))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def check_header(magic, version):
+    """Raise ValueError for a foreign or unsupported binary card."""
+    if magic != BINARY_MAGIC:
+        raise ValueError("not a pypirccua binary card")
+    if version != BINARY_VERSION:
+        raise ValueError(f"unsupported binary card version {version}")
+
+def meta_card_data(meta):
+    """Build card_data (layers without relays) from the json metadata block."""
+    meta = json.loads(meta.decode("utf-8"))
+    return {
+        "header": meta["header"],
+        "generation": meta["generation"],
+        "architecture": meta["architecture"],
+        "logical_layers": meta["logical_layers"],
+        "subunits": meta["subunits"],
+        "physical_layers": meta["physical_layers"],
+        "subunit_index": {},
+        "loop_index": {},
+    }
+
+def read_binary_meta(file):
+    """Read card_data without the relays from an open binary card, the count blocks are not read."""
+    magic, version, meta_len, _ = HEADER_STRUCT.unpack(file.read(HEADER_STRUCT.size))
+    check_header(magic, version)
+    card_data = meta_card_data(file.read(meta_len))
+    for layer in card_data["subunits"] + card_data["physical_layers"]:
+        layer["relays"], layer["relay_lines"] = {}, {}
+    return card_data
+
+def load_binary(buffer):
+    """Build card_data from a binary card buffer (bytes or mmap).
+
+    Count arrays are read-only views of the buffer (no copy); relays dicts
+    are rebuilt for the code working on card_data.
+    """
+    magic, version, meta_len, num_layers = HEADER_STRUCT.unpack_from(buffer, 0)
+    check_header(magic, version)
+    card_data = meta_card_data(bytes(buffer[HEADER_STRUCT.size:HEADER_STRUCT.size + meta_len]))
+
+    layers = {KIND_SUBUNIT: {layer["layer_id"]: layer for layer in card_data["subunits"]},
+              KIND_LOOP: {layer["loop_id"]: layer for layer in card_data["physical_layers"]}}
+
+    geometry_offset = align(HEADER_STRUCT.size + meta_len)
+    for i in range(num_layers):
+        kind, itemsize, layer_id, rows, cols, counts_offset, mask_offset = \
+            LAYER_STRUCT.unpack_from(buffer, geometry_offset + i * LAYER_STRUCT.size)
+
+        size = rows * cols
+        counts = np.frombuffer(buffer, dtype=f"<u{itemsize}", count=size, offset=counts_offset).reshape(rows, cols)
+        bitmap = np.frombuffer(buffer, dtype=np.uint8, count=(size + 7) // 8, offset=mask_offset)
+        mask = np.unpackbits(bitmap, count=size).view(bool).reshape(rows, cols)
+
+        layer = layers[kind][layer_id]
+        layer["counts"], layer["mask"] = counts, mask
+        row_idx, col_idx = np.nonzero(mask)
+        positions = list(zip(row_idx.tolist(), col_idx.tolist()))
+        layer["relays"] = dict(zip(positions, counts[mask].tolist()))
+        layer["relay_lines"] = {}  # no text lines behind a binary card
+
+    card_data["subunit_index"] = layers[KIND_SUBUNIT]
+    card_data["loop_index"] = layers[KIND_LOOP]
+    return card_data
+
+def card_records(card_data):
+    """Yield typed records of card_data (line numbers are None)."""
+    header = card_data["header"]
+    if header:
+        yield HeaderRecord(None, header["pilpxi_version"], header["card_id"], header["card_sn"],
+                           header["fw_version"], header["is_simulated"])
+    if card_data["generation"] is not None:
+        yield GenerationRecord(None, card_data["generation"])
+    architecture = card_data["architecture"]
+    if architecture:
+        yield ArchitectureRecord(None, architecture["loops"], architecture["description"],
+                                 architecture["num_loops"], architecture["allocations"])
+    for subunit in card_data["subunits"]:
+        yield SubunitRecord(None, subunit["layer_id"], subunit["type"], subunit["rows"], subunit["cols"],
+                            subunit["num_components"], subunit["u2"], subunit["description"])
+    for subunit in card_data["subunits"]:
+        cols = subunit["cols"]
+        for (row, col), count in subunit["relays"].items():
+            yield RelayRecord(None, LAYER_LOGICAL, subunit["layer_id"], row * cols + col + 1, count)
+    for loop in card_data["physical_layers"]:
+        for (row, _), count in loop["relays"].items():
+            yield RelayRecord(None, LAYER_PHYSICAL, loop["loop_id"], row, count)
+    yield EndRecord(None)
+
+def binary_path(file_path, output_dir=None):
+    """Return the binary card path of a db file (next to the archive of a member)."""
+    archive_path, member = split_member(file_path)
+    name = strip_compression(os.path.basename(member or archive_path))
+    return os.path.join(output_dir or os.path.dirname(archive_path), os.path.splitext(name)[0] + BINARY_EXTENSION)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbcache.py
+# Description:  Persistent (npz) and in-memory LRU cache of parsed PXI Cards
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbcard import PiDbCard, PARSER_VERSION, build_index
+from .pidbreader import is_binary_card
+from .pidbarchive import source_path
+from .pidbarray import DERIVED_KEYS
+from .piprofiler import profiler
+
+from collections import OrderedDict
+import threading
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# layer keys stored as arrays (or rebuilt) instead of json metadata
+ARRAY_KEYS = ("relays", "relay_lines") + DERIVED_KEYS
+
+# size of the disk cache, the least recently used entries are removed over it
+MAX_DISK_BYTES = 512 * 1024 * 1024
+
+def default_cache_dir():
+    """Return the per-user cache directory."""
+    if os.environ.get("PYPIRCCUA_CACHE_DIR"):
+        return os.environ["PYPIRCCUA_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pypirccua")
+
+def file_signature(file_path):
+    """Return (path, size, mtime, parser version) identifying a parsed file."""
+    stat = os.stat(source_path(file_path))
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, PARSER_VERSION)
+
+def save_card_data(file, card_data, signature):
+    """Write card_data into an .npz file (relays as position/count arrays)."""
+    layers = card_data["subunits"] + card_data["physical_layers"]
+    meta = {
+        "signature": list(signature),
+        "header": card_data["header"],
+        "generation": card_data["generation"],
+        "architecture": card_data["architecture"],
+        "logical_layers": card_data["logical_layers"],
+        "subunits": [{k: v for k, v in layer.items() if k not in ARRAY_KEYS} for layer in card_data["subunits"]],
+        "physical_layers": [{k: v for k, v in layer.items() if k not in ARRAY_KEYS} for layer in card_data["physical_layers"]],
+    }
+
+    arrays = {"meta": np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)}
+    for i, layer in enumerate(layers):
+        relays = layer["relays"]
+        arrays[f"pos{i}"] = np.array(list(relays.keys()), dtype=np.int32).reshape(len(relays), 2)
+        arrays[f"cnt{i}"] = np.fromiter(relays.values(), dtype=np.uint64, count=len(relays))
+        # same keys, inserted together with relays
+        arrays[f"lin{i}"] = np.fromiter(layer["relay_lines"].values(), dtype=np.int64, count=len(relays))
+    np.savez(file, **arrays)
+
+def load_card_data(file, signature=None):
+    """Read card_data from an .npz file, None when the signature does not match."""
+    with np.load(file) as arrays:
+        meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+        if signature is not None and meta["signature"] != list(signature):
+            return None
+
+        card_data = {key: meta[key] for key in ("header", "generation", "architecture", "logical_layers", "subunits", "physical_layers")}
+        for i, layer in enumerate(card_data["subunits"] + card_data["physical_layers"]):
+            positions = list(map(tuple, arrays[f"pos{i}"].tolist()))
+            layer["relays"] = dict(zip(positions, arrays[f"cnt{i}"].tolist()))
+            layer["relay_lines"] = dict(zip(positions, arrays[f"lin{i}"].tolist()))
+
+    return build_index(card_data)
+
+#
+# class DbCardCache
+#
+class PiDbCardCache:
+
+    def __init__(self, cache_dir=None, max_items=32, max_disk_bytes=MAX_DISK_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.items = OrderedDict()  # in-memory LRU, signature -> card_data
+        self.disk_bytes = None  # size of the disk entries, counted at the first save
+        self.lock = threading.Lock()
+
+    def cache_path(self, file_path):
+        """Return the on-disk cache file of a db file (one entry per path)."""
+        digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
+    def get_cached(self, file_path):
+        """Return the card_data if it is in the in-memory LRU, else None."""
+        try:
+            signature = file_signature(file_path)
+        except OSError:
+            return None  # removed or unreachable, reported when it is loaded
+        with self.lock:
+            card_data = self.items.get(signature)
+            if card_data is not None:
+                self.items.move_to_end(signature)
+            return card_data
+
+    def load(self, file_path):
+        """Return parsed card_data from memory, disk, or by parsing the file."""
+        signature = file_signature(file_path)
+        card_data = self.get_cached(file_path)
+        if card_data is not None:
+            profiler.count("cache memory hits")
+            return card_data
+
+        if is_binary_card(file_path):
+            # binary cards load as fast as the cache itself
+            card_data = PiDbCard(file_path).parse_file()
+        else:
+            with profiler.timer("cache disk load"):
+                card_data = self.load_from_disk(file_path, signature)
+            if card_data is None:
+                card_data = PiDbCard(file_path).parse_file()
+                with profiler.timer("cache disk save"):
+                    self.save_to_disk(file_path, card_data, signature)
+            else:
+                profiler.count("cache disk hits")
+
+        with self.lock:
+            self.items[signature] = card_data
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        return card_data
+
+    def load_from_disk(self, file_path, signature):
+        """Load card_data from the disk cache, None when missing or stale."""
+        path = self.cache_path(file_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            card_data = load_card_data(path, signature)
+        except Exception:
+            return None  # corrupted entry, parse again
+        if card_data is not None:
+            try:
+                os.utime(path)  # recently used, evicted last
+            except OSError:
+                pass
+        return card_data
+
+    def save_to_disk(self, file_path, card_data, signature):
+        """Store card_data in the disk cache (best effort)."""
+        path = self.cache_path(file_path)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as file:
+                save_card_data(file, card_data, signature)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self.lock:
+            if self.disk_bytes is not None:
+                self.disk_bytes += size
+            evict = self.disk_bytes is None or self.disk_bytes > self.max_disk_bytes
+        if evict:
+            self.evict_disk()
+
+    def evict_disk(self):
+        """Remove the least recently used disk entries over max_disk_bytes."""
+        entries = []
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # removed by another process
+            total -= size
+        with self.lock:
+            self.disk_bytes = total
+
+    def clear(self):
+        """Drop the in-memory entries."""
+        with self.lock:
+            self.items.clear()
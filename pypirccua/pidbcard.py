@@ -22,7 +22,25 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-import re
+from .pidbtokenizer import (
+    HeaderRecord, GenerationRecord, ArchitectureRecord, SubunitRecord, RelayRecord, EndRecord,
+    LAYER_LOGICAL, LAYER_PHYSICAL, iter_records,
+    tokenize_header, tokenize_generation, tokenize_architecture, tokenize_subunit, tokenize_relay
+)
+from .pidbreader import PiDbReader, open_reader, is_binary_card
+from .pidbarchive import open_stream, is_compressed
+from .piprofiler import profiler
+
+import itertools
+
+# bump when the parsed card_data layout changes (invalidates cached cards)
+PARSER_VERSION = 2
+
+def build_index(card_data):
+    """(Re)build the subunit and loop index of card_data."""
+    card_data["subunit_index"] = {subunit["layer_id"]: subunit for subunit in card_data["subunits"]}
+    card_data["loop_index"] = {loop["loop_id"]: loop for loop in card_data["physical_layers"]}
+    return card_data
 
 #
 # class DbCard
@@ -38,125 +56,236 @@ class PiDbCard:
             "logical_layers": [],
             "subunits": [],
             "physical_layers": [],
+            "subunit_index": {},  # maps subunit layer_id to its subunit record
+            "loop_index": {},  # maps physical loop_id to its loop record
         }
         self.line_mapping = {}  # maps line numbers to data locations
 
+        # direct references, the index is looked up on every relay line
+        self.subunit_index = self.card_data["subunit_index"]
+        self.loop_index = self.card_data["loop_index"]
+
+        # record type -> handler
+        self.record_handlers = {
+            RelayRecord: self.add_relay,
+            HeaderRecord: self.add_header,
+            GenerationRecord: self.add_generation,
+            ArchitectureRecord: self.add_architecture,
+            SubunitRecord: self.add_subunit,
+        }
+
+    def iter_records(self):
+        """Yield the typed records of the file one at a time."""
+        reader = open_reader(self.file_path)
+        if reader.is_binary():
+            from .pidbbinary import load_binary, card_records
+            yield from card_records(load_binary(reader.buffer))
+        else:
+            yield from reader.iter_records()
+
     def parse_file(self):
-        """Parse the file and populate card_data."""
-        with open(self.file_path, "r") as file:
-            for line_no, line in enumerate(file):
-                line = line.strip()
-                if not line or line.startswith("H") or line.startswith("E"):
-                    continue
-
-                prefix = line[0]
-                if prefix == "P":
-                    self.parse_header(line, line_no)
-                elif prefix == "G":
-                    self.parse_generation(line, line_no)
-                elif prefix == "A":
-                    self.parse_architecture(line, line_no)
-                elif prefix == "S":
-                    self.parse_subunits(line, line_no)
-                elif prefix == "R":
-                    self.parse_relay(line, line_no)
+        """Parse the file (text or binary format) and populate card_data."""
+        if is_compressed(self.file_path) and not is_binary_card(self.file_path):
+            return self.parse_stream()
+
+        with profiler.timer("parse_file"):
+            reader = open_reader(self.file_path)
+            if reader.is_binary():
+                self.load_binary(reader)
+            else:
+                self.add_records(self.iter_records())
 
+        if profiler.enabled:
+            self.count_parsed(reader.line_count())
         return self.card_data
 
-    def parse_header(self, line, line_no):
-        """Parse the header line."""
-        match = re.match(r"(PILPXIDB[0-9]+);([^,]+),([0-9]+),([0-9.]+)", line)
-        if match:
-            pilpxi_version, card_id, card_sn, fw_version = match.groups()
-            pilpxi_version_num = int(pilpxi_version[-3:])  # extract numeric version
-            
-            # determine if the card is simulated
-            is_simulated = card_sn.startswith("1000000")
-
-            self.card_data["header"] = {
-                "pilpxi_version": pilpxi_version_num,
-                "card_id": card_id,
-                "card_sn": card_sn,
-                "fw_version": fw_version,
-                "is_simulated": is_simulated
+    def parse_stream(self):
+        """Parse a compressed text card while it is decompressed, it is never held whole in memory."""
+        counter = itertools.count()
+        with profiler.timer("parse_file"):
+            with open_stream(self.file_path) as stream:
+                lines = (line.decode("utf-8", errors="replace") for line, _ in zip(stream, counter))
+                self.add_records(iter_records(lines))
+
+        if profiler.enabled:
+            self.count_parsed(next(counter))  # lines read
+        return self.card_data
+
+    def parse_chunk(self, start, end, data=None):
+        """Parse one card of a concatenated dump, the bytes [start, end) of the file.
+
+        Line numbers (relay_lines, line_mapping) are relative to the chunk,
+        data holds the bytes when they were already read (compressed dumps),
+        the range is then taken from data.
+        """
+        with profiler.timer("parse_file"):
+            reader = PiDbReader(self.file_path, start, end, data)
+            self.add_records(reader.iter_records())
+
+        if profiler.enabled:
+            self.count_parsed(reader.line_count())
+        reader.close()  # not shared, the next chunk maps the file again
+        return self.card_data
+
+    def add_records(self, records):
+        """Add typed records into card_data."""
+        handlers = self.record_handlers
+        for record in records:
+            handler = handlers.get(type(record))
+            if handler:
+                handler(record)
+
+    def scan_header(self):
+        """Header-only scan, stops at the first relay record after the S; block.
+
+        Fills header, generation, architecture and the subunits/loops (without
+        relays) of card_data, the relay lines are never read.
+        """
+        with profiler.timer("scan_header"):
+            if is_binary_card(self.file_path):
+                from .pidbbinary import read_binary_meta
+                with open_stream(self.file_path) as file:
+                    self.card_data.update(read_binary_meta(file))
+                build_index(self.card_data)
+                self.subunit_index = self.card_data["subunit_index"]
+                self.loop_index = self.card_data["loop_index"]
+                return self.card_data
+
+            # compressed cards are decompressed only up to the relay lines,
+            # lines are decoded by hand as tar members are not seekable
+            with open_stream(self.file_path) as stream:
+                lines = (line.decode("utf-8", errors="replace") for line in stream)
+                for record in iter_records(lines):
+                    if type(record) is RelayRecord or type(record) is EndRecord:
+                        break
+                    self.add_record(record)
+        return self.card_data
+
+    def count_parsed(self, line_count):
+        """Add the parsed lines and relays to the profiler counters."""
+        profiler.count("lines parsed", line_count)
+        for subunit in self.card_data["subunits"]:
+            profiler.count("relays subunits", len(subunit["relays"]))
+        for loop in self.card_data["physical_layers"]:
+            profiler.count("relays loops", len(loop["relays"]))
+
+    def load_binary(self, reader):
+        """Populate card_data from a binary card, the count arrays map the file."""
+        # numpy is only needed for binary cards
+        from .pidbbinary import load_binary
+        self.card_data.update(load_binary(reader.buffer))
+        self.subunit_index = self.card_data["subunit_index"]
+        self.loop_index = self.card_data["loop_index"]
+        return self.card_data
+
+    def add_record(self, record):
+        """Add a single typed record into card_data."""
+        handler = self.record_handlers.get(type(record))
+        if handler:
+            handler(record)
+
+    def add_header(self, record):
+        """Add the header record."""
+        self.card_data["header"] = {
+            "pilpxi_version": record.pilpxi_version,
+            "card_id": record.card_id,
+            "card_sn": record.card_sn,
+            "fw_version": record.fw_version,
+            "is_simulated": record.is_simulated
+        }
+        self.line_mapping[record.line_no] = {"type": "card_id"}
+
+    def add_generation(self, record):
+        """Add the generation record."""
+        self.card_data["generation"] = record.generation
+        self.line_mapping[record.line_no] = {"type": "generation"}
+
+    def add_architecture(self, record):
+        """Add the architecture record and its physical loops."""
+        self.card_data["architecture"] = {
+            "loops": record.loops,
+            "description": record.description,
+            "num_loops": record.num_loops,
+            "allocations": record.allocations,
+        }
+        self.line_mapping[record.line_no] = {"type": "architecture"}
+
+        for i, alloc in enumerate(record.allocations):
+            loop = {
+                "loop_id": i,
+                "rows": alloc,
+                "cols": 1,
+                "relays": {},
+                "relay_lines": {},  # (row, col) -> line number of the relay record
             }
+            self.card_data["physical_layers"].append(loop)
+            self.loop_index[i] = loop
 
-            self.line_mapping[line_no] = {"type": "card_id"}
+    def add_subunit(self, record):
+        """Add a subunit record."""
+        subunit = {
+            "layer_id": record.layer_id,
+            "type": record.type,
+            "rows": record.rows,
+            "cols": record.cols,
+            "num_components": record.num_components,
+            "u2": record.u2,
+            "description": record.description,
+            "relays": {},
+            "relay_lines": {},  # (row, col) -> line number of the relay record
+        }
+        self.card_data["subunits"].append(subunit)
+        self.subunit_index[record.layer_id] = subunit
+        self.line_mapping[record.line_no] = {"type": "subunit", "id": record.layer_id}
+
+    def add_relay(self, record):
+        """Add a relay record."""
+        line_no, layer_type, layer_id, bit, count = record
+
+        if layer_type == LAYER_LOGICAL:
+            # logical bits are 1-based
+            subunit = self.subunit_index.get(layer_id)
+            if subunit and bit > 0:
+                cols = subunit["cols"]
+                row, col = (bit - 1) // cols, (bit - 1) % cols
+                subunit["relays"][(row, col)] = count
+                subunit["relay_lines"][(row, col)] = line_no
+                self.line_mapping[line_no] = {"type": "logical", "row": row, "col": col}
 
-        #match = re.match(r"PILPXIDB([0-9]+);(.*)", line)
-        #if match:
-        #    version, card_info = match.groups()
-        #    self.card_data["header"] = {"version": int(version), "card_info": card_info}
-        #    self.line_mapping[line_no] = {"type": "header"}
+        elif layer_type == LAYER_PHYSICAL:
+            loop = self.loop_index.get(layer_id)
+            # physical bits are 0-based (BIT0 .. BIT<allocation - 1>)
+            if loop:
+                loop["relays"][(bit, 0)] = count
+                loop["relay_lines"][(bit, 0)] = line_no
+                self.line_mapping[line_no] = {"type": "physical", "row": bit, "col": 0}
+
+    def parse_header(self, line, line_no):
+        """Parse the header line."""
+        self.add_record(tokenize_header(line, line_no))
 
     def parse_generation(self, line, line_no):
         """Parse the generation line."""
-        match = re.match(r"G;([0-9]+)", line)
-        if match:
-            self.card_data["generation"] = int(match.group(1))
-            self.line_mapping[line_no] = {"type": "generation"}
+        self.add_record(tokenize_generation(line, line_no))
 
     def parse_architecture(self, line, line_no):
         """Parse the architecture line."""
-        match = re.match(r"A;([0-9]+);([^;]+);([0-9]+);([^;]+)", line)
-        if match:
-            loops, description, num_loops, allocations = match.groups()
-            allocations = list(map(int, allocations.split(",")))
-            self.card_data["architecture"] = {
-                "loops": int(loops),
-                "description": description,
-                "num_loops": int(num_loops),
-                "allocations": allocations,
-            }
-            self.line_mapping[line_no] = {"type": "architecture"}
-
-            for i, alloc in enumerate(allocations):
-                self.card_data["physical_layers"].append({
-                    "loop_id": i,
-                    "rows": alloc,
-                    "cols": 1,
-                    "relays": {},
-                })
+        self.add_record(tokenize_architecture(line, line_no))
 
     def parse_subunits(self, line, line_no):
         """Parse the subunit line."""
-        match = re.match(r"S;([0-9]+);([0-9]+);([0-9]+);([0-9]+);([0-9]+);([0-9]+);([^;]+)", line)
-        if match:
-            layer_id, sub_type, rows, cols, components, u2, description = match.groups()
-            subunit_id = int(layer_id) + 1
-            self.card_data["subunits"].append({
-                "layer_id": subunit_id,
-                "type": int(sub_type),
-                "rows": int(rows),
-                "cols": int(cols),
-                "num_components": int(components),
-                "u2": int(u2),
-                "description": description,
-                "relays": {},
-            })
-            self.line_mapping[line_no] = {"type": "subunit", "id": subunit_id}
+        self.add_record(tokenize_subunit(line, line_no))
 
     def parse_relay(self, line, line_no):
         """Parse the relay line."""
-        match = re.match(r"R;([LP]);([SL][0-9]+)BIT([0-9]+);([0-9]+)", line)
-        if match:
-            layer_type, subunit_or_layer, bit, count = match.groups()
-            bit, count = int(bit), int(count)
-
-            if layer_type == "L":
-                subunit_id = int(re.sub(r"[^0-9]", "", subunit_or_layer))
-                for subunit in self.card_data["subunits"]:
-                    if subunit["layer_id"] == subunit_id:
-                        cols = subunit["cols"]
-                        row, col = (bit - 1) // cols, (bit - 1) % cols
-                        subunit["relays"][(row, col)] = count
-                        self.line_mapping[line_no] = {"type": "logical", "row": row, "col": col}
-                        break
+        token = tokenize_relay(line)
+        if token:
+            self.add_relay(RelayRecord(line_no, *token))
+
+    def get_subunit(self, layer_id):
+        """Return the logical subunit record by its layer_id (or None)."""
+        return self.subunit_index.get(layer_id)
 
-            elif layer_type == "P":
-                loop_id = int(re.sub(r"[^0-9]", "", subunit_or_layer))
-                for loop in self.card_data["physical_layers"]:
-                    if loop["loop_id"] == loop_id:
-                        loop["relays"][(bit - 1, 0)] = count
-                        self.line_mapping[line_no] = {"type": "physical", "row": bit - 1, "col": 0}
-                        break
\ No newline at end of file
+    def get_loop(self, loop_id):
+        """Return the physical loop record by its loop_id (or None)."""
+        return self.loop_index.get(loop_id)
@@ -25,6 +25,8 @@
 from PyQt5.QtWidgets import QMessageBox, QTreeWidget, QTreeWidgetItem, QFileDialog, QVBoxLayout, QWidget
 from PyQt5.QtCore import pyqtSignal
 
+from .piprofiler import profiled
+
 #
 # class DbCardList
 #
@@ -40,10 +42,15 @@ class PiDbCardList(QTreeWidget):
 
         self.setColumnCount(1)
         self.setHeaderLabels(["PXI Cards"])
-        self.cards = {}  # dictionary to store card nodes by (Card ID, Card S/N)
+        self.cards = {}  # dictionary to store card nodes by (Card ID, Card S/N, Generation)
+        self.card_files = {}  # file path -> db path node (snapshots of a card share its node)
+
+        # connected once, add_card used to connect it for every card
+        self.itemClicked.connect(self.on_item_clicked)
 
+    @profiled("add_card")
     def add_card(self, file_path, card_data):
-        if not card_data or "header" not in card_data or "generation" not in card_data:
+        if not card_data or not card_data.get("header") or "generation" not in card_data:
             QMessageBox.warning(self, "Invalid Card Data", "The provided card data is incomplete or invalid.")
             return
 
@@ -63,16 +70,63 @@ class PiDbCardList(QTreeWidget):
             return
 
         # if no duplicates... add card to list
-        card_node = QTreeWidgetItem(self, [f"PXI Card [{card_id}] [S/N: {card_sn}]"])
-        self.addTopLevelItem(card_node)
-        self.cards[key] = card_node
-
-        generation_node = QTreeWidgetItem(card_node, [f"Generation: {generation}"])
-        db_path_item = QTreeWidgetItem(generation_node, [f"Db path: {file_path}"])
-        generation_node.addChild(db_path_item)
-        card_node.addChild(generation_node)
+        self.insert_card(file_path, card_data)
+
+    @profiled("add_cards")
+    def add_cards(self, cards):
+        """Add many (file_path, card_data) cards at once, listed files are skipped silently.
+
+        card_data only needs the header and generation (e.g. inventory entries),
+        snapshots of a listed card are added under its node. Returns the
+        number of added files.
+        """
+        added = 0
+        self.setUpdatesEnabled(False)
+        try:
+            for file_path, card_data in cards:
+                if card_data.get("header") and file_path not in self.card_files:
+                    self.insert_card(file_path, card_data)
+                    added += 1
+        finally:
+            self.setUpdatesEnabled(True)
+        return added
+
+    def insert_card(self, file_path, card_data):
+        """Add the db path node of a card file, the card and generation nodes are created once."""
+        header = card_data["header"]
+        generation = card_data["generation"]
+        card_id = header.get("card_id", "Unknown")
+        card_sn = header.get("card_sn", "Unknown")
+        key = (card_id, card_sn, generation)
 
-        self.itemClicked.connect(self.on_item_clicked)
+        card_node = self.cards.get(key)
+        if card_node is None:
+            card_node = QTreeWidgetItem(self, [f"PXI Card [{card_id}] [S/N: {card_sn}]"])
+            QTreeWidgetItem(card_node, [f"Generation: {generation}"])
+            self.cards[key] = card_node
+
+        self.card_files[file_path] = QTreeWidgetItem(card_node.child(0), [f"Db path: {file_path}"])
+
+    def remove_files(self, file_paths):
+        """Remove these files (removed or changed in a catalog), a card goes with its last file."""
+        self.setUpdatesEnabled(False)
+        try:
+            for file_path in file_paths:
+                path_node = self.card_files.pop(file_path, None)
+                generation_node = path_node.parent() if path_node is not None else None
+                if generation_node is None:
+                    continue  # already removed by the user
+                generation_node.removeChild(path_node)
+                if generation_node.childCount():
+                    continue
+
+                card_node = generation_node.parent()
+                self.takeTopLevelItem(self.indexOfTopLevelItem(card_node))
+                for key, node in list(self.cards.items()):
+                    if node is card_node:
+                        del self.cards[key]
+        finally:
+            self.setUpdatesEnabled(True)
 
     def remove_card(self):
         """Remove the selected card and its data."""
@@ -88,6 +142,10 @@ class PiDbCardList(QTreeWidget):
                 if f"{key[0]}] [S/N: {key[1]}" in card_id_sn:
                     self.takeTopLevelItem(self.indexOfTopLevelItem(selected_item))
                     del self.cards[key]
+                    generation_node = selected_item.child(0)
+                    for index in range(generation_node.childCount() if generation_node else 0):
+                        file_path = generation_node.child(index).text(0).replace("Db path: ", "")
+                        self.card_files.pop(file_path, None)
                     QMessageBox.information(self, "Remove Card", f"Card {key} removed successfully.")
                     return
 
@@ -97,10 +155,14 @@ class PiDbCardList(QTreeWidget):
         """Remove all cards from the list."""
         self.clear()
         self.cards.clear()
+        self.card_files.clear()
         QMessageBox.information(self, "Remove All Cards", "All cards have been removed successfully.")
 
     def on_item_clicked(self, item, column):
-        if item.parent() and "Generation: " in item.text(0):
+        if item.parent() and "Db path: " in item.text(0):
+            # one snapshot of the card
+            self.generation_selected.emit(item.text(0).replace("Db path: ", ""))
+        elif item.parent() and "Generation: " in item.text(0):
             db_path_item = item.child(0)
             if db_path_item and "Db path: " in db_path_item.text(0):
                 file_path = db_path_item.text(0).replace("Db path: ", "")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbcardloader.py
+# Description:  *.db (Database) PXI Card concurrent loader (QThreadPool)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbcardthreaded import PiDbCardThreaded
+from .pidbarchive import cached_archives
+
+from contextlib import ExitStack
+
+from PyQt5.QtCore import QObject, QThread, QThreadPool, pyqtSignal
+
+#
+# class DbCardLoader
+#
+class PiDbCardLoader(QObject):
+
+    card_loaded = pyqtSignal(str, dict)  # file path, parsed data
+    card_error = pyqtSignal(str, str)  # file path, error message
+    progress_changed = pyqtSignal(int, int)  # processed files, total files
+    loading_finished = pyqtSignal(int, int)  # loaded files, failed files
+
+    def __init__(self, card_cache=None, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.card_cache = card_cache
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max_threads or QThread.idealThreadCount())
+
+        self.batch = set()  # runnables of the current batch still running or queued
+        self.singles = set()  # runnables started by load_card
+        self.cancelled = set()  # runnables of a cancelled batch still running, dropped when they end
+        self.archives = ExitStack()  # tar bytes shared by the members of the batch
+        self.total = 0
+        self.loaded = 0
+        self.failed = 0
+
+    def is_loading(self):
+        """Return True while a batch is in progress."""
+        return bool(self.batch)
+
+    def load(self, file_paths):
+        """Parse files concurrently, results are emitted by card_loaded as they complete."""
+        if not self.batch:
+            self.total = self.loaded = self.failed = 0
+            self.archives.enter_context(cached_archives())
+
+        self.total += len(file_paths)
+        self.progress_changed.emit(self.processed(), self.total)
+
+        for file_path in file_paths:
+            runnable = PiDbCardThreaded(file_path, self.card_cache)
+            runnable.signals.processing_finished.connect(
+                lambda path, data, runnable=runnable: self.on_batch_finished(runnable, path, data))
+            runnable.signals.processing_error.connect(
+                lambda path, error, runnable=runnable: self.on_batch_error(runnable, path, error))
+            self.batch.add(runnable)
+            self.thread_pool.start(runnable)
+
+    def load_card(self, file_path, on_finished, on_error):
+        """Parse a single file on the pool, outside of the batch progress."""
+        runnable = PiDbCardThreaded(file_path, self.card_cache)
+        runnable.signals.processing_finished.connect(on_finished)
+        runnable.signals.processing_error.connect(on_error)
+        runnable.signals.processing_finished.connect(lambda *_: self.singles.discard(runnable))
+        runnable.signals.processing_error.connect(lambda *_: self.singles.discard(runnable))
+        self.singles.add(runnable)
+        self.thread_pool.start(runnable)
+        return runnable
+
+    def cancel(self):
+        """Cancel the queued files of the batch, results of the running ones are dropped."""
+        for runnable in self.batch:
+            runnable.cancel()
+            if not self.thread_pool.tryTake(runnable):
+                self.cancelled.add(runnable)  # released by its end signal
+
+        was_loading = bool(self.batch)
+        self.batch.clear()
+        self.archives.close()
+        if was_loading:
+            self.loading_finished.emit(self.loaded, self.failed)
+
+    def wait(self):
+        """Wait for the running workers (application exit)."""
+        self.thread_pool.waitForDone()
+
+    def processed(self):
+        return self.loaded + self.failed
+
+    def on_batch_finished(self, runnable, file_path, parsed_data):
+        if runnable in self.cancelled:
+            self.cancelled.discard(runnable)
+            return
+        self.batch.discard(runnable)
+        self.loaded += 1
+        self.card_loaded.emit(file_path, parsed_data)
+        self.update_progress()
+
+    def on_batch_error(self, runnable, file_path, error_message):
+        if runnable in self.cancelled:
+            self.cancelled.discard(runnable)
+            return
+        self.batch.discard(runnable)
+        self.failed += 1
+        self.card_error.emit(file_path, error_message)
+        self.update_progress()
+
+    def update_progress(self):
+        self.progress_changed.emit(self.processed(), self.total)
+        if not self.batch:
+            self.archives.close()
+            self.loading_finished.emit(self.loaded, self.failed)
@@ -22,27 +22,51 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 from .pidbcard import PiDbCard
-from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
 
 #
-# class DbCardThreaded
+# class DbCardSignals (QRunnable is not a QObject)
 #
-class PiDbCardThreaded(QObject):
+class PiDbCardSignals(QObject):
+
+    processing_started = pyqtSignal(str)  # file path
+    processing_finished = pyqtSignal(str, dict)  # file path, parsed data
+    processing_error = pyqtSignal(str, str)  # file path, error message
 
-    processing_started = pyqtSignal()
-    processing_finished = pyqtSignal(dict)
-    processing_error = pyqtSignal(str)
+#
+# class DbCardThreaded
+#
+class PiDbCardThreaded(QRunnable):
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, card_cache=None):
         super().__init__()
+        self.setAutoDelete(False)  # owned by the Python side (PiDbCardLoader)
         self.file_path = file_path
+        self.card_cache = card_cache
+        self.signals = PiDbCardSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        """Skip the card if it did not start yet, a running card still reports its end."""
+        self.cancelled = True
+
+    def run(self):
+        """QThreadPool entry point."""
+        self.process_card()
 
     def process_card(self):
         """Run the card processing logic."""
-        self.processing_started.emit()
+        if self.cancelled:
+            self.signals.processing_error.emit(self.file_path, "cancelled")
+            return
+
+        self.signals.processing_started.emit(self.file_path)
         try:
-            parser = PiDbCard(self.file_path)
-            parsed_data = parser.parse_file()
-            self.processing_finished.emit(parsed_data)
+            if self.card_cache:
+                parsed_data = self.card_cache.load(self.file_path)
+            else:
+                parser = PiDbCard(self.file_path)
+                parsed_data = parser.parse_file()
+            self.signals.processing_finished.emit(self.file_path, parsed_data)
         except Exception as e:
-            self.processing_error.emit(str(e))
\ No newline at end of file
+            self.signals.processing_error.emit(self.file_path, str(e))
@@ -22,13 +22,35 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from PyQt5.QtWidgets import QListWidget, QListWidgetItem, QVBoxLayout, QWidget
-from PyQt5.QtCore import pyqtSignal
+from .pidbreader import open_reader
+from .pidbarchive import source_path
+
+from PyQt5.QtWidgets import QListView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QFileSystemWatcher, pyqtSignal
+
+#
+# class DbLineModel - lines of a memory-mapped db file, rendered on demand
+#
+class PiDbLineModel(QAbstractListModel):
+
+    def __init__(self, reader=None, parent=None):
+        super().__init__(parent)
+        self.reader = reader
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.reader is None:
+            return 0
+        return self.reader.line_count()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.reader.line(index.row()).strip()
+        return None
 
 #
 # class DbCardView
 #
-class PiDbCardView(QListWidget):
+class PiDbCardView(QListView):
     
     line_selected = pyqtSignal(int)  # signal emitted when a line is selected
 
@@ -37,32 +59,72 @@ class PiDbCardView(QListWidget):
 
         self.setMinimumSize(240,420)
         self.setMaximumSize(240,980)
+        self.setUniformItemSizes(True)  # no per-line size hints for 9k+ line files
 
-        self.line_mapping = {}
-        
+        self.line_model = PiDbLineModel(parent=self)
+        self.setModel(self.line_model)
+
+        # lines are read long after loading, a file rewritten in place is remapped
+        self.file_path = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+
+    @property
+    def reader(self):
+        """Memory-mapped file, shared with the parser."""
+        return self.line_model.reader
 
     def load_file(self, file_path):
-        self.clear()
-        self.line_mapping.clear()
-        with open(file_path, 'r') as file:
-            for idx, line in enumerate(file.readlines()):
-                item = line.strip()
-                self.addItem(item)
-                self.line_mapping[idx] = line
+        self.watch(file_path)
+        self.set_reader(open_reader(file_path))
+
+    def watch(self, file_path):
+        """Watch the shown file (None stops watching)."""
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
+        self.file_path = file_path
+        if file_path is not None:
+            self.watcher.addPath(source_path(file_path))
+
+    def on_file_changed(self, path):
+        """Swap in a fresh reader, a truncated mapping raises SIGBUS when read."""
+        if self.reader is None or self.reader.is_current():
+            return
+        try:
+            reader = open_reader(self.file_path)
+        except OSError:
+            self.clear()  # removed
+            return
+        self.watch(self.file_path)  # a replaced file is dropped by the watcher
+        self.set_reader(reader)
+
+    def set_reader(self, reader):
+        self.line_model.beginResetModel()
+        self.line_model.reader = reader
+        self.line_model.endResetModel()
+
+    def clear(self):
+        self.watch(None)
+        self.set_reader(None)
+
+    def count(self):
+        return self.line_model.rowCount()
+
+    def line_text(self, line_no):
+        """Return the text of a line of the loaded file (None when out of range)."""
+        if self.reader and 0 <= line_no < self.reader.line_count():
+            return self.reader.line(line_no)
+        return None
 
     def mousePressEvent(self, event):
         super().mousePressEvent(event)
-        item = self.itemAt(event.pos())
-        if item:
-            line_no = self.row(item)
-            self.line_selected.emit(line_no)
+        index = self.indexAt(event.pos())
+        if index.isValid():
+            self.line_selected.emit(index.row())
 
     def highlight_line(self, line_no):
-        """Highlight a specific line in the QListWidget."""
-        if 0 <= line_no < self.list_widget.count():
-            self.list_widget.setCurrentRow(line_no)
-            self.list_widget.scrollToItem(self.list_widget.item(line_no))
-
-    def connect_signals(self):
-        """Connect signals to emit the line selected."""
-        self.list_widget.currentRowChanged.connect(self.line_selected.emit)
+        """Select and scroll to a specific line."""
+        if 0 <= line_no < self.count():
+            index = self.line_model.index(line_no)
+            self.setCurrentIndex(index)
+            self.scrollTo(index, QListView.PositionAtCenter)
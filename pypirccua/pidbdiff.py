@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbdiff.py
+# Description:  Relay count difference of two snapshots of the same PXI Card
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbarray import layer_arrays, DERIVED_KEYS
+from .pidbarchive import source_path
+
+import os
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+def snapshot_days(file_a, file_b):
+    """Return the days between two dumps (file modification times)."""
+    return (os.stat(source_path(file_b)).st_mtime - os.stat(source_path(file_a)).st_mtime) / SECONDS_PER_DAY
+
+def card_key(card_data):
+    header = card_data.get("header") or {}
+    return header.get("card_id"), header.get("card_sn")
+
+def layer_delta(layer_a, layer_b):
+    """Return (delta, mask) of two layers aligned by bit.
+
+    mask holds the relays of the newer snapshot, relays missing in the older
+    one count from 0.
+    """
+    counts_b, mask_b = layer_arrays(layer_b)
+    if layer_a is None:
+        return counts_b.astype(np.int64), mask_b
+
+    counts_a, _ = layer_arrays(layer_a)
+    rows = max(counts_a.shape[0], counts_b.shape[0])
+    cols = max(counts_a.shape[1], counts_b.shape[1])
+
+    delta = np.zeros((rows, cols), dtype=np.int64)
+    delta[:counts_b.shape[0], :counts_b.shape[1]] = counts_b
+    delta[:counts_a.shape[0], :counts_a.shape[1]] -= counts_a.astype(np.int64)
+
+    mask = np.zeros((rows, cols), dtype=bool)
+    mask[:mask_b.shape[0], :mask_b.shape[1]] = mask_b
+    delta[~mask] = 0
+    return delta, mask
+
+def diff_layer(layer_a, layer_b, days):
+    """Build a diff layer, 'counts' hold the deltas so it reads like a card layer."""
+    delta, mask = layer_delta(layer_a, layer_b)
+    layer = {key: value for key, value in layer_b.items() if key != "relays" and key not in DERIVED_KEYS}
+    layer["counts"], layer["mask"] = delta, mask
+    layer["rate"] = delta / days if days and days > 0 else None  # cycles per day
+    return layer
+
+def diff_cards(data_a, data_b, days=None):
+    """Diff two parsed snapshots of the same card (a older, b newer).
+
+    Returns card_data shaped dict whose layer counts are the per-relay deltas.
+    """
+    if card_key(data_a) != card_key(data_b):
+        raise ValueError(f"snapshots of different cards: {card_key(data_a)} != {card_key(data_b)}")
+
+    subunits = [
+        diff_layer(data_a["subunit_index"].get(subunit["layer_id"]), subunit, days)
+        for subunit in data_b["subunits"]
+    ]
+    loops = [
+        diff_layer(data_a["loop_index"].get(loop["loop_id"]), loop, days)
+        for loop in data_b["physical_layers"]
+    ]
+    return {
+        "header": data_b["header"],
+        "generation": data_b["generation"],
+        "architecture": data_b["architecture"],
+        "logical_layers": data_b["logical_layers"],
+        "subunits": subunits,
+        "physical_layers": loops,
+        "subunit_index": {subunit["layer_id"]: subunit for subunit in subunits},
+        "loop_index": {loop["loop_id"]: loop for loop in loops},
+        "days": days,
+    }
+
+def top_relays(diff, n=10):
+    """Return the n relays with the largest delta as a list of dicts."""
+    layers = [("Subunit", subunit["layer_id"], subunit) for subunit in diff["subunits"]]
+    layers += [("Loop", loop["loop_id"], loop) for loop in diff["physical_layers"]]
+    if not layers or n <= 0:
+        return []
+
+    # flatten every layer once, then select across the whole card
+    origins, rows, cols, deltas = [], [], [], []
+    for i, (_, _, layer) in enumerate(layers):
+        row_idx, col_idx = np.nonzero(layer["mask"])
+        origins.append(np.full(row_idx.size, i, dtype=np.int64))
+        rows.append(row_idx)
+        cols.append(col_idx)
+        deltas.append(layer["counts"][row_idx, col_idx])
+    origins, rows, cols, deltas = (np.concatenate(a) for a in (origins, rows, cols, deltas))
+
+    n = min(n, deltas.size)
+    if not n:
+        return []
+    top = np.argpartition(-deltas, n - 1)[:n]
+    top = top[np.argsort(-deltas[top], kind="stable")]
+
+    days = diff.get("days")
+    result = []
+    for i in top.tolist():
+        name, layer_id, layer = layers[origins[i]]
+        row, col, delta = int(rows[i]), int(cols[i]), int(deltas[i])
+        bit = row * layer["cols"] + col + 1 if name == "Subunit" else row
+        result.append({
+            "layer": name, "layer_id": layer_id, "bit": bit, "row": row, "col": col,
+            "delta": delta, "rate": delta / days if days and days > 0 else None,
+        })
+    return result
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbforecast.py
+# Description:  End of life forecast of relays from their count history
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbtokenizer import LAYER_LOGICAL, LAYER_PHYSICAL
+from .pidbarray import DERIVED_KEYS
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+# default rated life of a relay (cycles), the heatmap critical level
+DEFAULT_RATED_LIFE = 100000000
+
+# relays not wearing towards the limit are shown at this horizon (days)
+FORECAST_HORIZON_DAYS = 36500
+
+# layer codes of the forecast arrays
+LAYER_CODES = {LAYER_LOGICAL: 0, LAYER_PHYSICAL: 1}
+LAYER_NAMES = {code: name for name, code in LAYER_CODES.items()}
+
+def fit_rates(times, counts, mask):
+    """Least-squares slope of every column of counts (snapshots x relays).
+
+    times are in days, mask marks the observed counts. Returns cycles per day,
+    NaN for relays seen in less than two snapshots.
+    """
+    weights = mask.astype(np.float64)
+    values = np.where(mask, counts, 0).astype(np.float64)
+    observed = weights.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        time_mean = (weights * times[:, None]).sum(axis=0) / observed
+        count_mean = values.sum(axis=0) / observed
+        time_delta = (times[:, None] - time_mean) * weights
+        covariance = (time_delta * (values - count_mean)).sum(axis=0)
+        variance = (time_delta * time_delta).sum(axis=0)
+        rates = covariance / variance
+
+    rates[(observed < 2) | (variance <= 0)] = np.nan
+    return rates
+
+def forecast_relays(taken_at, layers, layer_ids, bits, counts, limit=DEFAULT_RATED_LIFE):
+    """Forecast the days to the rated life from flat history rows.
+
+    Every argument is a sequence of one value per (snapshot, relay) row;
+    taken_at in epoch seconds, layers as LAYER_CODES. Returns a dict of
+    per-relay arrays: layer, layer_id, bit, count (last seen), rate
+    (cycles/day) and days (to limit, inf when not wearing, NaN when unknown).
+    """
+    taken_at = np.asarray(taken_at, dtype=np.float64)
+    layers = np.asarray(layers, dtype=np.int64)
+    layer_ids = np.asarray(layer_ids, dtype=np.int64)
+    bits = np.asarray(bits, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.float64)
+
+    # relay key and snapshot -> matrix position
+    keys = (layers << 48) | (layer_ids << 24) | bits
+    relay_keys, columns = np.unique(keys, return_inverse=True)
+    times, rows = np.unique(taken_at, return_inverse=True)
+
+    matrix = np.zeros((times.size, relay_keys.size))
+    mask = np.zeros((times.size, relay_keys.size), dtype=bool)
+    matrix[rows, columns] = counts
+    mask[rows, columns] = True
+
+    rates = fit_rates((times - times[0]) / SECONDS_PER_DAY if times.size else times, matrix, mask)
+
+    # last observed count of every relay
+    last_row = times.size - 1 - np.argmax(mask[::-1], axis=0)
+    last = matrix[last_row, np.arange(relay_keys.size)]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days = np.where(rates > 0, (limit - last) / rates, np.inf)
+    days[np.isnan(rates)] = np.nan
+    days[last >= limit] = 0.0
+
+    return {
+        "layer": relay_keys >> 48,
+        "layer_id": (relay_keys >> 24) & 0xFFFFFF,
+        "bit": relay_keys & 0xFFFFFF,
+        "count": last.astype(np.uint64),
+        "rate": rates,
+        "days": days,
+    }
+
+def forecast_history(history, card_id, card_sn, limit=DEFAULT_RATED_LIFE):
+    """Forecast all relays of a card from the history store."""
+    rows = history.card_counts(card_id, card_sn)
+    if not rows:
+        return forecast_relays([], [], [], [], [], limit)
+
+    taken_at, layers, layer_ids, bits, counts = zip(*rows)
+    layers = [LAYER_CODES[layer] for layer in layers]
+    return forecast_relays(taken_at, layers, layer_ids, bits, counts, limit)
+
+def forecast_card_data(card_data, forecast):
+    """Build card_data shaped dict whose layer counts are the days to limit.
+
+    Relays without a forecast are masked out, not wearing relays sit at
+    FORECAST_HORIZON_DAYS.
+    """
+    days = np.minimum(forecast["days"], FORECAST_HORIZON_DAYS)
+    known = ~np.isnan(days)
+
+    def forecast_layer(layer, layer_code, layer_id):
+        rows, cols = layer["rows"], layer["cols"]
+        if "counts" in layer:
+            rows, cols = layer["counts"].shape
+        counts = np.zeros((rows, cols), dtype=np.int64)
+        mask = np.zeros((rows, cols), dtype=bool)
+
+        select = known & (forecast["layer"] == layer_code) & (forecast["layer_id"] == layer_id)
+        bits = forecast["bit"][select]
+        if layer_code == LAYER_CODES[LAYER_LOGICAL]:
+            positions = ((bits - 1) // layer["cols"], (bits - 1) % layer["cols"])
+        else:
+            positions = (bits, np.zeros_like(bits))
+        inside = (positions[0] >= 0) & (positions[0] < rows) & (positions[1] < cols)
+        positions = (positions[0][inside], positions[1][inside])
+
+        counts[positions] = np.ceil(days[select][inside])
+        mask[positions] = True
+
+        result = {key: value for key, value in layer.items() if key != "relays" and key not in DERIVED_KEYS}
+        result["counts"], result["mask"] = counts, mask
+        return result
+
+    subunits = [forecast_layer(subunit, LAYER_CODES[LAYER_LOGICAL], subunit["layer_id"]) for subunit in card_data["subunits"]]
+    loops = [forecast_layer(loop, LAYER_CODES[LAYER_PHYSICAL], loop["loop_id"]) for loop in card_data["physical_layers"]]
+    return {
+        "header": card_data["header"],
+        "generation": card_data["generation"],
+        "architecture": card_data["architecture"],
+        "logical_layers": card_data["logical_layers"],
+        "subunits": subunits,
+        "physical_layers": loops,
+        "subunit_index": {subunit["layer_id"]: subunit for subunit in subunits},
+        "loop_index": {loop["loop_id"]: loop for loop in loops},
+    }
+
+def forecast_order(forecast):
+    """Return the relay order of a forecast, soonest at the limit first (unknown last)."""
+    days = np.where(np.isnan(forecast["days"]), np.inf, forecast["days"])
+    return np.lexsort((np.isnan(forecast["days"]), days))
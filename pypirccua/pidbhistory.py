@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbhistory.py
+# Description:  Relay count history of PXI Card snapshots (SQLite store)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbcard import PiDbCard
+from .pidbarray import layer_arrays
+from .pidbtokenizer import LAYER_LOGICAL, LAYER_PHYSICAL
+from .pidbarchive import open_stream, source_path
+
+import sqlite3
+import hashlib
+import time
+import os
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    card_id TEXT NOT NULL,
+    card_sn TEXT NOT NULL,
+    generation INTEGER,
+    taken_at REAL NOT NULL,
+    file_path TEXT,
+    ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_card ON snapshots (card_id, card_sn, taken_at);
+CREATE INDEX IF NOT EXISTS snapshots_taken ON snapshots (taken_at);
+
+CREATE TABLE IF NOT EXISTS counts (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    layer TEXT NOT NULL,
+    layer_id INTEGER NOT NULL,
+    bit INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, layer, layer_id, bit)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_count ON counts (count);
+
+CREATE TABLE IF NOT EXISTS sources (
+    file_path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id)
+);
+"""
+
+# latest snapshot of every card
+LATEST_SNAPSHOTS = """
+SELECT s.id FROM snapshots s
+WHERE s.taken_at = (SELECT MAX(taken_at) FROM snapshots WHERE card_id = s.card_id AND card_sn = s.card_sn)
+"""
+
+def default_history_path():
+    """Return the per-user history database."""
+    if os.environ.get("PYPIRCCUA_HISTORY"):
+        return os.environ["PYPIRCCUA_HISTORY"]
+    base = os.environ.get("XDG_DATA_HOME") or os.environ.get("LOCALAPPDATA") \
+        or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "pypirccua", "history.sqlite3")
+
+def content_hash(file_path):
+    """Return the sha256 of the card content (decompressed, a packed copy is the same snapshot)."""
+    digest = hashlib.sha256()
+    with open_stream(file_path) as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def card_count_rows(card_data):
+    """Yield (layer, layer_id, bit, count) of every relay, bits as in the R; records."""
+    layers = [(LAYER_LOGICAL, subunit["layer_id"], subunit) for subunit in card_data["subunits"]]
+    layers += [(LAYER_PHYSICAL, loop["loop_id"], loop) for loop in card_data["physical_layers"]]
+    for layer_type, layer_id, layer in layers:
+        counts, mask = layer_arrays(layer)
+        rows, cols = np.nonzero(mask)
+        if layer_type == LAYER_LOGICAL:
+            bits = rows * layer["cols"] + cols + 1
+        else:
+            bits = rows
+        yield from zip([layer_type] * len(bits), [layer_id] * len(bits), bits.tolist(), counts[rows, cols].tolist())
+
+#
+# class DbHistory
+#
+class PiDbHistory:
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def ingest(self, file_path, taken_at=None):
+        """Add a snapshot of a db file, returns (snapshot_id, added).
+
+        Unchanged files (path, size, mtime) and already known content
+        (sha256) are not parsed again.
+        """
+        stat = os.stat(source_path(file_path))
+        path = os.path.abspath(file_path)
+        db = self.connection
+
+        row = db.execute(
+            "SELECT snapshot_id FROM sources WHERE file_path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        if row:
+            return row[0], False
+
+        digest = content_hash(file_path)
+        row = db.execute("SELECT id FROM snapshots WHERE content_hash = ?", (digest,)).fetchone()
+        if row:
+            snapshot_id, added = row[0], False
+        else:
+            card_data = PiDbCard(file_path).parse_file()
+            header = card_data.get("header")
+            if not header:
+                raise ValueError("missing PILPXIDB header")
+
+            with db:
+                cursor = db.execute(
+                    "INSERT INTO snapshots (content_hash, card_id, card_sn, generation, taken_at, file_path, ingested_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (digest, header["card_id"], header["card_sn"], card_data.get("generation"),
+                     stat.st_mtime if taken_at is None else taken_at, path, time.time()),
+                )
+                snapshot_id, added = cursor.lastrowid, True
+                db.executemany(
+                    f"INSERT INTO counts (snapshot_id, layer, layer_id, bit, count) VALUES ({snapshot_id}, ?, ?, ?, ?)",
+                    card_count_rows(card_data),
+                )
+
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO sources (file_path, size, mtime_ns, snapshot_id) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, snapshot_id),
+            )
+        return snapshot_id, added
+
+    def snapshots(self, card_id=None, card_sn=None):
+        """Return (id, card_id, card_sn, generation, taken_at, file_path) of the snapshots by time."""
+        query = "SELECT id, card_id, card_sn, generation, taken_at, file_path FROM snapshots"
+        params = ()
+        if card_id is not None:
+            query += " WHERE card_id = ? AND card_sn = ?"
+            params = (card_id, card_sn)
+        return self.connection.execute(query + " ORDER BY taken_at", params).fetchall()
+
+    def cards(self):
+        """Return (card_id, card_sn, snapshots, last taken_at) of all known cards."""
+        return self.connection.execute(
+            "SELECT card_id, card_sn, COUNT(*), MAX(taken_at) FROM snapshots GROUP BY card_id, card_sn ORDER BY card_id, card_sn"
+        ).fetchall()
+
+    def relay_series(self, card_id, card_sn, layer, layer_id, bit):
+        """Return [(taken_at, count)] of one relay."""
+        return self.connection.execute(
+            "SELECT s.taken_at, c.count FROM snapshots s "
+            "JOIN counts c ON c.snapshot_id = s.id AND c.layer = ? AND c.layer_id = ? AND c.bit = ? "
+            "WHERE s.card_id = ? AND s.card_sn = ? ORDER BY s.taken_at",
+            (layer, layer_id, bit, card_id, card_sn),
+        ).fetchall()
+
+    def card_counts(self, card_id, card_sn):
+        """Return [(taken_at, layer, layer_id, bit, count)] of all snapshots of a card."""
+        return self.connection.execute(
+            "SELECT s.taken_at, c.layer, c.layer_id, c.bit, c.count FROM snapshots s "
+            "JOIN counts c ON c.snapshot_id = s.id "
+            "WHERE s.card_id = ? AND s.card_sn = ? ORDER BY s.taken_at",
+            (card_id, card_sn),
+        ).fetchall()
+
+    def relays_above(self, min_count, limit=None):
+        """Return (card_id, card_sn, layer, layer_id, bit, count) of the latest snapshots above min_count."""
+        return self.connection.execute(
+            "SELECT s.card_id, s.card_sn, c.layer, c.layer_id, c.bit, c.count FROM counts c "
+            f"JOIN snapshots s ON s.id = c.snapshot_id WHERE c.count > ? AND s.id IN ({LATEST_SNAPSHOTS}) "
+            "ORDER BY c.count DESC LIMIT ?",
+            (min_count, -1 if limit is None else limit),
+        ).fetchall()
+
+    def relay_growth(self, days=90, limit=None, now=None):
+        """Return (card_id, card_sn, layer, layer_id, bit, growth, days) over the last days.
+
+        Growth is the count difference between the first and the last
+        snapshot of each card inside the window.
+        """
+        since = (time.time() if now is None else now) - days * SECONDS_PER_DAY
+        return self.connection.execute(
+            """
+            WITH bounds AS (
+                SELECT card_id, card_sn, MIN(taken_at) AS first_at, MAX(taken_at) AS last_at
+                FROM snapshots WHERE taken_at >= ? GROUP BY card_id, card_sn HAVING COUNT(*) > 1
+            ), pairs AS (
+                SELECT b.card_id, b.card_sn, (b.last_at - b.first_at) / ? AS days,
+                    (SELECT id FROM snapshots WHERE card_id = b.card_id AND card_sn = b.card_sn AND taken_at = b.first_at) AS first_id,
+                    (SELECT id FROM snapshots WHERE card_id = b.card_id AND card_sn = b.card_sn AND taken_at = b.last_at) AS last_id
+                FROM bounds b
+            )
+            SELECT p.card_id, p.card_sn, l.layer, l.layer_id, l.bit, l.count - COALESCE(f.count, 0) AS growth, p.days
+            FROM pairs p
+            JOIN counts l ON l.snapshot_id = p.last_id
+            LEFT JOIN counts f ON f.snapshot_id = p.first_id AND f.layer = l.layer AND f.layer_id = l.layer_id AND f.bit = l.bit
+            ORDER BY growth DESC LIMIT ?
+            """,
+            (since, SECONDS_PER_DAY, -1 if limit is None else limit),
+        ).fetchall()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbindexer.py
+# Description:  Background catalog of the configured PXI Card folders
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbinventory import PiDbInventory
+from .pidbcache import default_cache_dir
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+import hashlib
+import os
+
+# QSettings keys of the indexed folders (PircSettingsDialog)
+INDEX_SETTINGS = ("path_pilpxidb", "path_pillxidb", "path_ebirst")
+
+# rescan interval of the indexed folders, only changed files are read again
+INDEX_INTERVAL_MS = 60000
+
+def catalog_index_path(root):
+    """Return the per-user catalog index of a folder, the folders themselves may be read-only."""
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(default_cache_dir(), "catalog", f"{digest}.json")
+
+#
+# class DbIndexSignals (QRunnable is not a QObject)
+#
+class PiDbIndexSignals(QObject):
+
+    catalog_changed = pyqtSignal(list, list)  # (file path, entry) of new/changed cards, removed/changed file paths
+    indexing_finished = pyqtSignal(int, int, int)  # catalogued cards, scanned files, failed files
+
+#
+# class DbIndexTask
+#
+class PiDbIndexTask(QRunnable):
+
+    def __init__(self, inventories):
+        super().__init__()
+        self.setAutoDelete(False)  # owned by the Python side (PiDbIndexer)
+        self.inventories = inventories
+        self.signals = PiDbIndexSignals()
+
+    def run(self):
+        """QThreadPool entry point."""
+        self.index_folders()
+
+    def index_folders(self):
+        """Rescan the changed files of every folder and emit the catalog changes."""
+        cards = scanned = failed = 0
+        for inventory in self.inventories:
+            # an unreachable share keeps its catalog
+            if not os.path.isdir(inventory.root):
+                cards += len(inventory.entries)
+                continue
+
+            before = inventory.entries
+            inventory.scan()
+            if inventory.changed:
+                try:
+                    os.makedirs(os.path.dirname(inventory.index_path), exist_ok=True)
+                    inventory.save()
+                except OSError:
+                    pass  # saved again with the next change
+
+            # unchanged files keep their entry object
+            after = inventory.entries
+            removed = [os.path.join(inventory.root, path) for path, entry in before.items() if after.get(path) is not entry]
+            changed = [(os.path.join(inventory.root, path), entry) for path, entry in after.items() if before.get(path) is not entry]
+            if removed or changed:
+                self.signals.catalog_changed.emit(changed, removed)
+
+            cards += len(after)
+            scanned += inventory.scanned
+            failed += len(inventory.errors)
+
+        self.signals.indexing_finished.emit(cards, scanned, failed)
+
+#
+# class DbIndexer
+#
+class PiDbIndexer(QObject):
+
+    catalog_changed = pyqtSignal(list, list)  # (file path, entry) of new/changed cards, removed/changed file paths
+    indexing_finished = pyqtSignal(int, int, int)  # catalogued cards, scanned files, failed files
+
+    def __init__(self, interval=INDEX_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)  # one scan at a time, card parsing has its own pool
+        self.inventories = []
+        self.task = None  # running scan
+        self.stale = False  # the running scan indexes folders replaced meanwhile
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+
+    def set_folders(self, folders):
+        """Index the folders, returns the (file path, entry) cards of their saved catalogs.
+
+        A running scan of the previous folders is discarded, the new folders
+        are scanned as soon as it ends.
+        """
+        self.stale = self.task is not None
+        self.inventories = []
+        cards = []
+        for root in dict.fromkeys(os.path.abspath(folder) for folder in folders if folder):
+            inventory = PiDbInventory(root, catalog_index_path(root))
+            inventory.load()
+            self.inventories.append(inventory)
+            cards.extend(inventory.cards())
+        return cards
+
+    def catalog_files(self):
+        """Return the file paths of the catalogued cards."""
+        return {file_path for inventory in self.inventories for file_path, _ in inventory.cards()}
+
+    def start(self):
+        """Scan the folders now and then every interval."""
+        self.refresh()
+        self.timer.start()
+
+    def stop(self):
+        """Stop the rescans and wait for the running one (application exit)."""
+        self.timer.stop()
+        self.thread_pool.waitForDone()
+
+    def is_indexing(self):
+        return self.task is not None
+
+    def refresh(self):
+        """Start a background scan of the folders unless one is running."""
+        if self.task is not None or not self.inventories:
+            return
+
+        self.stale = False
+        self.task = PiDbIndexTask(list(self.inventories))
+        self.task.signals.catalog_changed.connect(self.on_catalog_changed)
+        self.task.signals.indexing_finished.connect(self.on_indexing_finished)
+        self.thread_pool.start(self.task)
+
+    def on_catalog_changed(self, cards, removed_files):
+        if self.stale:
+            # cards of the folders no longer indexed are not reported
+            roots = tuple(os.path.join(inventory.root, "") for inventory in self.inventories)
+            cards = [(file_path, entry) for file_path, entry in cards if file_path.startswith(roots)]
+        if cards or removed_files:
+            self.catalog_changed.emit(cards, removed_files)
+
+    def on_indexing_finished(self, cards, scanned, failed):
+        self.task = None
+        if self.stale:
+            self.refresh()  # the new folders, not waiting for the next interval
+            return
+        self.indexing_finished.emit(cards, scanned, failed)
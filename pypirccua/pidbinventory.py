@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbinventory.py
+# Description:  Header-only inventory of PXI Card files (sidecar index)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbcard import PiDbCard
+from .pidbarchive import is_card_name, source_path
+from .piprofiler import profiler
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+INVENTORY_VERSION = 1
+
+# sidecar index written into the catalogued directory
+INVENTORY_FILE = ".pypirccua-inventory.json"
+
+def inventory_path(root):
+    """Return the sidecar index path of a directory."""
+    return os.path.join(root, INVENTORY_FILE)
+
+def find_card_files(root):
+    """Find card files (*.db, *.pirc, also compressed) in a directory tree, paths relative to root."""
+    files = []
+    for directory, _, names in os.walk(root):
+        relative = os.path.relpath(directory, root)
+        files.extend(
+            os.path.normpath(os.path.join(relative, name)) for name in names
+            if is_card_name(name)
+        )
+    return sorted(files)
+
+def scan_card(file_path):
+    """Return the inventory entry of a card file (header-only scan)."""
+    # stat first, a file changed while scanning is rescanned next time
+    stat = os.stat(source_path(file_path))
+    card_data = PiDbCard(file_path).scan_header()
+    if not card_data["header"]:
+        raise ValueError("missing PILPXIDB header")
+
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "header": card_data["header"],
+        "generation": card_data["generation"],
+        "subunits": len(card_data["subunits"]),
+        "loops": len(card_data["physical_layers"]),
+    }
+
+def file_stat(file_path):
+    """Return (size, mtime_ns) of a file, None when it is gone."""
+    try:
+        stat = os.stat(source_path(file_path))
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def scan_worker(file_path):
+    """Scan one card in a worker thread, returns (entry, error)."""
+    try:
+        return scan_card(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+#
+# class DbInventory
+#
+class PiDbInventory:
+
+    def __init__(self, root, index_path=None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or inventory_path(self.root)
+        self.entries = {}  # path relative to root -> entry
+        self.errors = {}  # path relative to root -> error message
+        self.failed = {}  # path relative to root -> (size, mtime_ns) of the failed scan
+        self.scanned = 0  # files (re)scanned by the last scan
+        self.changed = False  # entries differ from the saved index
+
+    def load(self):
+        """Load the saved index, a missing or outdated index loads empty."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return self.entries
+
+        if index.get("version") == INVENTORY_VERSION:
+            self.entries = index.get("cards", {})
+        return self.entries
+
+    def save(self):
+        """Write the index next to the cards (atomically replaced)."""
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": INVENTORY_VERSION, "cards": self.entries}, file, separators=(",", ":"))
+        os.replace(temp_path, self.index_path)
+        self.changed = False
+
+    def stale_files(self, files):
+        """Return the files that are new or changed (size/mtime) since their entry or failed scan."""
+        stale = []
+        for relative_path in files:
+            entry = self.entries.get(relative_path)
+            if entry is not None:
+                known = entry["size"], entry["mtime_ns"]
+            else:
+                known = self.failed.get(relative_path)
+            if known is not None and known == file_stat(os.path.join(self.root, relative_path)):
+                continue
+            stale.append(relative_path)
+        return stale
+
+    def scan(self, workers=None):
+        """Catalogue the directory tree, only new and changed files are scanned.
+
+        The header scans run on a thread pool (a few hundred bytes read per
+        card), entries of removed files are dropped.
+        """
+        with profiler.timer("inventory"):
+            files = find_card_files(self.root)
+            stale = self.stale_files(files)
+
+            # failed files are only read again once they change
+            listed = set(files) - set(stale)
+            entries = {path: entry for path, entry in self.entries.items() if path in listed}
+            self.changed = len(entries) != len(self.entries)
+            self.errors = {path: error for path, error in self.errors.items() if path in listed}
+            self.failed = {path: stat for path, stat in self.failed.items() if path in listed}
+
+            paths = [os.path.join(self.root, relative_path) for relative_path in stale]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for relative_path, path, (entry, error) in zip(stale, paths, pool.map(scan_worker, paths)):
+                    if error is not None:
+                        self.errors[relative_path] = error
+                        self.failed[relative_path] = file_stat(path)
+                        continue
+                    entries[relative_path] = entry
+
+            self.entries = dict(sorted(entries.items()))
+            self.scanned = len(stale)
+            self.changed = self.changed or bool(stale)
+        profiler.count("inventory scanned", self.scanned)
+        return self.entries
+
+    def update(self, workers=None):
+        """Load the saved index, scan the changes and save it when changed."""
+        self.load()
+        self.scan(workers)
+        if self.changed:
+            self.save()
+        return self.entries
+
+    def cards(self):
+        """Yield (file path, entry) of the catalogued cards, entries work as card_data for the card list."""
+        for relative_path, entry in self.entries.items():
+            yield os.path.join(self.root, relative_path), entry
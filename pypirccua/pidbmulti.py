@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbmulti.py
+# Description:  Parallel reader of concatenated multi-card *.db dumps
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbcard import PiDbCard
+from .pidbreader import BINARY_MAGIC
+from .pidbtokenizer import HeaderRecord, iter_records
+from .pidbarchive import open_stream, is_compressed, read_card_bytes
+
+from contextlib import ExitStack
+from collections import deque
+import mmap
+import os
+
+# every card of a dump starts with its 'PILPXIDB<version>;...' header line
+CARD_MAGIC = b"PILPXIDB"
+
+def find_card_chunks(buffer):
+    """Return the (start, end) byte ranges of the cards in a buffer (bytes or mmap).
+
+    A card runs from its header line up to the next header line, so its
+    'E;EOF' and a missing one are both handled. Bytes before the first
+    header are skipped.
+    """
+    starts = []
+    position = buffer.find(CARD_MAGIC)
+    while position != -1:
+        if position == 0 or buffer[position - 1:position] == b"\n":
+            starts.append(position)
+        position = buffer.find(CARD_MAGIC, position + len(CARD_MAGIC))
+    return list(zip(starts, starts[1:] + [len(buffer)]))
+
+def card_chunks(file_path):
+    """Return the card byte ranges of a dump, [] for binary or empty files."""
+    with open(file_path, "rb") as file:
+        if not os.fstat(file.fileno()).st_size or file.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return find_card_chunks(buffer)
+
+def parse_chunk(file_path, start, end, data=None):
+    """Parse one card of a dump (in a worker process), data holds the bytes of a decompressed card."""
+    return PiDbCard(file_path).parse_chunk(start, end, data)
+
+def map_chunk(func, file_path, start, end, data=None):
+    """Parse one card and return func(card_data) (in a worker process)."""
+    return func(parse_chunk(file_path, start, end, data))
+
+def iter_stream_cards(file_path, stream=None):
+    """Yield the card_data of every card of a (compressed) text dump as it is decompressed.
+
+    Only the card being parsed is held in memory, line numbers count from
+    the start of the dump. A dump without any header yields one empty card.
+    stream is an already open stream of the dump (an archive member).
+    """
+    with ExitStack() as stack:
+        if stream is None:
+            stream = stack.enter_context(open_stream(file_path))
+
+        card = PiDbCard(file_path)
+        cards = 0
+        for record in iter_records(line.decode("utf-8", errors="replace") for line in stream):
+            if type(record) is HeaderRecord and card.card_data["header"]:
+                yield card.card_data
+                card = PiDbCard(file_path)
+                cards += 1
+            card.add_record(record)
+    if card.card_data["header"] or not cards:
+        yield card.card_data
+
+def ordered_map(pool, func, tasks, window):
+    """Ordered pool map that keeps at most window tasks in flight (bounded memory)."""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(func, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+#
+# class DbMultiCard
+#
+class PiDbMultiCard:
+
+    def __init__(self, file_path, workers=None, pool=None):
+        self.file_path = file_path
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = pool  # process pool of the caller (fleet), else one is started per run
+        self.data = None  # decompressed bytes of a compressed dump
+        if is_compressed(file_path):
+            # decompressed once, the workers get the bytes of their card
+            self.data = read_card_bytes(file_path)
+            self.chunks = find_card_chunks(self.data)
+        else:
+            self.chunks = card_chunks(file_path)  # (start, end) byte range of every card
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def in_process(self):
+        """Return True when the cards are parsed in this process (no pool)."""
+        return (self.pool is None and self.workers == 1) or len(self.chunks) == 1
+
+    def tasks(self):
+        """Yield the (file_path, start, end, data) parse task of every card.
+
+        Tasks are made as the pool takes them, a compressed dump hands its
+        bytes as they are to the in-process parse and one card at a time to
+        the worker processes.
+        """
+        for start, end in self.chunks:
+            if self.data is None:
+                yield self.file_path, start, end, None
+            elif self.in_process():
+                yield self.file_path, start, end, self.data
+            else:
+                yield self.file_path, 0, None, self.data[start:end]
+
+    def run(self, func, tasks):
+        """Run func over the tasks in file order, on a process pool when it pays off."""
+        if self.in_process():
+            for task in tasks:
+                yield func(*task)
+            return
+
+        if self.pool is not None:
+            yield from ordered_map(self.pool, func, tasks, self.workers * 2)
+            return
+
+        # deferred, single card dumps never start a pool
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            yield from ordered_map(pool, func, tasks, self.workers * 2)
+
+    def iter_cards(self):
+        """Yield the card_data of every card in file order, the cards are parsed in parallel.
+
+        Parsed cards are pickled back to this process, use map_cards to reduce
+        big cards in the workers instead.
+        """
+        return self.run(parse_chunk, self.tasks())
+
+    def parse_cards(self):
+        """Return the card_data list of all cards."""
+        return list(self.iter_cards())
+
+    def map_cards(self, func):
+        """Yield func(card_data) of every card in file order, func runs in the workers (picklable)."""
+        return self.run(map_chunk, ((func,) + task for task in self.tasks()))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbreader.py
+# Description:  *.db (Database) PXI Card memory-mapped reader
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbtokenizer import RelayRecord, new_record, tokenize_line
+from .pidbarchive import open_stream, source_path, is_compressed, read_card_bytes
+from .piprofiler import profiler
+
+from collections import OrderedDict
+from array import array
+import threading
+import mmap
+import os
+import re
+
+NEWLINE_PATTERN = re.compile(b"\n")
+
+# relay layer type bytes -> layer type
+LAYER_TYPES = {b"L": "L", b"P": "P"}
+
+# first bytes of a binary (columnar) card file, see pidbbinary
+BINARY_MAGIC = b"PIRCBIN1"
+
+# number of mapped files kept open by open_reader
+MAX_OPEN_READERS = 4
+
+def tokenize_relay_bytes(line):
+    """Bytes version of tokenize_relay, the line never becomes a str."""
+    fields = line.split(b";", 4)
+    layer_type = LAYER_TYPES.get(fields[1]) if len(fields) > 3 else None
+    if layer_type is None:
+        return None
+
+    layer_ref, _, bit = fields[2].partition(b"BIT")
+    try:
+        layer_id, bit, count = int(layer_ref[1:]), int(bit), int(fields[3])
+    except ValueError:
+        return None
+
+    if layer_id < 0 or bit < 0 or count < 0:
+        return None
+    return layer_type, layer_id, bit, count
+
+def is_binary_card(file_path):
+    """Return True when the file (or its decompressed stream) starts with the binary card magic."""
+    with open_stream(file_path) as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+#
+# class DbReader
+#
+class PiDbReader:
+
+    def __init__(self, file_path, start=0, end=None, data=None):
+        self.file_path = file_path
+        with profiler.timer("read"):
+            if data is not None:
+                # card bytes already in memory (a chunk of a compressed dump)
+                self.signature = None
+                self.buffer = data
+            elif is_compressed(file_path):
+                stat = os.stat(source_path(file_path))
+                self.signature = (stat.st_size, stat.st_mtime_ns)
+                self.buffer = read_card_bytes(file_path)
+            else:
+                with open(file_path, "rb") as file:
+                    stat = os.fstat(file.fileno())
+                    self.signature = (stat.st_size, stat.st_mtime_ns)
+                    # mmap keeps its own handle, the file object can be closed
+                    self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+            # one card of a concatenated dump is read in place, line numbers start at the chunk
+            self.start = start
+            self.end = len(self.buffer) if end is None else min(end, len(self.buffer))
+            # binary cards have no text lines
+            self.offsets = array("Q", [self.start]) if self.is_binary() else self.scan_offsets()
+        profiler.count("bytes read", self.end - self.start)
+
+    def scan_offsets(self):
+        """Single pass over the bytes, returns the start offset of every line (+ end of the range)."""
+        offsets = array("Q", [self.start])
+        offsets.extend(match.end() for match in NEWLINE_PATTERN.finditer(self.buffer, self.start, self.end))
+
+        if offsets[-1] != self.end:
+            offsets.append(self.end)  # last line without a newline
+        return offsets
+
+    def is_binary(self):
+        """Return True for a binary (columnar) card file."""
+        return self.buffer[self.start:self.start + len(BINARY_MAGIC)] == BINARY_MAGIC
+
+    def line_count(self):
+        return len(self.offsets) - 1
+
+    def line_bytes(self, line_no):
+        """Return the raw bytes of a line (without the line break)."""
+        return self.buffer[self.offsets[line_no]:self.offsets[line_no + 1]].rstrip(b"\r\n")
+
+    def line(self, line_no):
+        """Return a line as text."""
+        return self.line_bytes(line_no).decode("utf-8", "replace")
+
+    def iter_records(self):
+        """Yield the typed records of the buffer, relay lines are tokenized as bytes."""
+        buffer = self.buffer
+        offsets = self.offsets
+        start = offsets[0]
+        for line_no in range(len(offsets) - 1):
+            end = offsets[line_no + 1]
+            line = buffer[start:end].strip()
+            start = end
+            if not line:
+                continue
+
+            # relay records first, they are the bulk of the file
+            if line[0] == 0x52:  # 'R'
+                token = tokenize_relay_bytes(line)
+                if token:
+                    yield new_record(RelayRecord, (line_no,) + token)
+                continue
+
+            record = tokenize_line(line.decode("utf-8", "replace"), line_no)
+            if record:
+                yield record
+
+    def is_mapped(self):
+        return isinstance(self.buffer, mmap.mmap)
+
+    def is_current(self):
+        """Return True while the file has the size and mtime it was read with."""
+        if self.signature is None:
+            return True
+        try:
+            stat = os.stat(source_path(self.file_path))
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == self.signature
+
+    def close(self):
+        if self.is_mapped():
+            self.buffer.close()
+
+# readers shared by the parser and the raw-line view
+open_readers = OrderedDict()
+open_readers_lock = threading.Lock()
+
+def open_reader(file_path):
+    """Return a (shared) PiDbReader of the file, remapped when the file changed."""
+    key = os.path.abspath(file_path)
+    stat = os.stat(source_path(file_path))
+    signature = (stat.st_size, stat.st_mtime_ns)
+
+    with open_readers_lock:
+        reader = open_readers.get(key)
+        if reader is not None and reader.signature == signature:
+            open_readers.move_to_end(key)
+            return reader
+
+    reader = PiDbReader(file_path)
+    with open_readers_lock:
+        open_readers[key] = reader
+        open_readers.move_to_end(key)
+        # closed mappings are released by the garbage collector once unused
+        while len(open_readers) > MAX_OPEN_READERS:
+            open_readers.popitem(last=False)
+    return reader
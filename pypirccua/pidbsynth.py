@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbdiff.py
+# Description:  Synthetic *.db (Database) PXI Card generator for load testing
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import sys
+
+import numpy as np
+
+# relay count distributions of synth_counts
+DISTRIBUTIONS = ("uniform", "exponential", "lognormal", "zipf", "constant")
+
+# relay records generated (and formatted) at once, bounds the memory use
+CHUNK_SIZE = 65536
+
+def parse_geometry(text):
+    """Parse a 'ROWSxCOLS' geometry into (rows, cols)."""
+    rows, _, cols = text.lower().partition("x")
+    rows, cols = int(rows), int(cols or 1)
+    if rows < 1 or cols < 1:
+        raise ValueError(f"invalid geometry {text}")
+    return rows, cols
+
+def synth_counts(rng, size, distribution="uniform", max_count=1000000):
+    """Draw size relay counts in [0, max_count] from a distribution."""
+    if distribution == "uniform":
+        counts = rng.integers(0, max_count + 1, size)
+    elif distribution == "exponential":
+        counts = rng.exponential(max_count / 10, size)
+    elif distribution == "lognormal":
+        counts = rng.lognormal(np.log(max(max_count, 10) / 10), 1.0, size)
+    elif distribution == "zipf":
+        counts = rng.zipf(1.5, size)
+    elif distribution == "constant":
+        counts = np.full(size, max_count)
+    else:
+        raise ValueError(f"unknown distribution {distribution}")
+    return np.minimum(counts, max_count).astype(np.uint64)
+
+def subunit_record(layer_id, rows, cols):
+    """Format the S; record of a generated subunit (layer_id is 1-based)."""
+    if cols > 1:
+        sub_type, u2, description = 5, 5, f"MATRIXR({rows}X{cols})"
+    else:
+        sub_type, u2, description = 2, 1, f"MUX({rows})"
+    return f"S;{layer_id - 1};{sub_type};{rows};{cols};{rows * cols};{u2};{description}\n"
+
+def relay_records(rng, layer_ref, first_bit, size, fill, distribution, max_count):
+    """Yield chunks of R; records of one layer, only fill of the bits are written."""
+    for start in range(0, size, CHUNK_SIZE):
+        num = min(CHUNK_SIZE, size - start)
+        counts = synth_counts(rng, num, distribution, max_count)
+        bits = np.arange(first_bit + start, first_bit + start + num)
+        if fill < 1.0:
+            present = rng.random(num) < fill
+            bits, counts = bits[present], counts[present]
+        yield "".join([f"R;{layer_ref}BIT{bit};{count};\n" for bit, count in zip(bits.tolist(), counts.tolist())])
+
+def iter_card_lines(rng, geometries, loops=(), card_id="40-000-SYNTH", card_sn="1000000", fw_version="1.00",
+                    generation=1, distribution="uniform", max_count=1000000, fill=1.0):
+    """Yield the text of one card in chunks (constant memory).
+
+    geometries are the (rows, cols) of the subunits, loops the relay
+    allocation of each physical loop.
+    """
+    loops = list(loops)
+    yield f"PILPXIDB004;{card_id},{card_sn},{fw_version}\n"
+    yield f"G;{generation}\n"
+    if loops:
+        yield f"A;3;Loops;{len(loops)};{','.join(map(str, loops))}\n"
+    yield f"L;{len(geometries)}\n"
+    yield "".join(subunit_record(layer_id, rows, cols) for layer_id, (rows, cols) in enumerate(geometries, 1))
+    yield "H;RelayNs;Relay;Counter;Note\n"
+
+    # logical bits are 1-based, physical bits 0-based
+    for layer_id, (rows, cols) in enumerate(geometries, 1):
+        yield from relay_records(rng, f"L;S{layer_id}", 1, rows * cols, fill, distribution, max_count)
+    for loop_id, allocation in enumerate(loops):
+        yield from relay_records(rng, f"P;L{loop_id}", 0, allocation, fill, distribution, max_count)
+    yield "E;EOF\n"
+
+def write_synth(file, geometries, loops=(), cards=1, seed=None, **kwargs):
+    """Write one or more (concatenated) synthetic cards into a text file object.
+
+    Concatenated cards get consecutive serial numbers.
+    """
+    rng = np.random.default_rng(seed)
+    card_sn = int(kwargs.pop("card_sn", "1000000"))
+    for card in range(cards):
+        for chunk in iter_card_lines(rng, geometries, loops, card_sn=str(card_sn + card), **kwargs):
+            file.write(chunk)
+
+def write_synth_file(file_path, geometries, loops=(), cards=1, seed=None, **kwargs):
+    """Write synthetic cards into a file ('-' for stdout)."""
+    if file_path == "-":
+        write_synth(sys.stdout, geometries, loops, cards, seed, **kwargs)
+        return
+    with open(file_path, "w", newline="\n") as file:
+        write_synth(file, geometries, loops, cards, seed, **kwargs)
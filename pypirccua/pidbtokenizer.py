@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbtokenizer.py
+# Description:  *.db (Database) PXI Card line tokenizer
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import namedtuple
+import re
+
+# precompiled patterns for the (rare) non relay records
+HEADER_PATTERN = re.compile(r"(PILPXIDB[0-9]+);([^,]+),([0-9]+),([0-9.]+)")
+GENERATION_PATTERN = re.compile(r"G;([0-9]+)")
+ARCHITECTURE_PATTERN = re.compile(r"A;([0-9]+);([^;]+);([0-9]+);([^;]+)")
+SUBUNIT_PATTERN = re.compile(r"S;([0-9]+);([0-9]+);([0-9]+);([0-9]+);([0-9]+);([0-9]+);([^;]+)")
+
+# relay layer types
+LAYER_LOGICAL = "L"
+LAYER_PHYSICAL = "P"
+
+# typed records of a db file
+HeaderRecord = namedtuple("HeaderRecord", "line_no pilpxi_version card_id card_sn fw_version is_simulated")
+GenerationRecord = namedtuple("GenerationRecord", "line_no generation")
+ArchitectureRecord = namedtuple("ArchitectureRecord", "line_no loops description num_loops allocations")
+SubunitRecord = namedtuple("SubunitRecord", "line_no layer_id type rows cols num_components u2 description")
+RelayRecord = namedtuple("RelayRecord", "line_no layer_type layer_id bit count")
+EndRecord = namedtuple("EndRecord", "line_no")
+
+# skips the namedtuple __new__ argument handling on the relay hot path
+new_record = tuple.__new__
+
+def tokenize_relay(line):
+    """Split a 'R;L;S<n>BIT<b>;<count>' record into (layer_type, layer_id, bit, count).
+
+    Relay records make up nearly the whole file, so they are split with plain
+    str.split/partition instead of a regex. Returns None for malformed records.
+    """
+    fields = line.split(";", 4)
+    layer_type = fields[1] if len(fields) > 3 else None
+    if layer_type != LAYER_LOGICAL and layer_type != LAYER_PHYSICAL:
+        return None
+
+    # 'S1BIT12' or 'L0BIT12'
+    layer_ref, _, bit = fields[2].partition("BIT")
+    try:
+        layer_id, bit, count = int(layer_ref[1:]), int(bit), int(fields[3])
+    except ValueError:
+        return None
+
+    # int() also takes signs
+    if layer_id < 0 or bit < 0 or count < 0:
+        return None
+    return layer_type, layer_id, bit, count
+
+def tokenize_header(line, line_no):
+    """Tokenize the 'PILPXIDB<version>;<card_id>,<card_sn>,<fw_version>' line."""
+    match = HEADER_PATTERN.match(line)
+    if match:
+        pilpxi_version, card_id, card_sn, fw_version = match.groups()
+        pilpxi_version_num = int(pilpxi_version[-3:])  # extract numeric version
+
+        # determine if the card is simulated
+        is_simulated = card_sn.startswith("1000000")
+        return HeaderRecord(line_no, pilpxi_version_num, card_id, card_sn, fw_version, is_simulated)
+    return None
+
+def tokenize_generation(line, line_no):
+    """Tokenize the 'G;<generation>' line."""
+    match = GENERATION_PATTERN.match(line)
+    if match:
+        return GenerationRecord(line_no, int(match.group(1)))
+    return None
+
+def tokenize_architecture(line, line_no):
+    """Tokenize the 'A;<loops>;<description>;<num_loops>;<allocations>' line."""
+    match = ARCHITECTURE_PATTERN.match(line)
+    if match:
+        loops, description, num_loops, allocations = match.groups()
+        allocations = list(map(int, allocations.split(",")))
+        return ArchitectureRecord(line_no, int(loops), description, int(num_loops), allocations)
+    return None
+
+def tokenize_subunit(line, line_no):
+    """Tokenize the 'S;<id>;<type>;<rows>;<cols>;<components>;<u2>;<description>' line."""
+    match = SUBUNIT_PATTERN.match(line)
+    if match:
+        layer_id, sub_type, rows, cols, components, u2, description = match.groups()
+        return SubunitRecord(
+            line_no, int(layer_id) + 1, int(sub_type), int(rows), int(cols), int(components), int(u2), description
+        )
+    return None
+
+def tokenize_line(line, line_no):
+    """Tokenize one stripped line into its typed record, None when skipped."""
+    prefix = line[:1]
+    if prefix == "R":
+        token = tokenize_relay(line)
+        return new_record(RelayRecord, (line_no,) + token) if token else None
+    elif prefix == "P":
+        return tokenize_header(line, line_no)
+    elif prefix == "G":
+        return tokenize_generation(line, line_no)
+    elif prefix == "A":
+        return tokenize_architecture(line, line_no)
+    elif prefix == "S":
+        return tokenize_subunit(line, line_no)
+    elif prefix == "E":
+        return EndRecord(line_no)
+    return None
+
+def iter_records(lines):
+    """Yield the typed records of an iterable of lines (file, stdin, ...).
+
+    Works at constant memory, a concatenated dump yields a HeaderRecord
+    after each EndRecord.
+    """
+    for line_no, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+
+        # relay records first, they are the bulk of the file
+        if line[0] == "R":
+            token = tokenize_relay(line)
+            if token:
+                yield new_record(RelayRecord, (line_no,) + token)
+            continue
+
+        record = tokenize_line(line, line_no)
+        if record:
+            yield record
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pidbwatch.py
+# Description:  Watch a folder for new PXI Card dumps (inotify or polling)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbcard import PiDbCard
+from .pidbarray import layer_arrays, layer_statistics
+from .pidbinventory import file_stat
+from .pidbarchive import is_card_name
+from .pidbtokenizer import LAYER_LOGICAL, LAYER_PHYSICAL
+
+import ctypes.util
+import ctypes
+import select
+import struct
+import time
+import os
+
+import numpy as np
+
+# heatmap defaults: counts above the OK level warn, above the warning level are critical
+WATCH_RANGES = [100000, 100000000]
+
+# dumps picked up by the watch (also compressed, dump.db.gz)
+WATCH_EXTENSIONS = (".db",)
+
+# events arriving within this window are parsed as one batch
+BATCH_WINDOW = 0.2
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+# a dump is ready once it is closed after writing or moved in
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_STRUCT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+def is_dump(file_name):
+    return is_card_name(file_name, WATCH_EXTENSIONS)
+
+def find_dumps(root):
+    """Return the dumps of a directory tree."""
+    files = []
+    for directory, _, names in os.walk(root):
+        files.extend(os.path.join(directory, name) for name in names if is_dump(name))
+    return files
+
+def load_libc():
+    """Return libc with the inotify functions, None where inotify is not available."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+#
+# class Inotify (ctypes binding of inotify(7))
+#
+class PiInotify:
+
+    def __init__(self, root, libc=None):
+        self.libc = libc or load_libc()
+        if self.libc is None:
+            raise OSError("inotify is not available")
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # watch descriptor -> directory
+
+        try:
+            self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        self.watches[wd] = directory
+
+    def add_tree(self, root):
+        """Watch a directory and its subdirectories, returns the dumps already in them."""
+        files = []
+        for directory, _, names in os.walk(root):
+            self.add_watch(directory)
+            files.extend(os.path.join(directory, name) for name in names if is_dump(name))
+        return files
+
+    def read(self, timeout):
+        """Wait up to timeout seconds, returns the written dumps or None after a queue overflow."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        files = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return files
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_STRUCT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + EVENT_STRUCT.size:offset + EVENT_STRUCT.size + length].rstrip(b"\0"))
+                offset += EVENT_STRUCT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    return None  # events were lost, the caller rescans
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    # files copied with the directory were written before its watch
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        try:
+                            files.extend(self.add_tree(path))
+                        except OSError:
+                            pass  # removed right away
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_dump(name):
+                    files.append(path)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def card_alerts(card_data, ranges):
+    """Return (layer, layer_id, bit, count, level) of the relays above the OK level (vectorized)."""
+    ok_level, warning_level = ranges
+    alerts = []
+    layers = [(LAYER_LOGICAL, subunit["layer_id"], subunit) for subunit in card_data["subunits"]]
+    layers += [(LAYER_PHYSICAL, loop["loop_id"], loop) for loop in card_data["physical_layers"]]
+    for layer_type, layer_id, layer in layers:
+        counts, mask = layer_arrays(layer)
+        rows, cols = np.nonzero(mask & (counts > ok_level))
+        if not rows.size:
+            continue
+
+        values = counts[rows, cols]
+        # bits as in the R; records (logical 1-based, physical 0-based rows)
+        bits = rows * counts.shape[1] + cols + 1 if layer_type == LAYER_LOGICAL else rows
+        for bit, count in zip(bits.tolist(), values.tolist()):
+            alerts.append((layer_type, layer_id, bit, count, "critical" if count > warning_level else "warning"))
+    return alerts
+
+def watch_card(file_path, ranges=WATCH_RANGES):
+    """Parse one dump (in a worker process), returns (file_path, stats, alerts, error)."""
+    try:
+        card_data = PiDbCard(file_path).parse_file()
+        header = card_data["header"]
+        if not header:
+            raise ValueError("missing PILPXIDB header")
+
+        layers = card_data["subunits"] + card_data["physical_layers"]
+        statistics = [layer_statistics(layer) for layer in layers]
+        relays = sum(stats["relays"] for stats in statistics)
+        total = sum(stats["sum"] for stats in statistics)
+        alerts = card_alerts(card_data, ranges)
+        stats = {
+            "card_id": header["card_id"],
+            "card_sn": header["card_sn"],
+            "generation": card_data["generation"],
+            "relays": relays,
+            "max_count": max((stats["max"] for stats in statistics), default=0),
+            "mean_count": round(total / relays, 2) if relays else 0,
+            "total_count": total,
+            "warning": sum(alert[4] == "warning" for alert in alerts),
+            "critical": sum(alert[4] == "critical" for alert in alerts),
+        }
+        return file_path, stats, alerts, None
+    except Exception as e:
+        return file_path, None, None, str(e)
+
+#
+# class DbWatch
+#
+class PiDbWatch:
+
+    def __init__(self, root, ranges=WATCH_RANGES, use_inotify=True, poll_interval=2.0):
+        self.root = os.path.abspath(root)
+        self.ranges = list(ranges)
+        self.poll_interval = poll_interval
+        self.signatures = {}  # dump -> (size, mtime_ns) of its parsed version
+        self.pending = {}  # polling: dump -> signature seen by the last poll (still being written?)
+        self.alerted = {}  # (card_id, card_sn) -> alerted (layer, layer_id, bit, level)
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = PiInotify(self.root)
+            except OSError:
+                pass  # polling fallback (no inotify, watch limit reached, ...)
+
+    def mode(self):
+        return "inotify" if self.inotify else "polling"
+
+    def close(self):
+        if self.inotify:
+            self.inotify.close()
+
+    def skip_existing(self):
+        """Take the dumps already in the folder as parsed, only later changes are reported."""
+        for file_path in find_dumps(self.root):
+            self.signatures[file_path] = file_stat(file_path)
+
+    def changed(self, file_paths):
+        """Return the dumps whose size/mtime differ from their parsed version (each once)."""
+        changed = []
+        for file_path in dict.fromkeys(file_paths):
+            signature = file_stat(file_path)
+            if signature is not None and self.signatures.get(file_path) != signature:
+                changed.append(file_path)
+        return changed
+
+    def poll(self):
+        """Return the changed dumps whose size/mtime did not move since the previous poll."""
+        ready = []
+        pending = {}
+        for file_path in find_dumps(self.root):
+            signature = file_stat(file_path)
+            if signature is None or self.signatures.get(file_path) == signature:
+                continue
+            if self.pending.get(file_path) == signature:
+                ready.append(file_path)
+            else:
+                pending[file_path] = signature
+        self.pending = pending
+        return sorted(ready)
+
+    def wait_changes(self, timeout=None):
+        """Block until dumps were written, returns the changed ones (one batch)."""
+        timeout = self.poll_interval if timeout is None else timeout
+        if self.inotify is None:
+            time.sleep(timeout)
+            return self.poll()
+
+        files = self.inotify.read(timeout)
+        if files:
+            # collect the rest of a burst
+            deadline = time.monotonic() + BATCH_WINDOW
+            while files is not None and time.monotonic() < deadline:
+                more = self.inotify.read(max(0.0, deadline - time.monotonic()))
+                files = None if more is None else files + more
+        if files is None:
+            files = find_dumps(self.root)
+        return self.changed(files)
+
+    def card_records(self, file_path, stats, alerts):
+        """Return the NDJSON records of a parsed dump, only new alerts of the card are included."""
+        now = time.time()
+        records = [dict({"event": "card", "time": now, "file": file_path}, **stats)]
+
+        key = (stats["card_id"], stats["card_sn"])
+        alerted = self.alerted.setdefault(key, set())
+        for layer_type, layer_id, bit, count, level in alerts:
+            alert_key = (layer_type, layer_id, bit, level)
+            if alert_key in alerted:
+                continue
+            alerted.add(alert_key)
+            records.append({
+                "event": "alert", "time": now, "file": file_path, "card_id": key[0], "card_sn": key[1],
+                "layer": layer_type, "layer_id": layer_id, "bit": bit, "count": count, "level": level,
+            })
+        return records
+
+    def process(self, file_paths, pool=None):
+        """Parse the dumps (on the process pool) and yield their NDJSON records in file order."""
+        # signatures before parsing, a dump rewritten meanwhile is parsed again
+        signatures = {file_path: file_stat(file_path) for file_path in file_paths}
+        if pool is not None and len(file_paths) > 1:
+            results = pool.map(watch_card, file_paths, [self.ranges] * len(file_paths))
+        else:
+            results = (watch_card(file_path, self.ranges) for file_path in file_paths)
+
+        for file_path, stats, alerts, error in results:
+            # parsed (or reported) once per version of the dump
+            self.signatures[file_path] = signatures[file_path]
+            if error is not None:
+                yield {"event": "error", "time": time.time(), "file": file_path, "error": error}
+                continue
+            yield from self.card_records(file_path, stats, alerts)
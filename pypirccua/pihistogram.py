@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pihistogram.py
+# Description:  Lightweight QPainter histogram and bar chart widget
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .piprofiler import profiler
+
+from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QPainter, QPen, QColor, QBrush
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+
+BAR_BRUSH = QBrush(QColor(0, 0, 255, 180))
+BAR_PEN = QPen(QColor(0, 0, 0))
+MEAN_PEN = QPen(QColor(255, 0, 0), 1.5, Qt.DashLine)
+
+def format_value(value):
+    """Short axis label of a number (4.42k, 9.75M)."""
+    for scale, suffix in ((1e9, "G"), (1e6, "M"), (1e3, "k")):
+        if abs(value) >= scale:
+            return f"{value / scale:.3g}{suffix}"
+    return f"{value:.3g}"
+
+#
+# class PiHistogram - histogram (bin edges) or bar chart (labels) painted with
+# QPainter, its data is computed when it is first painted
+#
+class PiHistogram(QWidget):
+
+    def __init__(self, data_func, title="", x_label="", y_label="", parent=None):
+        """data_func() returns a dict: heights, edges or labels, optional mean."""
+        super().__init__(parent)
+        self.data_func = data_func
+        self.data = None
+        self.title = title
+        self.x_label = x_label
+        self.y_label = y_label
+
+        self.setMinimumSize(240, 160)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def histogram_data(self):
+        """Return the plotted data, computed on first use."""
+        if self.data is None:
+            with profiler.timer("histogram"):
+                self.data = self.data_func()
+        return self.data
+
+    def paintEvent(self, event):
+        data = self.histogram_data()
+        heights = [float(height) for height in data["heights"]]
+
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        line = painter.fontMetrics().height()
+
+        # plot area inside the title, axis labels and tick labels
+        plot = QRectF(line * 4, line * 1.5, self.width() - line * 5, self.height() - line * 4.5)
+        if plot.width() <= 0 or plot.height() <= 0 or not heights:
+            return
+
+        painter.drawText(QRectF(0, 0, self.width(), line * 1.5), Qt.AlignCenter, self.title)
+        painter.drawText(QRectF(0, self.height() - line * 1.2, self.width(), line), Qt.AlignCenter, self.x_label)
+        painter.save()
+        painter.translate(line * 0.2, plot.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-plot.height() / 2, 0, plot.height(), line), Qt.AlignCenter, self.y_label)
+        painter.restore()
+
+        # bars
+        top = max(max(heights), 1.0)
+        width = plot.width() / len(heights)
+        painter.setPen(BAR_PEN)
+        painter.setBrush(BAR_BRUSH)
+        for i, height in enumerate(heights):
+            bar = height / top * plot.height()
+            painter.drawRect(QRectF(plot.left() + i * width, plot.bottom() - bar, width, bar))
+
+        # axes and ticks
+        painter.drawLine(plot.bottomLeft(), plot.bottomRight())
+        painter.drawLine(plot.bottomLeft(), plot.topLeft())
+        tick = QRectF(0, 0, line * 3.6, line)
+        painter.drawText(tick.translated(0, plot.top() - line / 2), Qt.AlignRight, format_value(top))
+        painter.drawText(tick.translated(0, plot.bottom() - line / 2), Qt.AlignRight, "0")
+
+        edges = data.get("edges")
+        labels = data.get("labels")
+        if edges is not None and len(edges) > 1:
+            self.paint_edges(painter, plot, line, float(edges[0]), float(edges[-1]), data.get("mean"))
+        elif labels:
+            self.paint_labels(painter, plot, line, labels, width)
+
+    def paint_edges(self, painter, plot, line, first, last, mean):
+        """Tick labels of a continuous x axis and the mean line."""
+        label = QRectF(0, plot.bottom() + 2, line * 6, line)
+        painter.drawText(label.translated(plot.left(), 0), Qt.AlignLeft, format_value(first))
+        painter.drawText(label.translated(plot.right() - label.width(), 0), Qt.AlignRight, format_value(last))
+        if mean is None or last <= first:
+            return
+
+        x = plot.left() + (mean - first) / (last - first) * plot.width()
+        painter.setPen(MEAN_PEN)
+        painter.drawLine(QPointF(x, plot.top()), QPointF(x, plot.bottom()))
+        painter.drawText(
+            QRectF(plot.left(), 0, plot.width(), line * 1.5), Qt.AlignRight | Qt.AlignVCenter, f"Mean: {mean:.2f}"
+        )
+
+    def paint_labels(self, painter, plot, line, labels, width):
+        """Category labels under the bars, thinned out when they do not fit."""
+        metrics = painter.fontMetrics()
+        widest = max(metrics.horizontalAdvance(str(label)) for label in labels) + 4
+        step = max(1, int(widest // width) + 1)
+        for i in range(0, len(labels), step):
+            painter.drawText(
+                QRectF(plot.left() + i * width - widest / 2 + width / 2, plot.bottom() + 2, widest, line),
+                Qt.AlignCenter, str(labels[i])
+            )
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         piprofiler.py
+# Description:  Named timers and counters of the hot paths (--profile)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import threading
+import time
+import json
+import os
+
+# set to a non-empty value (not '0') to enable the profiler
+PROFILE_ENV = "PYPIRCCUA_PROFILE"
+
+def profile_env_enabled():
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+#
+# class Profiler - named timers and counters, a no-op while disabled
+#
+class PiProfiler:
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timers = {}  # name -> [calls, total seconds, max seconds]
+        self.counters = {}  # name -> value
+        self.lock = threading.Lock()  # cards are parsed on worker threads
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def timer(self, name):
+        """Return a context manager timing its block under name."""
+        if not self.enabled:
+            return nullcontext()
+        return self.timed_block(name)
+
+    @contextmanager
+    def timed_block(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def count(self, name, value=1):
+        """Add value to the counter name."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """Return the timers and counters as a json-ready dict."""
+        with self.lock:
+            return {
+                "timers": {
+                    name: {"calls": calls, "total": total, "mean": total / calls, "max": longest}
+                    for name, (calls, total, longest) in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def summary_lines(self):
+        """Format the summary as a table."""
+        summary = self.summary()
+        lines = [f"{'Timer':<32} {'Calls':>7} {'Total ms':>10} {'Mean ms':>10} {'Max ms':>10}", "-" * 73]
+        for name, timer in summary["timers"].items():
+            lines.append(
+                f"{name:<32} {timer['calls']:>7} {timer['total'] * 1000:>10.2f} "
+                f"{timer['mean'] * 1000:>10.2f} {timer['max'] * 1000:>10.2f}"
+            )
+        lines.append("")
+        lines.append(f"{'Counter':<32} {'Value':>12}")
+        lines.append("-" * 45)
+        for name, value in summary["counters"].items():
+            lines.append(f"{name:<32} {value:>12}")
+        return lines
+
+    def status_text(self, names=None):
+        """One line summary (total ms per timer) for a status bar."""
+        summary = self.summary()["timers"]
+        names = names or list(summary)
+        return " | ".join(f"{name} {summary[name]['total'] * 1000:.1f} ms" for name in names if name in summary)
+
+    def save_json(self, file_path):
+        with open(file_path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+# shared profiler of the application
+profiler = PiProfiler(enabled=profile_env_enabled())
+
+def profiled(name):
+    """Decorator timing every call of a function under name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -23,39 +23,71 @@
 """
 
 from .pidbcard import PiDbCard
-import statistics
+from .pidbreader import is_binary_card
+from .pidbarray import layer_statistics
+from .pidbarchive import is_card_name, is_archive_name, is_compressed, expand_archives, source_path, split_member, cached_archives
 
-def pirc_generate_stats(file_path):
-    """Generate and display statistics for the file."""
-    parser = PiDbCard(file_path)
-    data = parser.parse_file()
+import functools
+import glob
+import time
+import json
+import csv
+import sys
+import os
+
+import numpy as np
+
+# commands other than stats/export-stats import their modules on use,
+# the stats startup only pays for the parser and numpy
 
-    print(f"Statistics for {file_path}:")
-    print("-" * 40)
+# dumps of this size are split card by card over the fleet pool, smaller
+# ones are split by the worker that parses them
+FLEET_SPLIT_BYTES = 64 * 1024 * 1024
+
+# fleet report columns, one row per card subunit/loop
+FLEET_COLUMNS = [
+    "File", "Card ID", "Card S/N", "Generation", "Layer", "Layer ID",
+    "Relays", "Max Count", "Mean Count", "Total Count", "Standard Deviation"
+]
+
+def pirc_layer_stats(layer):
+    """Return (max, mean, std) of a layer as shown by the cli."""
+    stats = layer_statistics(layer, ddof=1)
+    mean_count = round(stats["mean"], 2) if stats["relays"] else 0
+    std_dev = round(stats["std"], 2) if stats["relays"] > 1 else 0
+    return stats["max"], mean_count, std_dev
+
+def pirc_stats_lines(file_path, data):
+    """Format the statistics report of parsed card data into lines."""
+    lines = [f"Statistics for {file_path}:", "-" * 40]
 
     # Logical subunit statistics
-    print("Logical Layers:")
+    lines.append("Logical Layers:")
     for subunit in data.get("subunits", []):
-        relay_counts = list(subunit["relays"].values())
-        max_count = max(relay_counts, default=0)
-        mean_count = round(sum(relay_counts) / len(relay_counts), 2) if relay_counts else 0
-        std_dev = round(statistics.stdev(relay_counts), 2) if len(relay_counts) > 1 else 0
-        print(f"  Subunit {subunit['layer_id']}:")
-        print(f"    Max Relay Count: {max_count}")
-        print(f"    Mean Operations: {mean_count}")
-        print(f"    Standard Deviation: {std_dev}")
+        max_count, mean_count, std_dev = pirc_layer_stats(subunit)
+        lines.append(f"  Subunit {subunit['layer_id']}:")
+        lines.append(f"    Max Relay Count: {max_count}")
+        lines.append(f"    Mean Operations: {mean_count}")
+        lines.append(f"    Standard Deviation: {std_dev}")
 
     # Physical layer statistics
-    print("\nPhysical Layers:")
+    lines.append("\nPhysical Layers:")
     for loop in data.get("physical_layers", []):
-        relay_counts = list(loop["relays"].values())
-        max_count = max(relay_counts, default=0)
-        mean_count = round(sum(relay_counts) / len(relay_counts), 2) if relay_counts else 0
-        std_dev = round(statistics.stdev(relay_counts), 2) if len(relay_counts) > 1 else 0
-        print(f"  Loop {loop['loop_id']}:")
-        print(f"    Max Relay Count: {max_count}")
-        print(f"    Mean Operations: {mean_count}")
-        print(f"    Standard Deviation: {std_dev}")
+        max_count, mean_count, std_dev = pirc_layer_stats(loop)
+        lines.append(f"  Loop {loop['loop_id']}:")
+        lines.append(f"    Max Relay Count: {max_count}")
+        lines.append(f"    Mean Operations: {mean_count}")
+        lines.append(f"    Standard Deviation: {std_dev}")
+
+    return lines
+
+def pirc_generate_stats(file_path):
+    """Generate and display statistics for the file."""
+    parser = PiDbCard(file_path)
+    data = parser.parse_file()
+
+    for line in pirc_stats_lines(file_path, data):
+        print(line)
 
 
 def pirc_export_stats(file_path, output_file):
@@ -64,31 +96,478 @@ def pirc_export_stats(file_path, output_file):
     data = parser.parse_file()
 
     with open(output_file, "w") as file:
-        file.write(f"Statistics for {file_path}:\n")
-        file.write("-" * 40 + "\n")
-
-        # Logical subunit statistics
-        file.write("Logical Layers:\n")
-        for subunit in data.get("subunits", []):
-            relay_counts = list(subunit["relays"].values())
-            max_count = max(relay_counts, default=0)
-            mean_count = round(sum(relay_counts) / len(relay_counts), 2) if relay_counts else 0
-            std_dev = round(statistics.stdev(relay_counts), 2) if len(relay_counts) > 1 else 0
-            file.write(f"  Subunit {subunit['layer_id']}:\n")
-            file.write(f"    Max Relay Count: {max_count}\n")
-            file.write(f"    Mean Operations: {mean_count}\n")
-            file.write(f"    Standard Deviation: {std_dev}\n")
-
-        # Physical layer statistics
-        file.write("\nPhysical Layers:\n")
-        for loop in data.get("physical_layers", []):
-            relay_counts = list(loop["relays"].values())
-            max_count = max(relay_counts, default=0)
-            mean_count = round(sum(relay_counts) / len(relay_counts), 2) if relay_counts else 0
-            std_dev = round(statistics.stdev(relay_counts), 2) if len(relay_counts) > 1 else 0
-            file.write(f"  Loop {loop['loop_id']}:\n")
-            file.write(f"    Max Relay Count: {max_count}\n")
-            file.write(f"    Mean Operations: {mean_count}\n")
-            file.write(f"    Standard Deviation: {std_dev}\n")
-
-    print(f"Statistics exported to {output_file}")
\ No newline at end of file
+        for line in pirc_stats_lines(file_path, data):
+            file.write(line + "\n")
+
+    print(f"Statistics exported to {output_file}")
+
+
+def pirc_find_db_files(target):
+    """Find *.db files (also compressed and inside zip/tar archives) in a file, directory tree or glob pattern."""
+    if os.path.isfile(source_path(target)):
+        files = [target]  # a single (compressed) card, archive or archive member
+    elif os.path.isdir(target):
+        files = []
+        for root, _, names in os.walk(target):
+            files.extend(
+                os.path.join(root, name) for name in names
+                if is_card_name(name, (".db",)) or is_archive_name(name)
+            )
+    else:
+        files = [path for path in glob.glob(target, recursive=True) if os.path.isfile(path)]
+    return expand_archives(sorted(files))
+
+def pirc_card_rows(file_path, data):
+    """Build the fleet report rows of parsed card data."""
+    header = data.get("header")
+    if not header:
+        raise ValueError("missing PILPXIDB header")
+
+    rows = []
+    layers = [("Subunit", subunit["layer_id"], subunit) for subunit in data.get("subunits", [])]
+    layers += [("Loop", loop["loop_id"], loop) for loop in data.get("physical_layers", [])]
+    for name, layer_id, layer in layers:
+        max_count, mean_count, std_dev = pirc_layer_stats(layer)
+        stats = layer_statistics(layer)
+        rows.append([
+            file_path, header["card_id"], header["card_sn"], data.get("generation"), name, layer_id,
+            stats["relays"], max_count, mean_count, stats["sum"], std_dev
+        ])
+    return rows
+
+def pirc_fleet_rows(file_path, cards):
+    """Return (file_path, cards, rows, error) of parsed cards."""
+    rows = []
+    count = 0
+    for data in cards:
+        rows.extend(pirc_card_rows(file_path, data))
+        count += 1
+    return file_path, count, rows, None
+
+def pirc_fleet_archive(file_path):
+    """Parse all cards of an archive in one pass (a tar is decompressed once)."""
+    from .pidbmulti import iter_stream_cards
+    from .pidbreader import BINARY_MAGIC
+    from .pidbarchive import iter_archive_members
+
+    cards, rows, errors = 0, [], []
+    for path, stream in iter_archive_members(file_path):
+        try:
+            if stream.peek(len(BINARY_MAGIC)).startswith(BINARY_MAGIC):
+                _, count, card_rows, _ = pirc_fleet_rows(path, [PiDbCard(path).parse_file()])
+            else:
+                _, count, card_rows, _ = pirc_fleet_rows(path, iter_stream_cards(path, stream))
+        except Exception as e:
+            errors.append(f"{path}: {e}")
+            continue
+        cards += count
+        rows.extend(card_rows)
+
+    if not cards and not errors:
+        errors.append("no card in the archive")
+    return file_path, cards, rows, "; ".join(errors) or None
+
+def pirc_fleet_worker(file_path):
+    """Parse one file in a worker process, returns (file_path, cards, rows, error).
+
+    Concatenated dumps are split here, in the worker, and a tar archive is
+    read as one task instead of once per member.
+    """
+    from .pidbmulti import PiDbMultiCard, iter_stream_cards
+
+    try:
+        if split_member(file_path)[1] is None and is_archive_name(file_path):
+            return pirc_fleet_archive(file_path)
+        if is_compressed(file_path) and not is_binary_card(file_path):
+            # compressed dumps are split while they are decompressed
+            return pirc_fleet_rows(file_path, iter_stream_cards(file_path))
+
+        dump = PiDbMultiCard(file_path, workers=1)
+        cards = dump.iter_cards() if len(dump) > 1 else [PiDbCard(file_path).parse_file()]
+        return pirc_fleet_rows(file_path, cards)
+    except Exception as e:
+        return file_path, 0, None, str(e)
+
+def pirc_fleet_card(file_path, data):
+    """Rows of one card of a split dump (in a worker process), returns (file_path, cards, rows, error)."""
+    try:
+        return pirc_fleet_rows(file_path, [data])
+    except Exception as e:
+        return file_path, 0, None, str(e)
+
+def pirc_fleet_tasks(files):
+    """Return the (path, split) fleet tasks in file order.
+
+    The members of an archive become one task of the archive path (read
+    once), dumps of FLEET_SPLIT_BYTES and more are split over the pool.
+    """
+    tasks = []
+    for file_path in files:
+        archive_path, member = split_member(file_path)
+        if member is not None:
+            if tasks and split_member(tasks[-1][0])[0] == archive_path:
+                tasks[-1] = (archive_path, False)
+            else:
+                tasks.append((file_path, False))
+            continue
+        try:
+            split = os.path.getsize(file_path) >= FLEET_SPLIT_BYTES and not is_compressed(file_path)
+        except OSError:
+            split = False  # reported by the worker
+        tasks.append((file_path, split))
+    return tasks
+
+def pirc_fleet_results(tasks, pool, workers, chunksize):
+    """Yield (file_path, cards, rows, error) of the tasks in file order.
+
+    Files are parsed one per worker, big dumps are split over the same pool
+    card by card (PiDbMultiCard.map_cards).
+    """
+    from .pidbmulti import PiDbMultiCard
+
+    files = []
+    for file_path, split in tasks + [(None, True)]:
+        if not split:
+            files.append(file_path)
+            continue
+        yield from pool.map(pirc_fleet_worker, files, chunksize=chunksize)
+        files = []
+        if file_path is not None:
+            yield from PiDbMultiCard(file_path, workers, pool).map_cards(functools.partial(pirc_fleet_card, file_path))
+
+def pirc_fleet_stats(target, output_file=None, workers=None):
+    """Parse all *.db files of a fleet in parallel and stream one aggregated report."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    files = pirc_find_db_files(target)
+    if not files:
+        print(f"No DB files found in {target}", file=sys.stderr)
+        return 1
+
+    tasks = pirc_fleet_tasks(files)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(32, len(tasks) // (workers * 4)))
+
+    file = open(output_file, "w", newline="") if output_file else sys.stdout
+    errors = 0
+    cards = 0
+    start = time.perf_counter()
+    try:
+        writer = csv.writer(file)
+        writer.writerow(FLEET_COLUMNS)
+
+        # results stream in file order as the workers finish them
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for file_path, count, rows, error in pirc_fleet_results(tasks, pool, workers, chunksize):
+                if error is not None:
+                    errors += 1
+                    print(f"Error: {file_path}: {error}", file=sys.stderr)
+                if rows:
+                    cards += count
+                    writer.writerows(rows)
+                    file.flush()
+    finally:
+        if output_file:
+            file.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Fleet: {len(files)} files, {cards} cards, {errors} errors in {elapsed:.2f} s "
+        f"({len(files) / elapsed if elapsed else 0:.1f} files/sec)",
+        file=sys.stderr,
+    )
+    if output_file:
+        print(f"Fleet report exported to {output_file}", file=sys.stderr)
+    return 1 if errors else 0
+
+def pirc_convert(target, output_dir=None):
+    """Convert DB files (file, directory or glob) into the compact binary format.
+
+    With an output directory the folders below the target are mirrored in it.
+    """
+    from .pidbbinary import save_binary, binary_path
+
+    files = pirc_find_db_files(target)
+    if not files:
+        print(f"No DB files found in {target}", file=sys.stderr)
+        return 1
+
+    if output_dir:
+        folders = [os.path.dirname(os.path.abspath(split_member(file_path)[0])) for file_path in files]
+        base = os.path.abspath(target) if os.path.isdir(target) else os.path.commonpath(folders)
+
+    errors = 0
+    converted = {}  # output file -> converted file, members of one name collide
+    with cached_archives():  # the members of a tar are decompressed once
+        for file_path in files:
+            try:
+                if output_dir:
+                    folder = os.path.relpath(os.path.dirname(os.path.abspath(split_member(file_path)[0])), base)
+                    output_file = binary_path(file_path, os.path.normpath(os.path.join(output_dir, folder)))
+                else:
+                    output_file = binary_path(file_path)
+                if output_file in converted:
+                    raise ValueError(f"{output_file} is already converted from {converted[output_file]}")
+
+                data = PiDbCard(file_path).parse_file()
+                if not data.get("header"):
+                    raise ValueError("missing PILPXIDB header")
+                os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+                save_binary(output_file, data)
+            except Exception as e:
+                errors += 1
+                print(f"Error: {file_path}: {e}", file=sys.stderr)
+                continue
+            converted[output_file] = file_path
+            print(f"Converted {file_path} -> {output_file} "
+                  f"({os.path.getsize(source_path(file_path))} -> {os.path.getsize(output_file)} bytes)")
+    return 1 if errors else 0
+
+def pirc_diff_lines(file_a, file_b, diff, top=10):
+    """Format the difference report of two snapshots into lines."""
+    from .pidbdiff import top_relays
+
+    header = diff["header"]
+    days = diff["days"]
+    lines = [f"Difference {file_a} -> {file_b}:", "-" * 40]
+    lines.append(f"Card: {header['card_id']} S/N {header['card_sn']}")
+    lines.append(f"Interval: {days:.2f} days" if days and days > 0 else "Interval: unknown")
+
+    lines.append("\nLayers:")
+    layers = [("Subunit", subunit["layer_id"], subunit) for subunit in diff["subunits"]]
+    layers += [("Loop", loop["loop_id"], loop) for loop in diff["physical_layers"]]
+    for name, layer_id, layer in layers:
+        deltas = layer["counts"][layer["mask"]]
+        total = int(deltas.sum()) if deltas.size else 0
+        max_delta = int(deltas.max()) if deltas.size else 0
+        lines.append(f"  {name} {layer_id}: total {total:+d}, max {max_delta:+d}")
+
+    lines.append(f"\nTop {top} relays:")
+    for relay in top_relays(diff, top):
+        rate = f" ({relay['rate']:.2f} cycles/day)" if relay["rate"] is not None else ""
+        lines.append(f"  {relay['layer']} {relay['layer_id']} BIT{relay['bit']}: {relay['delta']:+d}{rate}")
+    return lines
+
+def pirc_diff(file_a, file_b, top=10, days=None):
+    """Compare two snapshots of the same card (a older, b newer)."""
+    from .pidbdiff import diff_cards, snapshot_days
+
+    data_a = PiDbCard(file_a).parse_file()
+    data_b = PiDbCard(file_b).parse_file()
+    if days is None:
+        days = snapshot_days(file_a, file_b)
+
+    try:
+        diff = diff_cards(data_a, data_b, days)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for line in pirc_diff_lines(file_a, file_b, diff, top):
+        print(line)
+    return 0
+
+def pirc_history_ingest(target, history_path=None):
+    """Ingest DB files (file, directory or glob) into the history store."""
+    from .pidbhistory import PiDbHistory
+
+    files = pirc_find_db_files(target)
+    if not files:
+        print(f"No DB files found in {target}", file=sys.stderr)
+        return 1
+
+    history = PiDbHistory(history_path)
+    added = errors = 0
+    try:
+        with cached_archives():
+            for file_path in files:
+                try:
+                    _, is_new = history.ingest(file_path)
+                except Exception as e:
+                    errors += 1
+                    print(f"Error: {file_path}: {e}", file=sys.stderr)
+                    continue
+                added += is_new
+    finally:
+        history.close()
+
+    print(f"History: {len(files)} files, {added} new snapshots, {errors} errors ({history.path})", file=sys.stderr)
+    return 1 if errors else 0
+
+def pirc_timestamp(seconds):
+    """Format a snapshot time (epoch seconds) for reports."""
+    from datetime import datetime
+    return datetime.fromtimestamp(seconds).isoformat(timespec="seconds")
+
+def pirc_history_report(query, history_path=None, **kwargs):
+    """Write a history query (cards, above, growth, series) as CSV to stdout."""
+    from .pidbhistory import PiDbHistory
+
+    history = PiDbHistory(history_path)
+    try:
+        if query == "cards":
+            columns = ["Card ID", "Card S/N", "Snapshots", "Last Snapshot"]
+            rows = [row[:3] + (pirc_timestamp(row[3]),) for row in history.cards()]
+        elif query == "above":
+            columns = ["Card ID", "Card S/N", "Layer", "Layer ID", "Bit", "Count"]
+            rows = history.relays_above(kwargs["min_count"], kwargs.get("limit"))
+        elif query == "growth":
+            columns = ["Card ID", "Card S/N", "Layer", "Layer ID", "Bit", "Growth", "Days"]
+            rows = history.relay_growth(kwargs.get("days", 90), kwargs.get("limit"))
+        elif query == "series":
+            columns = ["Taken At", "Count"]
+            rows = [(pirc_timestamp(taken_at), count) for taken_at, count in history.relay_series(
+                kwargs["card_id"], kwargs["card_sn"], kwargs["layer"], kwargs["layer_id"], kwargs["bit"]
+            )]
+        else:
+            raise ValueError(f"unknown history query {query}")
+    finally:
+        history.close()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    writer.writerows(rows)
+    return 0
+
+# forecast report columns, one row per relay
+FORECAST_COLUMNS = [
+    "Card ID", "Card S/N", "Layer", "Layer ID", "Bit", "Count", "Rate (cycles/day)", "Days To Limit"
+]
+
+def pirc_forecast(history_path=None, limit=None, output_file=None, card=None):
+    """Forecast the days to the rated life of all relays in the history, soonest first."""
+    from .pidbhistory import PiDbHistory
+    from .pidbforecast import forecast_history, forecast_order, DEFAULT_RATED_LIFE, LAYER_NAMES
+
+    limit = limit or DEFAULT_RATED_LIFE
+    history = PiDbHistory(history_path)
+    try:
+        cards = [tuple(card)] if card else [row[:2] for row in history.cards()]
+        forecasts = [(card_id, card_sn, forecast_history(history, card_id, card_sn, limit)) for card_id, card_sn in cards]
+    finally:
+        history.close()
+
+    # one fleet wide forecast, sorted soonest first (not wearing and unknown relays last)
+    forecast = {
+        key: np.concatenate([card_forecast[key] for _, _, card_forecast in forecasts] or [np.zeros(0)])
+        for key in ("layer", "layer_id", "bit", "count", "rate", "days")
+    }
+    card_index = np.concatenate(
+        [np.full(card_forecast["bit"].size, i) for i, (_, _, card_forecast) in enumerate(forecasts)] or [np.zeros(0, dtype=int)]
+    )
+    order = forecast_order(forecast)
+
+    rows = []
+    for i in order.tolist():
+        card_id, card_sn, _ = forecasts[card_index[i]]
+        rate, days = float(forecast["rate"][i]), float(forecast["days"][i])
+        rows.append([
+            card_id, card_sn, LAYER_NAMES[int(forecast["layer"][i])], int(forecast["layer_id"][i]),
+            int(forecast["bit"][i]), int(forecast["count"][i]),
+            "" if np.isnan(rate) else round(rate, 2),  # less than two snapshots
+            "" if not np.isfinite(days) else round(days, 1),
+        ])
+
+    file = open(output_file, "w", newline="") if output_file else sys.stdout
+    try:
+        writer = csv.writer(file)
+        writer.writerow(FORECAST_COLUMNS)
+        writer.writerows(rows)
+    finally:
+        if output_file:
+            file.close()
+
+    if output_file:
+        print(f"Forecast exported to {output_file}", file=sys.stderr)
+    return 0
+
+def pirc_synth(output_file, geometries=("12x12",), subunits=None, loops=0, loop_size=64, cards=1, seed=None,
+               distribution="uniform", max_count=1000000, fill=1.0, card_id="40-000-SYNTH", generation=1):
+    """Write synthetic cards, geometries are cycled over the subunits."""
+    from .pidbsynth import write_synth_file, parse_geometry
+
+    geometries = [parse_geometry(geometry) for geometry in geometries]
+    subunits = subunits or len(geometries)
+    geometries = [geometries[i % len(geometries)] for i in range(subunits)]
+
+    start = time.perf_counter()
+    write_synth_file(
+        output_file, geometries, [loop_size] * loops, cards, seed,
+        card_id=card_id, generation=generation, distribution=distribution, max_count=max_count, fill=fill,
+    )
+    if output_file != "-":
+        size = os.path.getsize(output_file)
+        print(f"Synthetic: {cards} cards, {size} bytes in {time.perf_counter() - start:.2f} s ({output_file})", file=sys.stderr)
+    return 0
+
+# inventory listing columns, one row per card file
+INVENTORY_COLUMNS = [
+    "File", "Card ID", "Card S/N", "FW Version", "Simulated", "Generation", "Subunits", "Loops"
+]
+
+def pirc_inventory(target, index_path=None, workers=None, list_cards=False):
+    """Catalogue the card headers of a directory tree into its sidecar index."""
+    from .pidbinventory import PiDbInventory
+
+    if not os.path.isdir(target):
+        print(f"Not a directory: {target}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    inventory = PiDbInventory(target, index_path)
+    inventory.update(workers)
+    elapsed = time.perf_counter() - start
+
+    for relative_path, error in inventory.errors.items():
+        print(f"Error: {os.path.join(target, relative_path)}: {error}", file=sys.stderr)
+
+    if list_cards:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(INVENTORY_COLUMNS)
+        for file_path, entry in inventory.cards():
+            header = entry["header"]
+            writer.writerow([
+                file_path, header["card_id"], header["card_sn"], header["fw_version"], header["is_simulated"],
+                entry["generation"], entry["subunits"], entry["loops"]
+            ])
+
+    print(
+        f"Inventory: {len(inventory.entries)} cards, {inventory.scanned} scanned, "
+        f"{len(inventory.errors)} errors in {elapsed:.2f} s ({inventory.index_path})",
+        file=sys.stderr,
+    )
+    return 1 if inventory.errors else 0
+
+def pirc_watch(target, ranges=None, workers=None, poll=False, poll_interval=2.0, initial=False, output_file=None):
+    """Watch a folder for new/changed dumps, stream card statistics and alerts as NDJSON."""
+    from concurrent.futures import ProcessPoolExecutor
+    from .pidbwatch import PiDbWatch, WATCH_RANGES, find_dumps
+
+    if not os.path.isdir(target):
+        print(f"Not a directory: {target}", file=sys.stderr)
+        return 1
+
+    watch = PiDbWatch(target, ranges or WATCH_RANGES, use_inotify=not poll, poll_interval=poll_interval)
+    if initial:
+        files = watch.changed(sorted(find_dumps(watch.root)))
+    else:
+        watch.skip_existing()
+        files = []
+    print(f"Watching {watch.root} ({watch.mode()}), Ctrl+C to stop", file=sys.stderr)
+
+    file = open(output_file, "a") if output_file else sys.stdout
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # records stream out as the workers finish the batch
+                for record in watch.process(files, pool):
+                    file.write(json.dumps(record) + "\n")
+                    file.flush()
+                files = watch.wait_changes()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watch.close()
+        if output_file:
+            file.close()
+    return 0
@@ -22,20 +22,35 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from .pidbcard import PiDbCard
 from .pitableview import PiTableView
 from .pidbcardview import PiDbCardView
 from .pidbcardlist import PiDbCardList
 from .heatmaprange import HeatMapRange
-from .pidbcardthreaded import PiDbCardThreaded
-
-from PyQt5.QtCore import QThread, Qt, QSettings
+from .pidbcardloader import PiDbCardLoader
+from .pidbcache import PiDbCardCache
+from .pidbdiff import snapshot_days
+from .pidbhistory import PiDbHistory
+from .pidbforecast import forecast_history, forecast_card_data
+from .pidbinventory import PiDbInventory
+from .pidbindexer import PiDbIndexer, PiDbIndexTask, INDEX_SETTINGS
+from .piprofiler import profiler
+from .pidbarchive import expand_archives
+
+from PyQt5.QtCore import Qt, QSettings
 from PyQt5.QtWidgets import (
-    QMainWindow, QWidget, QLabel, QPushButton, QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QSplitter, QFileDialog, QStatusBar, QProgressBar
+    QMainWindow, QWidget, QLabel, QPushButton, QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QSplitter, QFileDialog, QStatusBar, QProgressBar,
+    QMessageBox
 )
 
+import time
 import sys
 
+# card files of the open dialogs, compressed and archived cards are read transparently
+CARD_FILE_FILTER = "Card Files (*.db *.pirc *.txt *.gz *.xz *.bz2 *.zst *.zip *.tar *.tgz)"
+
+# timers shown in the status bar while profiling
+PROFILE_STATUS_TIMERS = ["read", "parse_file", "add_card", "populate_tabs", "statistics_graph", "create_tab", "reload_heatmap"]
+
 #
 # class PircViewer main window
 #
@@ -44,7 +59,14 @@ class PircViewer(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        self.current_thread = None  # track the current processing thread
+        self.card_cache = PiDbCardCache()  # parsed cards (memory LRU + disk)
+        self.card_loader = PiDbCardLoader(self.card_cache, parent=self)  # concurrent card parsing
+        self.card_indexer = PiDbIndexer(parent=self)  # background catalog of the configured folders
+        self.selected_file = None  # file requested to be shown (latest click wins)
+        self.shown_file = None  # file of the card in the table view
+        self.first_loaded_card = None  # (file path, card_data) of the first card loaded by the running batch
+        self.folder_tasks = set()  # running scans of opened folders
+        self.load_errors = []
 
         self.setWindowTitle("pypirccua - Pickering Relay Cycle Counting Utility Application")
         
@@ -61,6 +83,8 @@ class PircViewer(QMainWindow):
 
         self.status_bar = QStatusBar()
         self.progress_bar = QProgressBar(self)
+        self.cancel_button = QPushButton("Cancel", self)
+        self.cancel_button.setEnabled(False)
 
         # layout management
         self.central_widget = QWidget()
@@ -76,7 +100,10 @@ class PircViewer(QMainWindow):
 
         layout.addWidget(splitter)
         layout.addWidget(self.heatmap_range_widget)
-        layout.addWidget(self.progress_bar)
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
         self.setStatusBar(self.status_bar)
 
         # signal & slots
@@ -85,10 +112,20 @@ class PircViewer(QMainWindow):
         self.pi_db_card_list.generation_selected.connect(self.load_file_from_tree)
         self.heatmap_range_widget.range_changed.connect(self.update_heatmap)
         self.pi_db_table_view.statistics_row_selected.connect(self.switch_tab_by_layer_name)
+        self.card_loader.card_loaded.connect(self.on_card_loaded)
+        self.card_loader.card_error.connect(self.on_card_error)
+        self.card_loader.progress_changed.connect(self.on_loading_progress)
+        self.card_loader.loading_finished.connect(self.on_loading_finished)
+        self.cancel_button.clicked.connect(self.cancel_loading)
+        self.card_indexer.catalog_changed.connect(self.on_catalog_changed)
+        self.card_indexer.indexing_finished.connect(self.on_indexing_finished)
 
         # file menu
         self.create_menu()
 
+        # cards of the configured folders are listed from their catalogs right away
+        self.start_indexing()
+
     def create_menu(self):
         """Create the File -> Open menu."""
 
@@ -101,6 +138,18 @@ class PircViewer(QMainWindow):
         open_multiple_action = menu.addAction("Open Files")
         open_multiple_action.triggered.connect(self.open_files)
 
+        open_folder_action = menu.addAction("Open Folder...")
+        open_folder_action.triggered.connect(self.open_folder)
+
+        compare_action = menu.addAction("Compare With...")
+        compare_action.triggered.connect(self.compare_with)
+
+        forecast_action = menu.addAction("Forecast End Of Life")
+        forecast_action.triggered.connect(self.forecast_end_of_life)
+
+        relay_counts_action = menu.addAction("Show Relay Counts")
+        relay_counts_action.triggered.connect(self.show_relay_counts)
+
         # draft w.i.p - uncommented from users access
         #export_action = menu.addAction("Export")
         #export_action.triggered.connect(self.export_to_csv)
@@ -112,10 +161,9 @@ class PircViewer(QMainWindow):
         clear_action.triggered.connect(self.app_exit)
 
         # edit menu 
-        # draft w.i.p - uncommented from users access
-        #edit_menu = self.menuBar().addMenu("Edit")
-        #settings_action = edit_menu.addAction("Settings")
-        #settings_action.triggered.connect(self.show_settings_dialog)
+        edit_menu = self.menuBar().addMenu("Edit")
+        settings_action = edit_menu.addAction("Settings")
+        settings_action.triggered.connect(self.show_settings_dialog)
 
         # help menu
         help_menu = self.menuBar().addMenu("Help")
@@ -124,38 +172,150 @@ class PircViewer(QMainWindow):
 
     def open_files(self):
         """Open multiple files and add them to the PiCardList."""
-        self.progress_bar.reset()
-        
-        file_paths, _ = QFileDialog.getOpenFileNames(self, "Open DB Files", "", "DB Files (*.db *.txt)")
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Open DB Files", "", CARD_FILE_FILTER)
         if not file_paths:
             return  # user canceled the save dialog
 
-        num_files = len(file_paths)
-
-        self.progress_bar.setMaximum(num_files)
-
-        for i in range(0,num_files):
-            filename = file_paths[i]
-
-            self.load_file(file_paths[i])
-
-            self.progress_bar.setValue(i)
-            self.statusBar().showMessage(f"File loaded successfully: {filename}", 5000)
-
-        self.statusBar().showMessage(f"Files loaded: {int(num_files)}", 5000)
-        self.progress_bar.setValue(self.progress_bar.maximum())
+        # archives add all their cards
+        self.load_files(expand_archives(file_paths))
 
     def open_file(self):
         """Open a file using a file dialog."""
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Card Files (*.db *.txt)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", CARD_FILE_FILTER)
         if file_path:
-            self.load_file(file_path)
+            self.load_files([file_path])
+
+    def open_folder(self):
+        """List all cards of a directory tree from its inventory, cards are parsed when clicked."""
+        directory = QFileDialog.getExistingDirectory(self, "Open Card Folder")
+        if directory:
+            self.load_inventory(directory)
+
+    def load_inventory(self, directory):
+        """Fill the card list from the sidecar index of a directory, changed files are scanned in the background."""
+        inventory = PiDbInventory(directory)
+        inventory.load()
+        added = self.pi_db_card_list.add_cards(inventory.cards())
+
+        # the scan runs on the indexer pool, its changes are applied like the catalog updates
+        task = PiDbIndexTask([inventory])
+        task.signals.catalog_changed.connect(self.on_catalog_changed)
+        task.signals.indexing_finished.connect(
+            lambda cards, scanned, failed, task=task, start=time.perf_counter():
+                self.on_folder_indexed(task, cards, scanned, failed, start))
+        self.folder_tasks.add(task)
+        self.card_indexer.thread_pool.start(task)
+        self.statusBar().showMessage(f"Cards listed: {added}, scanning {directory}...", 5000)
+        return added
+
+    def on_folder_indexed(self, task, cards, scanned, failed, start):
+        self.folder_tasks.discard(task)
+        self.statusBar().showMessage(
+            f"Cards listed: {cards} ({scanned} scanned, {failed} failed) in {time.perf_counter() - start:.2f} s", 5000
+        )
+
+    def start_indexing(self):
+        """List the catalogued cards of the configured folders and keep them indexed in the background."""
+        settings = QSettings("PyPiRCCUA", "Settings")
+        folders = [settings.value(key, "") for key in INDEX_SETTINGS]
+        listed_files = self.card_indexer.catalog_files()
+        cards = self.card_indexer.set_folders(folders)
+
+        # cards of the folders removed in Settings leave the list
+        self.pi_db_card_list.remove_files(listed_files - {file_path for file_path, _ in cards})
+        self.pi_db_card_list.add_cards(cards)
+        self.card_indexer.start()
+
+    def on_catalog_changed(self, cards, removed_files):
+        """Apply a catalog update of the background indexer to the card list."""
+        self.pi_db_card_list.remove_files(removed_files)
+        self.pi_db_card_list.add_cards(cards)
+
+    def on_indexing_finished(self, cards, scanned, failed):
+        if scanned:
+            self.statusBar().showMessage(f"Catalog: {cards} cards, {scanned} scanned, {failed} failed", 5000)
+
+    def compare_with(self):
+        """Show the relay deltas of the shown card against an older snapshot of it."""
+        if self.shown_file is None:
+            QMessageBox.warning(self, "Compare Error", "Open a card first.")
+            return
+
+        file_path, _ = QFileDialog.getOpenFileName(self, "Compare With Snapshot", "", CARD_FILE_FILTER)
+        if not file_path:
+            return
+
+        try:
+            baseline_data = self.card_cache.load(file_path)
+            days = snapshot_days(file_path, self.shown_file)
+            self.pi_db_table_view.set_baseline(baseline_data, days)
+        except Exception as e:
+            QMessageBox.critical(self, "Compare Error", f"Failed to compare with {file_path}: {e}")
+            return
+        self.statusBar().showMessage(f"Difference {file_path} -> {self.shown_file} ({days:.2f} days)", 5000)
+
+    def forecast_end_of_life(self):
+        """Show the days until every relay of the shown card reaches its rated life.
+
+        The shown card is added to the history store first, the rated life is
+        the heatmap warning level.
+        """
+        if self.shown_file is None:
+            QMessageBox.warning(self, "Forecast Error", "Open a card first.")
+            return
+
+        parsed_data = self.pi_db_table_view.parsed_data
+        header = parsed_data["header"]
+        history = PiDbHistory()
+        try:
+            history.ingest(self.shown_file)
+            snapshots = len(history.snapshots(header["card_id"], header["card_sn"]))
+            limit = self.heatmap_range_widget.get_ranges()[1]
+            forecast = forecast_history(history, header["card_id"], header["card_sn"], limit)
+        except Exception as e:
+            QMessageBox.critical(self, "Forecast Error", f"Failed to forecast {self.shown_file}: {e}")
+            return
+        finally:
+            history.close()
+
+        if snapshots < 2:
+            QMessageBox.information(
+                self, "Forecast",
+                "The forecast needs at least two snapshots of the card in the history "
+                "(pypirccua history ingest <dir>)."
+            )
+            return
+
+        self.pi_db_table_view.set_forecast(forecast_card_data(parsed_data, forecast))
+        self.statusBar().showMessage(f"Days to {limit} cycles from {snapshots} snapshots", 5000)
+
+    def show_relay_counts(self):
+        """Leave the comparison/forecast view, show the relay counts again."""
+        if self.pi_db_table_view.display_data() is not self.pi_db_table_view.parsed_data:
+            self.pi_db_table_view.clear_overlay()
+
+    def load_files(self, file_paths):
+        """Parse files concurrently, cards are added to the list as they complete."""
+        if not self.card_loader.is_loading():
+            self.progress_bar.reset()
+            self.first_loaded_card = None
+            self.load_errors = []
+
+        self.cancel_button.setEnabled(True)
+        self.statusBar().showMessage(f"Loading {len(file_paths)} files...")
+        self.card_loader.load(file_paths)
+
+    def cancel_loading(self):
+        """Cancel the running batch load."""
+        self.card_loader.cancel()
 
     def clear_all_data(self):
         """Clear all data and reset the application state."""
+        self.card_loader.cancel()
         self.pi_db_card_list.remove_all_cards()
         self.pi_db_card_view.clear()
         self.pi_db_table_view.clear_tabs()
+        self.shown_file = None
         self.progress_bar.reset()
         self.statusBar().showMessage("")
 
@@ -163,87 +323,96 @@ class PircViewer(QMainWindow):
         """Exit the application."""
         self.close()
 
+    def closeEvent(self, event):
+        """Stop the loader workers before the window closes."""
+        self.card_loader.cancel()
+        self.card_loader.wait()
+        self.card_indexer.stop()
+        super().closeEvent(event)
+
     def load_file_from_tree(self, file_path):
         """Load a file when a generation node is clicked in the tree."""
-        self.statusBar().showMessage(f"Loading file... {file_path}", 5000)
-
-        if self.current_thread:
-            self.current_thread.quit()
-            self.current_thread.wait()
-
-        self.current_thread = QThread()
-        self.card_processor = PiDbCardThreaded(file_path)
-        self.card_processor.moveToThread(self.current_thread)
-
-        # connect signals
-        self.current_thread.started.connect(self.card_processor.process_card)
-        self.card_processor.processing_started.connect(lambda: self.statusBar().showMessage(f"Processing file... {file_path}", 5000))
-        self.card_processor.processing_finished.connect(self.on_processing_finished)
-        self.card_processor.processing_error.connect(self.on_processing_error)
-        self.card_processor.processing_finished.connect(self.current_thread.quit)
-        self.card_processor.processing_error.connect(self.current_thread.quit)
-
-        # start the thread
-        self.current_thread.start()
-
-    def load_file(self, file_path):
-        """Handle file load."""
-        # extract data and add card into list
-        # todo optimize it because there is 'double call'
-        parser = PiDbCard(file_path)
-        parsed_data = parser.parse_file()
-        self.pi_db_card_list.add_card(file_path, parsed_data)
-
-        # ensure any previous thread is cleaned up
-        if self.current_thread:
-            self.current_thread.quit()
-            self.current_thread.wait()
+        self.selected_file = file_path
 
-        self.current_thread = QThread()
-        self.card_processor = PiDbCardThreaded(file_path)
-        self.card_processor.moveToThread(self.current_thread)
+        # already parsed cards are shown right away
+        parsed_data = self.card_cache.get_cached(file_path)
+        if parsed_data is not None:
+            self.show_card(file_path, parsed_data)
+            return
 
-        # connect signals
-        self.current_thread.started.connect(self.card_processor.process_card)
-        self.card_processor.processing_started.connect(lambda: self.statusBar().showMessage(f"Processing file... {file_path}", 5000))
-        self.card_processor.processing_finished.connect(self.on_processing_finished)
-        self.card_processor.processing_error.connect(self.on_processing_error)
-        self.card_processor.processing_finished.connect(self.current_thread.quit)
-        self.card_processor.processing_error.connect(self.current_thread.quit)
-
-        # start the thread
-        self.current_thread.start()
+        self.statusBar().showMessage(f"Loading file... {file_path}", 5000)
+        self.card_loader.load_card(file_path, self.on_processing_finished, self.on_processing_error)
 
-    def on_processing_finished(self, parsed_data):
+    def on_card_loaded(self, file_path, parsed_data):
+        """Add a card parsed by the loader batch into the list."""
+        self.pi_db_card_list.add_card(file_path, parsed_data)
+        if self.first_loaded_card is None:
+            # kept here, the LRU may have evicted it by the end of a big batch
+            self.first_loaded_card = (file_path, parsed_data)
+        self.statusBar().showMessage(f"File loaded successfully: {file_path}", 5000)
+
+    def on_card_error(self, file_path, error_message):
+        """Collect the errors of the loader batch, reported when it finishes."""
+        self.load_errors.append(f"{file_path}: {error_message}")
+
+    def on_loading_progress(self, processed, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(processed)
+
+    def on_loading_finished(self, loaded, failed):
+        """Show the first loaded card and report the batch."""
+        self.cancel_button.setEnabled(False)
+        self.statusBar().showMessage(f"Files loaded: {loaded}, failed: {failed}", 5000)
+
+        if self.first_loaded_card:
+            file_path, parsed_data = self.first_loaded_card
+            self.selected_file = file_path
+            self.show_card(file_path, parsed_data)
+            self.first_loaded_card = None
+
+        if self.load_errors:
+            QMessageBox.critical(self, "Processing Error", "Failed to load:\n" + "\n".join(self.load_errors))
+            self.load_errors = []
+
+    def on_processing_finished(self, file_path, parsed_data):
         """Handle the parsed data and update the UI."""
+        if file_path == self.selected_file:
+            self.show_card(file_path, parsed_data)
+
+    def show_card(self, file_path, parsed_data):
+        """Show the card db file and its parsed data."""
         #clear data
         self.pi_db_card_view.clear()
         self.pi_db_table_view.clear()
 
-        _file_path = self.card_processor.file_path
-        _parsed_data = parsed_data
-
-        self.pi_db_card_view.load_file(_file_path)
-        self.pi_db_table_view.parsed_data = _parsed_data
-        self.pi_db_table_view.populate_tabs()
-        self.statusBar().showMessage(f"File Loaded... {_file_path}", 5000)
-
-    def on_processing_error(self, error_message):
+        self.pi_db_card_view.load_file(file_path)
+        self.shown_file = file_path
+        self.pi_db_table_view.parsed_data = parsed_data
+        self.pi_db_table_view.diff_data = None
+        self.pi_db_table_view.forecast_data = None
+        with profiler.timer("show_card"):
+            self.pi_db_table_view.populate_tabs()
+        self.statusBar().showMessage(f"File Loaded... {file_path}", 5000)
+        self.show_profile()
+
+    def show_profile(self):
+        """Show the profiler totals in the status bar (--profile)."""
+        if profiler.enabled:
+            self.statusBar().showMessage(f"Profile: {profiler.status_text(PROFILE_STATUS_TIMERS)}")
+
+    def on_processing_error(self, file_path, error_message):
         """Handle errors during processing."""
-        QMessageBox.critical(self, "Processing Error", f"An error occurred: {error_message}")
+        QMessageBox.critical(self, "Processing Error", f"An error occurred: {file_path}: {error_message}")
         self.statusBar().clearMessage()
         self.progress_bar.reset()
 
     def on_line_selected(self, line_no):
-        line_text = self.pi_db_card_view.line_mapping.get(line_no)
+        line_text = self.pi_db_card_view.line_text(line_no)
         if line_text:
             self.pi_db_table_view.highlight_table_by_line(line_text)
 
-    def on_table_cell_selected(self, relay_line):
-        for idx in range(self.pi_db_card_view.count()):
-            if self.pi_db_card_view.item(idx).text() == relay_line:
-                self.pi_db_card_view.setCurrentRow(idx)
-                break
+    def on_table_cell_selected(self, line_no):
+        self.pi_db_card_view.highlight_line(line_no)
 
     def switch_tab_by_layer_name(self, layer_name):
         """Switch to the tab corresponding to the selected layer."""
@@ -256,6 +425,7 @@ class PircViewer(QMainWindow):
     def update_heatmap(self, ranges):
         """Update the heatmap in all table views."""
         self.pi_db_table_view.reload_heatmap(ranges)
+        self.show_profile()
 
     def export_to_csv(self):
         """Call the export_to_csv method from PiTableView."""
@@ -267,7 +437,8 @@ class PircViewer(QMainWindow):
 
     def show_settings_dialog(self):
         settings_dialog = PircSettingsDialog(self)
-        settings_dialog.exec_()
+        if settings_dialog.exec_() == QDialog.Accepted:
+            self.start_indexing()  # index the changed folders
 
 #
 # class Settings dialog
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         pitablemodel.py
+# Description:  Qt relay count table model (subunit/loop heatmap)
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from .pidbarray import layer_arrays
+from .heatmaprange import HEATMAP_BRUSHES, heatmap_levels
+from .piprofiler import profiler
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+#
+# class PiTableModel - relay counts and heatmap of one layer, served straight
+# from its count array (the view only asks for the visible cells)
+#
+class PiTableModel(QAbstractTableModel):
+
+    def __init__(self, layer, ranges, parent=None, levels_func=heatmap_levels):
+        super().__init__(parent)
+        self.layer = layer
+        self.counts, self.mask = layer_arrays(layer)
+        self.ranges = list(ranges)
+        self.levels_func = levels_func  # (counts, ranges) -> heatmap level per cell
+        self.levels = None  # heatmap level per cell, computed on first paint after a range change
+
+        rows, cols = self.counts.shape
+        if cols > 1:  # matrix view
+            self.horizontal_labels = [f"Col {c + 1}" for c in range(cols)]
+            self.vertical_labels = [f"Row {r + 1}" for r in range(rows)]
+        else:  # column view
+            self.horizontal_labels = ["Counts"]
+            self.vertical_labels = [f"RL{r + 1}" for r in range(rows)]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.counts.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.counts.shape[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row, col = index.row(), index.column()
+        if not self.mask[row, col]:
+            return None  # no relay record for this bit
+
+        if role == Qt.DisplayRole:
+            return str(self.counts[row, col])
+        elif role == Qt.BackgroundRole:
+            if self.levels is None:
+                with profiler.timer("heatmap_levels"):
+                    self.levels = self.levels_func(self.counts, self.ranges)
+            return HEATMAP_BRUSHES[self.levels[row, col]]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.horizontal_labels[section]
+        return self.vertical_labels[section]
+
+    def set_ranges(self, ranges):
+        """Set the heatmap ranges and repaint the cells.
+
+        Levels are only reclassified when a view paints again, so models of
+        hidden tabs cost nothing until they are shown.
+        """
+        ranges = list(ranges)
+        if ranges == self.ranges:
+            return
+        self.ranges = ranges
+        self.levels = None
+        self.dataChanged.emit(
+            self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1), [Qt.BackgroundRole]
+        )
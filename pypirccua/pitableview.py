@@ -23,19 +23,22 @@
 """
 
 from .pidbcard import *
+from .pidbtokenizer import LAYER_LOGICAL, LAYER_PHYSICAL, tokenize_relay
+from .pidbarray import layer_values, layer_statistics, layer_histogram, HISTOGRAM_BINS
+from .pihistogram import PiHistogram
+from .pitablemodel import PiTableModel
+from .pidbdiff import diff_cards
+from .piprofiler import profiler, profiled
 from .heatmaprange import *
 
 from PyQt5.QtCore import ( 
     Qt, pyqtSignal
 ) 
 from PyQt5.QtWidgets import (
-    QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget, QTabWidget, QSplitter, QMessageBox, QFileDialog
+    QTableWidget, QTableWidgetItem, QTableView, QVBoxLayout, QWidget, QTabWidget, QSplitter, QMessageBox, QFileDialog
 )
 
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 import numpy as np
-import statistics
 import re
 import csv
 
@@ -44,7 +47,7 @@ import csv
 #
 class PiTableView(QTabWidget):
 
-    cell_selected = pyqtSignal(str)  # signal to emit the relay line text
+    cell_selected = pyqtSignal(int)  # signal to emit the line number of the selected relay
     statistics_row_selected = pyqtSignal(str)  # signal to emit when a statistics row is selected
 
     def __init__(self, heatmap_range_widget, parent=None):
@@ -59,9 +62,13 @@ class PiTableView(QTabWidget):
         self.layout.addWidget(self.tab_widget)
         self.setLayout(self.layout)
         self.parsed_data = None
-        self.line_mapping = {}
+        self.diff_data = None  # relay deltas against a baseline snapshot (diff heatmap mode)
+        self.forecast_data = None  # days to the rated life of every relay (forecast heatmap mode)
         self.heatmap_range_widget = heatmap_range_widget  # ref to HeatMapRange widget
-        self.tables = [] # store references to all QTableWidgets (stupid HeatMapRange hotreload :D)
+        self.tables = [] # store references to all created QTableViews (stupid HeatMapRange hotreload :D)
+        self.pending_tabs = {}  # placeholder widget -> (create tab func, layer), built when first shown
+
+        self.tab_widget.currentChanged.connect(self.ensure_tab)
 
     def set_layer(self, layer_id, is_logical=True):
         self.layer_id = layer_id
@@ -71,11 +78,11 @@ class PiTableView(QTabWidget):
         """Handle mouse press events and highlight table items."""
         # get the current table in the active tab
         current_widget = self.currentWidget()
-        if isinstance(current_widget, QTableWidget):
-            # get the item at the mouse click position
-            table_item = current_widget.itemAt(event.pos())
-            if table_item:
-                table_item.setSelected(True)
+        if isinstance(current_widget, QTableView):
+            # get the cell at the mouse click position
+            index = current_widget.indexAt(event.pos())
+            if index.isValid():
+                current_widget.selectionModel().select(index, current_widget.selectionModel().Select)
 
     #def mousePressEvent(self, event):
     #    """Emit the relay line for the selected cell."""
@@ -90,62 +97,102 @@ class PiTableView(QTabWidget):
     #            relay_line = f"R;P;L{self.layer_id}BIT{bit_number};{item.text()}"
     #        self.cell_selected.emit(relay_line)
 
+    def set_baseline(self, baseline_data, days=None):
+        """Show relay deltas against an older snapshot of the card (diff heatmap mode)."""
+        self.diff_data = diff_cards(baseline_data, self.parsed_data, days)
+        self.forecast_data = None
+        self.populate_tabs()
+
+    def set_forecast(self, forecast_data):
+        """Show the days to limit of every relay (forecast heatmap mode)."""
+        self.diff_data = None
+        self.forecast_data = forecast_data
+        self.populate_tabs()
+
+    def clear_overlay(self):
+        """Leave the diff and forecast heatmap modes, show the relay counts."""
+        self.diff_data = None
+        self.forecast_data = None
+        self.populate_tabs()
+
+    def display_data(self):
+        """Return the card data shown in the tabs (deltas or days to limit in the overlay modes)."""
+        return self.forecast_data or self.diff_data or self.parsed_data
+
+    @profiled("populate_tabs")
     def populate_tabs(self):
         """Populate tabs with parsed data."""
         self.clear_tabs()
 
         if not self.parsed_data:
             return
+        data = self.display_data()
         
         # stats
         stats_widget = self.create_statistics_tab()
-        self.tab_widget.addTab(stats_widget, "Statistics")
-
-        # logical subunits
-        for subunit in self.parsed_data.get("subunits", []):
-            subunit_widget = self.create_subunit_tab(subunit)
-            self.tab_widget.addTab(subunit_widget, f"Subunit {subunit['layer_id']} - {subunit['description']}")
+        if self.forecast_data:
+            title = "Statistics (days to limit)"
+        elif self.diff_data:
+            title = "Statistics (difference)"
+        else:
+            title = "Statistics"
+        self.tab_widget.addTab(stats_widget, title)
+
+        # logical subunits (tab content is created when the tab is first shown)
+        for subunit in data.get("subunits", []):
+            self.add_lazy_tab(self.create_subunit_tab, subunit, f"Subunit {subunit['layer_id']} - {subunit['description']}")
 
         # physical loops
-        for loop in self.parsed_data.get("physical_layers", []):
-            loop_widget = self.create_physical_tab(loop)
-            self.tab_widget.addTab(loop_widget, f"Loop {loop['loop_id']} - physical")
+        for loop in data.get("physical_layers", []):
+            self.add_lazy_tab(self.create_physical_tab, loop, f"Loop {loop['loop_id']} - physical")
+
+    def add_lazy_tab(self, create_tab, layer, title):
+        """Add a placeholder tab, its content is created by ensure_tab."""
+        placeholder = QWidget()
+        layout = QVBoxLayout(placeholder)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.pending_tabs[placeholder] = (create_tab, layer)
+        return self.tab_widget.addTab(placeholder, title)
+
+    def ensure_tab(self, index):
+        """Create the content of a lazy tab the first time it is shown."""
+        placeholder = self.tab_widget.widget(index)
+        pending = self.pending_tabs.pop(placeholder, None)
+        if pending:
+            create_tab, layer = pending
+            with profiler.timer("create_tab"):
+                placeholder.layout().addWidget(create_tab(layer))
 
     def clear_tabs(self):
         """Clear tabs."""
         self.stats_table.clear()
         self.tables.clear()
+        self.pending_tabs.clear()
         self.tab_widget.clear()
 
+    def create_layer_table(self, layer):
+        """Create a table view backed by the layer relay counts."""
+        table = QTableView()
+        if self.forecast_data:
+            table.setModel(PiTableModel(layer, FORECAST_RANGES, table, levels_func=days_levels))
+        else:
+            table.setModel(PiTableModel(layer, self.heatmap_range_widget.get_ranges(), table))
+        table.clicked.connect(lambda index, layer=layer: self.on_table_cell_clicked(layer, index))
+        self.tables.append(table)  # add table reference to the list
+        profiler.count("widgets tables")
+        return table
+
     def create_subunit_tab(self, subunit):
         """Create a tab for a logical subunit."""
         widget = QWidget()
         layout = QVBoxLayout()
 
-        rows, cols = subunit["rows"], subunit["cols"]
-        table = QTableWidget(rows, cols)
-
-        if cols > 1:  # matrix view
-            table.setHorizontalHeaderLabels([f"Col {c + 1}" for c in range(cols)])
-            table.setVerticalHeaderLabels([f"Row {r + 1}" for r in range(rows)])
-        else:  # column view
-            table.setHorizontalHeaderLabels(["Counts"])
-            table.setVerticalHeaderLabels([f"RL{r + 1}" for r in range(rows)])
-
-        # heatmap ranges
-        ranges = self.heatmap_range_widget.get_ranges()
-
-        for (row, col), value in subunit["relays"].items():
-            item = QTableWidgetItem(str(value))
-            item.setBackground(get_heatmap_color(value, ranges))
-            table.setItem(row, col, item)
-
-        self.tables.append(table)  # add table reference to the list
+        table = self.create_layer_table(subunit)
 
         layout.addWidget(table)
 
         # add statistics graph
-        graph = self.create_statistics_graph(subunit["relays"])
+        graph = self.create_statistics_graph(subunit)
         layout.addWidget(graph)
 
         widget.setLayout(layout)
@@ -156,60 +203,28 @@ class PiTableView(QTabWidget):
         widget = QWidget()
         layout = QVBoxLayout()
 
-        rows, cols = loop["rows"], loop["cols"]
-        table = QTableWidget(rows, cols)
-
-        if cols > 1:  # matrix view
-            table.setHorizontalHeaderLabels([f"Col {c + 1}" for c in range(cols)])
-            table.setVerticalHeaderLabels([f"Row {r + 1}" for r in range(rows)])
-        else:  # column view
-            table.setHorizontalHeaderLabels(["Counts"])
-            table.setVerticalHeaderLabels([f"RL{r + 1}" for r in range(rows)])
-
-        # heatmap ranges
-        ranges = self.heatmap_range_widget.get_ranges()
-
-        for (row, col), value in loop["relays"].items():
-            item = QTableWidgetItem(str(value))
-            item.setBackground(get_heatmap_color(value, ranges))
-            table.setItem(row, col, item)
-
-        self.tables.append(table)  # add table reference to the list
+        table = self.create_layer_table(loop)
 
         layout.addWidget(table)
 
         # statistics graph
-        graph = self.create_statistics_graph(loop["relays"])
+        graph = self.create_statistics_graph(loop)
         layout.addWidget(graph)
 
         widget.setLayout(layout)
         return widget
     
-    def create_statistics_graph(self, relays):
-        """Create a statistics graph for relay data."""
-        # extract values
-        counts = [value for value in relays.values()]
-
-        # create a matplotlib
-        fig = Figure(figsize=(5, 3))
-        ax = fig.add_subplot(111)
-
-        # plot a histogram of counts
-        ax.hist(counts, bins=20, color='blue', edgecolor='black')
-        ax.set_title("Relay Count Distribution")
-        ax.set_xlabel("Relay Count")
-        ax.set_ylabel("Frequency")
-
-        # add the mean line
-        mean_value = sum(counts) / len(counts) if counts else 0
-        ax.axvline(mean_value, color='red', linestyle='dashed', label=f"Mean: {mean_value:.2f}")
-        ax.legend()
-
-        # wrap figure in a FigureCanvas
-        canvas = FigureCanvas(fig)
-        return canvas
+    @profiled("statistics_graph")
+    def create_statistics_graph(self, layer):
+        """Create a statistics graph for relay data (histogram computed when first shown)."""
+        def histogram_data():
+            hist, edges = layer_histogram(layer)
+            values = layer_values(layer)
+            return {"heights": hist, "edges": edges, "mean": float(values.mean()) if values.size else 0.0}
+
+        return PiHistogram(histogram_data, "Relay Count Distribution", "Relay Count", "Frequency")
     
-    def create_statistics_for_layer(self, relays):
+    def create_statistics_for_layer(self, layer):
         """Generate a statistics table for a single layer."""
         widget = QTableWidget(4, 2)
         widget.setHorizontalHeaderLabels(["Metric", "Value"])
@@ -221,11 +236,11 @@ class PiTableView(QTabWidget):
         ])
 
         # calculate statistics
-        values = list(relays.values())
-        widget.setItem(0, 1, QTableWidgetItem(str(max(values, default=0))))
-        widget.setItem(1, 1, QTableWidgetItem(f"{np.mean(values):.2f}" if values else "0.00"))
-        widget.setItem(2, 1, QTableWidgetItem(str(sum(values, 0))))
-        widget.setItem(3, 1, QTableWidgetItem(f"{np.std(values):.2f}" if len(values) > 1 else "0.00"))
+        stats = layer_statistics(layer)
+        widget.setItem(0, 1, QTableWidgetItem(str(stats["max"])))
+        widget.setItem(1, 1, QTableWidgetItem(f"{stats['mean']:.2f}"))
+        widget.setItem(2, 1, QTableWidgetItem(str(stats["sum"])))
+        widget.setItem(3, 1, QTableWidgetItem(f"{stats['std']:.2f}" if stats["relays"] > 1 else "0.00"))
 
         return widget
 
@@ -243,26 +258,21 @@ class PiTableView(QTabWidget):
 
         # combine logical and physical layers into a unified dataset
         all_layers = []
+        data = self.display_data()
 
         # logical layers statistics
-        for subunit in self.parsed_data.get("subunits", []):
+        for subunit in data.get("subunits", []):
             name = f"Subunit {subunit['layer_id']}"
             type = f"{subunit['description']}"
-            relay_counts = list(subunit["relays"].values())
-            max_count = max(relay_counts, default=0)
-            mean_count = round(sum(relay_counts) / len(relay_counts), 2) if relay_counts else 0
-            sum_counts = round(sum(relay_counts)) if len(relay_counts) > 1 else 0
-            all_layers.append([name, type, relay_counts, max_count, mean_count, sum_counts])
+            stats = layer_statistics(subunit)
+            all_layers.append([name, type, stats["relays"], stats["max"], round(stats["mean"], 2), stats["sum"]])
 
         # physical layers statistics
-        for loop in self.parsed_data.get("physical_layers", []):
+        for loop in data.get("physical_layers", []):
             name = f"Loop {loop['loop_id']}"
             type = f"Physical"
-            relay_counts = list(loop["relays"].values())
-            max_count = max(relay_counts, default=0)
-            mean_count = round(sum(relay_counts) / len(relay_counts), 2) if relay_counts else 0
-            sum_counts = round(sum(relay_counts)) if len(relay_counts) > 1 else 0
-            all_layers.append([name, type, relay_counts, max_count, mean_count, sum_counts])
+            stats = layer_statistics(loop)
+            all_layers.append([name, type, stats["relays"], stats["max"], round(stats["mean"], 2), stats["sum"]])
 
         # populate the table
         self.stats_table.setRowCount(len(all_layers))
@@ -277,37 +287,32 @@ class PiTableView(QTabWidget):
         layout.addWidget(self.stats_table)
 
         # add overall graph
-        canvas = self.create_overall_graph()
-        layout.addWidget(canvas)
+        graph = self.create_overall_graph()
+        layout.addWidget(graph)
 
         widget.setLayout(layout)
         return widget
     
+    @profiled("overall_graph")
     def create_overall_graph(self):
         """Create an overall graph for relay counts."""
-        fig = Figure()
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        layers = self.parsed_data.get("subunits", []) + self.parsed_data.get("physical_layers", [])
-        names = [f"{layer.get('layer_id', layer.get('loop_id'))}" for layer in layers]
-        counts = [sum(layer["relays"].values(), 0) for layer in layers]
+        data = self.display_data()
 
-        ax.bar(names, counts, color="blue", alpha=0.7)
-        ax.set_title("Total Relay Counts by Layer")
-        ax.set_xlabel("Layer")
-        ax.set_ylabel("Total Count")
+        def totals_data():
+            layers = data.get("subunits", []) + data.get("physical_layers", [])
+            return {
+                "heights": [layer_statistics(layer)["sum"] for layer in layers],
+                "labels": [f"{layer.get('layer_id', layer.get('loop_id'))}" for layer in layers],
+            }
 
-        return canvas
+        return PiHistogram(totals_data, "Total Relay Counts by Layer", "Layer", "Total Count")
 
     def get_all_relay_counts(self):
         """Aggregate all relay counts from logical and physical layers."""
-        counts = []
-        for subunit in self.parsed_data.get("subunits", []):
-            counts.extend(subunit["relays"].values())
-        for loop in self.parsed_data.get("physical_layers", []):
-            counts.extend(loop["relays"].values())
-        return counts
+        layers = self.parsed_data.get("subunits", []) + self.parsed_data.get("physical_layers", [])
+        if not layers:
+            return np.zeros(0, dtype=np.uint64)
+        return np.concatenate([layer_values(layer) for layer in layers])
 
     def get_top_relays(self, layer_type):
         """Get the top 5 relays by count."""
@@ -322,17 +327,11 @@ class PiTableView(QTabWidget):
 
     def create_graph(self):
         """Create a graph canvas."""
-        fig = Figure()
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        relay_counts = self.get_all_relay_counts()
-        ax.hist(relay_counts, bins=20, color="blue", alpha=0.7)
-        ax.set_title("Relay Count Distribution")
-        ax.set_xlabel("Relay Count")
-        ax.set_ylabel("Frequency")
+        def histogram_data():
+            hist, edges = np.histogram(self.get_all_relay_counts(), bins=HISTOGRAM_BINS)
+            return {"heights": hist, "edges": edges}
 
-        return canvas
+        return PiHistogram(histogram_data, "Relay Count Distribution", "Relay Count", "Frequency")
     
     def on_statistics_row_selected(self):
         """Emit the layer name when a statistics row is selected."""
@@ -343,28 +342,30 @@ class PiTableView(QTabWidget):
 
     def highlight_table_by_line(self, line_text):
         """Highlight the corresponding table cell based on the line text."""
-        if line_text.startswith("R;L;"):
-            match = re.match(r"R;L;S([0-9]+)BIT([0-9]+);([0-9]+)", line_text)
-            if match:
-                subunit_id, bit, _ = map(int, match.groups())
-                for subunit in self.parsed_data.get("subunits", []):
-                    if subunit["layer_id"] == subunit_id:
-                        cols = subunit["cols"]
-                        row = (bit - 1) // cols
-                        col = (bit - 1) % cols
-                        regex = rf'^Subunit {subunit_id} -.*$'
-                        self.highlight_table_cell(regex, row, col)
-                        break
-
-        elif line_text.startswith("R;P;"):
-            match = re.match(r"R;P;L([0-9]+)BIT([0-9]+);([0-9]+)", line_text)
-            if match:
-                loop_id, bit, _ = map(int, match.groups())
-                for loop in self.parsed_data.get("physical_layers", []):
-                    if loop["loop_id"] == loop_id:
-                        regex = rf'^Loop {loop_id} -.*$'
-                        self.highlight_table_cell(regex, bit - 1, 0)
-                        break
+        token = tokenize_relay(line_text.strip())
+        if not token:
+            return
+
+        layer_type, layer_id, bit, _ = token
+        if layer_type == LAYER_LOGICAL:
+            subunit = self.parsed_data.get("subunit_index", {}).get(layer_id)
+            if subunit:
+                cols = subunit["cols"]
+                row = (bit - 1) // cols
+                col = (bit - 1) % cols
+                regex = rf'^Subunit {layer_id} -.*$'
+                self.highlight_table_cell(regex, row, col)
+
+        elif layer_type == LAYER_PHYSICAL:
+            if layer_id in self.parsed_data.get("loop_index", {}):
+                regex = rf'^Loop {layer_id} -.*$'
+                self.highlight_table_cell(regex, bit, 0)
+
+    def on_table_cell_clicked(self, layer, index):
+        """Emit the line number of the clicked relay (parser reverse index)."""
+        line_no = layer.get("relay_lines", {}).get((index.row(), index.column()))
+        if line_no is not None:
+            self.cell_selected.emit(line_no)
 
     def highlight_table_cell(self, regex, row, col):
         """Highlight a specific table cell in the given tab."""
@@ -373,36 +374,40 @@ class PiTableView(QTabWidget):
             tab_name = self.tab_widget.tabText(index)
             if pattern.match(tab_name):  # match the regex with the tab name
                 self.tab_widget.setCurrentIndex(index)
-                table = self.tab_widget.widget(index).findChild(QTableWidget)
+                self.ensure_tab(index)
+                table = self.tab_widget.widget(index).findChild(QTableView)
                 if table:
-                    table.setCurrentCell(row, col)
-                    table.scrollToItem(table.item(row, col))  # ensure the cell is visible
+                    model_index = table.model().index(row, col)
+                    table.setCurrentIndex(model_index)
+                    table.scrollTo(model_index)  # ensure the cell is visible
                     break
 
     def apply_heatmap_to_table(self, table, heatmap_ranges):
         """Apply heatmap colors to a specific table."""
-        for row in range(table.rowCount()):
-            for col in range(table.columnCount()):
-                item = table.item(row, col)
-                if item:
-                    value = int(item.text())
-                    item.setBackground(get_heatmap_color(value, heatmap_ranges))
+        table.model().set_ranges(heatmap_ranges)
 
+    @profiled("reload_heatmap")
     def reload_heatmap(self, heatmap_ranges):
-        """Reapply heatmap colors to all stored tables."""
+        """Reapply heatmap colors to all stored tables.
+
+        Only the visible table repaints, the others reclassify when shown.
+        """
+        if self.forecast_data:
+            return  # days to limit use FORECAST_RANGES
         for table in self.tables:
             self.apply_heatmap_to_table(table, heatmap_ranges)
 
     def export_to_csv(self):
         """Export the current tab's table values into a CSV file."""
-        current_tab_index = self.currentIndex()
-        current_widget = self.tab_widget.widget(current_tab_index).findChild(QTableWidget)
+        current_tab_index = self.tab_widget.currentIndex()
+        current_tab = self.tab_widget.widget(current_tab_index)
+        current_widget = current_tab.findChild(QTableView) if current_tab else None
 
         if not current_widget:
             QMessageBox.warning(self, "Export Error", "No table found in the selected tab.")
             return
 
-        table = current_widget
+        model = current_widget.model()
 
         # get the file name to save the CSV
         options = QFileDialog.Options()
@@ -421,13 +426,13 @@ class PiTableView(QTabWidget):
                 writer = csv.writer(file)
                 
                 # write headers
-                headers = [table.horizontalHeaderItem(col).text() for col in range(table.columnCount())]
+                headers = [model.headerData(col, Qt.Horizontal) for col in range(model.columnCount())]
                 writer.writerow(headers)
 
                 # write table content
-                for row in range(table.rowCount()):
-                    row_data = [table.item(row, col).text() if table.item(row, col) else '' 
-                                for col in range(table.columnCount())]
+                for row in range(model.rowCount()):
+                    row_data = [model.data(model.index(row, col)) or ''
+                                for col in range(model.columnCount())]
                     writer.writerow(row_data)
 
             QMessageBox.information(self, "Export Successful", f"Data successfully exported to {file_path}.")
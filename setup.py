@@ -22,8 +22,12 @@ setup(
     python_requires=">=3.7",
     install_requires=[
         "PyQt5>=5.15.0",
-        "matplotlib>=3.3.0",
+        "numpy>=1.17",
     ],
+    extras_require={
+        "zstd": ["zstandard"],
+        "test": ["pytest", "zstandard"],
+    },
     entry_points={
         "console_scripts": [
             "pypirccua=pypirccua.__main__:main",
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbarchive.py
+# Description:  Compressed and archived card file tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import csv
+import bz2
+import gzip
+import lzma
+import shutil
+import tarfile
+import zipfile
+
+import pytest
+import zstandard
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua import pidbarchive
+from pypirccua.pidbarchive import sniff, is_compressed, expand_archives, list_members, member_path
+from pypirccua.pidbmulti import PiDbMultiCard, iter_stream_cards
+from pypirccua.pidbbinary import binary_path
+from pypirccua.pidbsynth import write_synth_file
+from pypirccua import pirccli
+from pypirccua.pirccli import pirc_find_db_files, pirc_fleet_stats, pirc_fleet_tasks
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+CARD_NAME = "G385_60-891-006,410155,1.00.db"
+CARD_FILE = os.path.join(DATA_DIR, CARD_NAME)
+
+COMPRESSORS = [(".gz", gzip.compress, "gzip"), (".xz", lzma.compress, "xz"), (".bz2", bz2.compress, "bz2")]
+
+def card_relays(card_data):
+    return [layer["relays"] for layer in card_data["subunits"] + card_data["physical_layers"]]
+
+def compress_card(tmp_path, suffix, compress):
+    file_path = str(tmp_path / (CARD_NAME + suffix))
+    with open(CARD_FILE, "rb") as source, open(file_path, "wb") as file:
+        file.write(compress(source.read()))
+    return file_path
+
+@pytest.mark.parametrize("suffix, compress, kind", COMPRESSORS)
+def test_parse_compressed(tmp_path, suffix, compress, kind):
+    file_path = compress_card(tmp_path, suffix, compress)
+    assert sniff(file_path) == (kind, None) and is_compressed(file_path)
+
+    data = PiDbCard(file_path).parse_file()
+    plain = PiDbCard(CARD_FILE).parse_file()
+    assert data["header"] == plain["header"]
+    assert card_relays(data) == card_relays(plain)
+    assert data["subunits"][0]["relay_lines"] == plain["subunits"][0]["relay_lines"]  # parsed as a stream
+
+    header_data = PiDbCard(file_path).scan_header()
+    assert header_data["header"] == plain["header"]
+    assert not is_compressed(CARD_FILE)
+
+def test_detected_by_magic(tmp_path):
+    # a compressed card without the suffix
+    file_path = compress_card(tmp_path, "", gzip.compress)
+    assert PiDbCard(file_path).parse_file()["header"]["card_sn"] == "410155"
+
+def test_zstd(tmp_path):
+    file_path = compress_card(tmp_path, ".zst", zstandard.ZstdCompressor().compress)
+    assert sniff(file_path) == ("zstd", None)
+    assert card_relays(PiDbCard(file_path).parse_file()) == card_relays(PiDbCard(CARD_FILE).parse_file())
+    assert PiDbCard(file_path).scan_header()["header"]["card_sn"] == "410155"
+
+    # a zstd member of an archive
+    zip_path = str(tmp_path / "rack.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.write(file_path, CARD_NAME + ".zst")
+    assert card_relays(PiDbCard(member_path(zip_path, CARD_NAME + ".zst")).parse_file()) == card_relays(PiDbCard(CARD_FILE).parse_file())
+
+def test_archive_members(tmp_path):
+    zip_path = str(tmp_path / "rack.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.write(CARD_FILE, "rack1/" + CARD_NAME)
+        zip_file.writestr("readme.txt", "not a card")
+    tar_path = str(tmp_path / "rack.tar.gz")
+    with tarfile.open(tar_path, "w:gz") as tar:
+        tar.add(CARD_FILE, "rack2/" + CARD_NAME)
+
+    assert sniff(zip_path) == (None, "zip") and sniff(tar_path) == ("gzip", "tar")
+    assert list_members(zip_path) == ["rack1/" + CARD_NAME]
+    assert expand_archives([zip_path, tar_path, CARD_FILE]) == [
+        member_path(zip_path, "rack1/" + CARD_NAME), member_path(tar_path, "rack2/" + CARD_NAME), CARD_FILE,
+    ]
+
+    plain = card_relays(PiDbCard(CARD_FILE).parse_file())
+    for archive_path, member in ((zip_path, "rack1/" + CARD_NAME), (tar_path, "rack2/" + CARD_NAME)):
+        path = member_path(archive_path, member)
+        assert card_relays(PiDbCard(path).parse_file()) == plain
+        assert PiDbCard(path).scan_header()["header"]["card_sn"] == "410155"
+        assert binary_path(path) == os.path.join(str(tmp_path), "G385_60-891-006,410155,1.00.pirc")
+
+    with pytest.raises(ValueError):
+        PiDbCard(member_path(zip_path, "missing.db")).parse_file()
+
+def test_find_db_files(tmp_path):
+    shutil.copy(CARD_FILE, tmp_path / "plain.db")
+    compress_card(tmp_path, ".gz", gzip.compress)
+    with zipfile.ZipFile(tmp_path / "rack.zip", "w") as zip_file:
+        zip_file.write(CARD_FILE, CARD_NAME)
+    (tmp_path / "notes.txt.gz").write_bytes(gzip.compress(b"notes"))
+
+    files = [os.path.relpath(path, tmp_path) for path in pirc_find_db_files(str(tmp_path))]
+    assert files == [CARD_NAME + ".gz", "plain.db", member_path("rack.zip", CARD_NAME)]
+    assert pirc_find_db_files(str(tmp_path / "rack.zip")) == [member_path(str(tmp_path / "rack.zip"), CARD_NAME)]
+
+def test_fleet_compressed_dump(tmp_path):
+    dump_path = str(tmp_path / "dump.db")
+    write_synth_file(dump_path, [(6, 4)], [8], cards=3, seed=5)
+    with open(dump_path, "rb") as source, open(dump_path + ".xz", "wb") as file:
+        file.write(lzma.compress(source.read()))
+    os.remove(dump_path)
+
+    output = tmp_path / "fleet.csv"
+    assert pirc_fleet_stats(str(tmp_path), str(output), workers=1) == 0
+    with open(output, newline="") as file:
+        rows = list(csv.reader(file))[1:]
+    assert [row[2] for row in rows] == ["1000000", "1000000", "1000001", "1000001", "1000002", "1000002"]
+
+def test_compressed_archive_members(tmp_path):
+    with open(CARD_FILE, "rb") as file:
+        packed = gzip.compress(file.read())
+    zip_path = str(tmp_path / "nested.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr(CARD_NAME + ".gz", packed)
+    tar_path = str(tmp_path / "nested.tar")
+    with tarfile.open(tar_path, "w") as tar:
+        tar.add(compress_card(tmp_path, ".xz", lzma.compress), CARD_NAME + ".xz")
+
+    plain = card_relays(PiDbCard(CARD_FILE).parse_file())
+    for path in expand_archives([zip_path, tar_path]):
+        data = PiDbCard(path).parse_file()
+        assert data["header"]["card_sn"] == "410155"
+        assert card_relays(data) == plain
+
+def test_tar_decompressed_once(tmp_path, monkeypatch):
+    tar_path = str(tmp_path / "rack.tar.gz")
+    with tarfile.open(tar_path, "w:gz") as tar:
+        for index in range(3):
+            tar.add(CARD_FILE, f"rack{index}/{CARD_NAME}")
+
+    plain = card_relays(PiDbCard(CARD_FILE).parse_file())
+    data = None
+    with pidbarchive.cached_archives():
+        for path in expand_archives([tar_path]):
+            assert card_relays(PiDbCard(path).parse_file()) == plain
+            # the first member decompresses the archive, the others reuse its bytes
+            data = data or next(iter(pidbarchive.tar_cache.values()))
+            assert next(iter(pidbarchive.tar_cache.values())) is data
+    # released with the batch
+    assert not pidbarchive.tar_cache
+
+    # an archive over the limit is walked instead
+    monkeypatch.setattr(pidbarchive, "TAR_CACHE_BYTES", 1024)
+    with pidbarchive.cached_archives():
+        assert card_relays(PiDbCard(member_path(tar_path, f"rack2/{CARD_NAME}")).parse_file()) == plain
+        assert not pidbarchive.tar_cache
+
+def test_fleet_archive_one_task(tmp_path):
+    tar_path = str(tmp_path / "rack.tar.gz")
+    with tarfile.open(tar_path, "w:gz") as tar:
+        for index in range(3):
+            tar.add(CARD_FILE, f"rack{index}/{CARD_NAME}")
+    files = expand_archives([tar_path, CARD_FILE])
+    assert pirc_fleet_tasks(files) == [(tar_path, False), (CARD_FILE, False)]
+
+    output = tmp_path / "fleet.csv"
+    assert pirc_fleet_stats(tar_path, str(output), workers=1) == 0
+    with open(output, newline="") as file:
+        rows = list(csv.reader(file))[1:]
+    assert {row[0] for row in rows} == {member_path(tar_path, f"rack{index}/{CARD_NAME}") for index in range(3)}
+
+def test_fleet_split_dump(tmp_path, monkeypatch):
+    dump_path = str(tmp_path / "dump.db")
+    write_synth_file(dump_path, [(6, 4)], [8], cards=3, seed=5)
+    monkeypatch.setattr(pirccli, "FLEET_SPLIT_BYTES", 1)
+    assert pirc_fleet_tasks([dump_path]) == [(dump_path, True)]
+
+    output = tmp_path / "fleet.csv"
+    assert pirc_fleet_stats(dump_path, str(output), workers=2) == 0
+    with open(output, newline="") as file:
+        rows = list(csv.reader(file))[1:]
+    assert [row[2] for row in rows] == ["1000000", "1000000", "1000001", "1000001", "1000002", "1000002"]
+
+def test_iter_stream_cards(tmp_path):
+    dump_path = str(tmp_path / "dump.db")
+    write_synth_file(dump_path, [(6, 4)], [8], cards=3, seed=5)
+    with open(dump_path, "rb") as source, open(dump_path + ".gz", "wb") as file:
+        file.write(gzip.compress(source.read()))
+
+    cards = list(iter_stream_cards(dump_path + ".gz"))
+    assert [card["header"]["card_sn"] for card in cards] == ["1000000", "1000001", "1000002"]
+    assert [card_relays(card) for card in cards] == [card_relays(card) for card in PiDbMultiCard(dump_path, workers=1).parse_cards()]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbarray.py
+# Description:  Dense relay count array tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+
+import numpy as np
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbarray import relay_array, layer_statistics, layer_histogram, attach_arrays
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def test_relay_array():
+    layer = {"rows": 3, "cols": 2, "relays": {(0, 0): 5, (2, 1): 7}}
+    counts, mask = relay_array(layer)
+
+    assert counts.shape == (3, 2)
+    assert counts.dtype == np.uint32
+    assert counts[2, 1] == 7
+    assert mask.sum() == 2
+    assert not mask[1, 0]
+
+def test_relay_array_out_of_range_bit():
+    # a corrupted R;L;S1BIT999999999 line is dropped instead of growing the array
+    layer = {"rows": 3, "cols": 2, "relays": {(0, 0): 5, (3, 1): 2, (499999999, 0): 1}}
+    counts, mask = relay_array(layer)
+
+    assert counts.shape == (4, 2)
+    assert mask.sum() == 2
+    assert counts[3, 1] == 2
+
+def test_relay_array_wide_counts():
+    counts, _ = relay_array({"rows": 1, "cols": 1, "relays": {(0, 0): 2 ** 40}})
+    assert counts.dtype == np.uint64
+    assert counts[0, 0] == 2 ** 40
+
+def test_layer_statistics():
+    data = PiDbCard(os.path.join(DATA_DIR, "40-560-121-M-552X8,1000000,1.01.db")).parse_file()
+    attach_arrays(data)
+
+    matrix = data["subunits"][0]
+    values = list(matrix["relays"].values())
+    stats = layer_statistics(matrix)
+    assert matrix["counts"].shape == (552, 8)
+    assert stats["relays"] == len(values)
+    assert stats["max"] == max(values)
+    assert stats["sum"] == sum(values)
+    assert abs(stats["mean"] - sum(values) / len(values)) < 1e-9
+    assert abs(stats["std"] - float(np.std(values))) < 1e-9
+
+def test_layer_statistics_empty():
+    stats = layer_statistics({"rows": 4, "cols": 1, "relays": {}})
+    assert stats == {"relays": 0, "max": 0, "mean": 0.0, "sum": 0, "std": 0.0}
+
+def test_layer_histogram_cached():
+    layer = {"rows": 2, "cols": 2, "relays": {(0, 0): 1, (0, 1): 2, (1, 1): 10}}
+    hist, edges = layer_histogram(layer, bins=3)
+
+    assert hist.sum() == 3
+    assert edges[0] == 1 and edges[-1] == 10
+    assert layer_histogram(layer, bins=3)[0] is hist
+    assert layer_histogram(layer, bins=4)[0].size == 4
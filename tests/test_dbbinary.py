@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbbinary.py
+# Description:  Binary card format tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import glob
+import shutil
+import zipfile
+
+import numpy as np
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbbinary import save_binary, binary_path, BINARY_EXTENSION
+from pypirccua.pidbreader import is_binary_card
+from pypirccua.pirccli import pirc_stats_lines, pirc_convert
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def layer_key(layer):
+    return {key: value for key, value in layer.items() if key not in ("relay_lines", "counts", "mask")}
+
+def test_binary_roundtrip(tmp_path):
+    for file_path in sorted(glob.glob(os.path.join(DATA_DIR, "*.db"))):
+        data = PiDbCard(file_path).parse_file()
+        output_file = binary_path(file_path, str(tmp_path))
+        save_binary(output_file, data)
+
+        assert output_file.endswith(BINARY_EXTENSION)
+        assert is_binary_card(output_file)
+        assert not is_binary_card(file_path)
+
+        loaded = PiDbCard(output_file).parse_file()
+        for key in ("header", "generation", "architecture"):
+            assert loaded[key] == data[key]
+        assert [layer_key(s) for s in loaded["subunits"]] == [layer_key(s) for s in data["subunits"]]
+        assert [layer_key(l) for l in loaded["physical_layers"]] == [layer_key(l) for l in data["physical_layers"]]
+        assert loaded["subunit_index"][1] is loaded["subunits"][0]
+        assert pirc_stats_lines(file_path, loaded) == pirc_stats_lines(file_path, data)
+
+def test_binary_counts_map_the_file(tmp_path):
+    file_path = tmp_path / "card.db"
+    file_path.write_text(
+        "PILPXIDB004;40-190-002,1000001,1.01\n"
+        "A;3;Loops;1;3\n"
+        "S;0;1;2;3;6;0;MATRIX\n"
+        "R;L;S1BIT2;5000000000;\n"
+        "R;P;L0BIT0;4;\n"
+        "E;EOF\n"
+    )
+    output_file = str(tmp_path / "card.pirc")
+    save_binary(output_file, PiDbCard(str(file_path)).parse_file())
+
+    loaded = PiDbCard(output_file).parse_file()
+    subunit = loaded["subunits"][0]
+    assert subunit["relays"] == {(0, 1): 5000000000}
+    assert subunit["counts"].dtype == np.dtype("<u8")
+    assert not subunit["counts"].flags.writeable  # a view, not a copy
+    assert subunit["mask"].sum() == 1
+    assert loaded["physical_layers"][0]["relays"] == {(0, 0): 4}
+
+    # records of a binary card rebuild the same card
+    card = PiDbCard(output_file)
+    records = list(card.iter_records())
+    rebuilt = PiDbCard(output_file)
+    for record in records:
+        rebuilt.add_record(record)
+    assert rebuilt.card_data["subunits"][0]["relays"] == subunit["relays"]
+
+def test_save_binary_replaces_mapped_file(tmp_path):
+    file_path = os.path.join(DATA_DIR, "G385_60-891-006,410155,1.00.db")
+    data = PiDbCard(file_path).parse_file()
+    output_file = str(tmp_path / "card.pirc")
+    save_binary(output_file, data)
+    counts = PiDbCard(output_file).parse_file()["subunits"][0]["counts"]
+    expected = counts.copy()
+
+    # saved again while the counts are mapped, the mapping keeps the old file
+    data["subunits"][0]["relays"] = {}
+    save_binary(output_file, data)
+    assert np.array_equal(counts, expected)
+    assert os.listdir(tmp_path) == ["card.pirc"]
+
+def test_convert(tmp_path, capsys):
+    assert pirc_convert(DATA_DIR, str(tmp_path)) == 0
+    converted = sorted(os.listdir(tmp_path))
+    assert converted and all(name.endswith(BINARY_EXTENSION) for name in converted)
+    assert "Converted" in capsys.readouterr().out
+
+def test_convert_mirrors_folders(tmp_path, capsys):
+    card_file = os.path.join(DATA_DIR, "G385_60-891-006,410155,1.00.db")
+    for rack in ("rack1", "rack2"):
+        os.makedirs(tmp_path / "cards" / rack)
+        shutil.copy(card_file, tmp_path / "cards" / rack / "card.db")
+    output_dir = tmp_path / "out"
+    assert pirc_convert(str(tmp_path / "cards"), str(output_dir)) == 0
+    assert sorted(os.listdir(output_dir)) == ["rack1", "rack2"]
+    assert os.listdir(output_dir / "rack1") == ["card.pirc"]
+
+    # members of one name in an archive are reported instead of overwritten
+    zip_path = tmp_path / "cards" / "racks.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.write(card_file, "rack1/card.db")
+        zip_file.write(card_file, "rack2/card.db")
+    assert pirc_convert(str(zip_path), str(output_dir)) == 1
+    assert "already converted" in capsys.readouterr().err
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbcache.py
+# Description:  Parsed card cache tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbcache import PiDbCardCache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def copy_card(tmp_path, name="40-197A-001,1000000,1.00.db"):
+    file_path = str(tmp_path / name)
+    shutil.copy(os.path.join(DATA_DIR, name), file_path)
+    return file_path
+
+def test_cache_round_trip(tmp_path):
+    file_path = copy_card(tmp_path)
+    cache = PiDbCardCache(str(tmp_path / "cache"))
+
+    data = cache.load(file_path)
+    assert cache.load(file_path) is data  # memory hit
+    assert os.path.exists(cache.cache_path(file_path))
+
+    # cold start reads the disk cache
+    cold = PiDbCardCache(str(tmp_path / "cache")).load(file_path)
+    expected = PiDbCard(file_path).parse_file()
+    for key in ("header", "generation", "architecture", "subunits", "physical_layers"):
+        assert cold[key] == expected[key]
+    assert cold["subunit_index"][2] is cold["subunits"][1]
+
+def test_cache_invalidated_on_change(tmp_path):
+    file_path = copy_card(tmp_path)
+    cache = PiDbCardCache(str(tmp_path / "cache"))
+    assert cache.load(file_path)["generation"] == 25
+
+    with open(file_path) as file:
+        text = file.read().replace("G;25", "G;26")
+    with open(file_path, "w") as file:
+        file.write(text + "\n")
+
+    assert cache.get_cached(file_path) is None
+    assert cache.load(file_path)["generation"] == 26
+
+def test_cache_lru(tmp_path):
+    cache = PiDbCardCache(str(tmp_path / "cache"), max_items=1)
+    first = copy_card(tmp_path)
+    second = copy_card(tmp_path, "G3_60-891-006,410155,1.00.db")
+
+    cache.load(first)
+    cache.load(second)
+    assert cache.get_cached(first) is None
+    assert cache.get_cached(second) is not None
+
+def test_cache_removed_file(tmp_path):
+    file_path = copy_card(tmp_path)
+    cache = PiDbCardCache(str(tmp_path / "cache"))
+    cache.load(file_path)
+    os.remove(file_path)
+    assert cache.get_cached(file_path) is None
+
+def test_cache_disk_eviction(tmp_path):
+    first = copy_card(tmp_path)
+    second = str(tmp_path / "copy.db")  # the same card, a shorter path in the entry
+    shutil.copy(first, second)
+    cache = PiDbCardCache(str(tmp_path / "cache"))
+    cache.load(first)
+    entry_size = os.path.getsize(cache.cache_path(first))
+
+    # room for one entry, the least recently used one is removed
+    cache = PiDbCardCache(str(tmp_path / "cache"), max_disk_bytes=entry_size)
+    cache.load(second)
+    assert not os.path.exists(cache.cache_path(first))
+    assert os.path.exists(cache.cache_path(second))
@@ -1,10 +1,114 @@
-from pidbcard import *
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbcard.py
+# Description:  PiDbCard parser tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
 
-card = PiDbCard("G385_60-891-006,410155,1.00.db")
-data = card.parse_file()
+import os
 
-print(data["header"]) 
-print(data["generation"])
-print(data["architecture"])
-print(data["subunits"])
-print(data["physical_layers"])
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbtokenizer import (
+    tokenize_relay, iter_records, HeaderRecord, SubunitRecord, RelayRecord, EndRecord
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def data_file(name):
+    return os.path.join(DATA_DIR, name)
+
+def test_parse_file():
+    card = PiDbCard(data_file("G385_60-891-006,410155,1.00.db"))
+    data = card.parse_file()
+
+    assert data["header"] == {
+        "pilpxi_version": 4,
+        "card_id": "60-891-006",
+        "card_sn": "410155",
+        "fw_version": "1.00",
+        "is_simulated": False,
+    }
+    assert data["generation"] == 385
+    assert data["architecture"]["num_loops"] == 9
+    assert len(data["subunits"]) == 14
+    assert len(data["physical_layers"]) == 9
+
+    matrix = data["subunits"][0]
+    assert (matrix["rows"], matrix["cols"]) == (12, 12)
+    assert matrix["relays"][(0, 0)] == 9  # R;L;S1BIT1;9;
+    assert matrix["relays"][(0, 1)] == 4  # R;L;S1BIT2;4;
+
+def test_parse_file_matrix():
+    data = PiDbCard(data_file("40-560-121-M-552X8,1000000,1.01.db")).parse_file()
+
+    assert data["header"]["is_simulated"] is True
+    matrix = data["subunits"][0]
+    assert len(matrix["relays"]) == 552 * 8
+    assert matrix["relays"][(551, 7)] == 4416  # R;L;S1BIT4416;4416;
+    assert data["physical_layers"][11]["relays"][(383, 0)] == 4608  # R;P;L11BIT383;4608;
+    assert len(data["physical_layers"][0]["relays"]) == 384  # BIT0 .. BIT383
+
+def test_tokenize_relay():
+    assert tokenize_relay("R;L;S1BIT12;345;") == ("L", 1, 12, 345)
+    assert tokenize_relay("R;P;L11BIT383;4608") == ("P", 11, 383, 4608)
+    assert tokenize_relay("R;X;S1BIT12;345;") is None
+    assert tokenize_relay("R;L;S1BIT;345;") is None
+    assert tokenize_relay("R;L;S1BIT12;-5;") is None
+    assert tokenize_relay("R;L;S1BIT12;") is None
+    assert tokenize_relay("R;L") is None
+
+def test_layer_index():
+    card = PiDbCard(data_file("40-197A-001,1000000,1.00.db"))
+    data = card.parse_file()
+
+    assert sorted(data["subunit_index"]) == [1, 2, 3, 4, 5, 6, 7]
+    assert sorted(data["loop_index"]) == [0, 1]
+    for subunit in data["subunits"]:
+        assert data["subunit_index"][subunit["layer_id"]] is subunit
+    assert card.get_subunit(7)["rows"] == 4
+    assert card.get_loop(1) is data["physical_layers"][1]
+    assert card.get_subunit(99) is None
+
+def test_iter_records():
+    card = PiDbCard(data_file("G3_60-891-006,410155,1.00.db"))
+    records = list(card.iter_records())
+
+    assert isinstance(records[0], HeaderRecord)
+    assert records[0].card_sn == "410155"
+    assert sum(isinstance(record, SubunitRecord) for record in records) == 14
+    assert records[-2] == RelayRecord(27, "P", 3, 5, 1)  # R;P;L3BIT5;1;
+    assert records[-1] == EndRecord(28)
+
+def test_iter_records_concatenated():
+    with open(data_file("G3_60-891-006,410155,1.00.db")) as file:
+        lines = file.readlines()
+
+    records = list(iter_records(lines + lines))
+    headers = [record for record in records if isinstance(record, HeaderRecord)]
+    assert len(headers) == 2
+    assert headers[1].line_no == len(lines)
+
+def test_relay_lines():
+    data = PiDbCard(data_file("40-560-121-M-552X8,1000000,1.01.db")).parse_file()
+
+    matrix = data["subunits"][0]
+    assert matrix["relay_lines"][(0, 0)] == 8  # R;L;S1BIT1 is the 9th line
+    assert matrix["relay_lines"][(100, 5)] == 8 + 805
+    assert data["physical_layers"][11]["relay_lines"][(383, 0)] == 9223
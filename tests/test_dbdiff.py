@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbdiff.py
+# Description:  Snapshot diff tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbdiff import diff_cards, top_relays
+from pypirccua.pirccli import pirc_diff
+
+CARD = (
+    "PILPXIDB004;40-190-002,1000001,1.01\n"
+    "A;3;Loops;1;2\n"
+    "S;0;1;2;3;6;0;MATRIX\n"
+    "{relays}"
+    "E;EOF\n"
+)
+
+def write_card(path, relays, card_sn="1000001"):
+    path.write_text(CARD.replace("1000001", card_sn).format(relays="".join(relays)))
+    return str(path)
+
+def test_diff_cards(tmp_path):
+    file_a = write_card(tmp_path / "a.db", ["R;L;S1BIT1;10;\n", "R;L;S1BIT2;20;\n", "R;P;L0BIT0;5;\n"])
+    file_b = write_card(tmp_path / "b.db", ["R;L;S1BIT1;110;\n", "R;L;S1BIT2;25;\n", "R;L;S1BIT6;7;\n", "R;P;L0BIT0;5;\n"])
+
+    diff = diff_cards(PiDbCard(file_a).parse_file(), PiDbCard(file_b).parse_file(), days=10)
+    subunit = diff["subunit_index"][1]
+    assert subunit["counts"][0].tolist() == [100, 5, 0]
+    assert subunit["counts"][1, 2] == 7  # new relay counts from 0
+    assert subunit["rate"][0, 0] == 10.0
+
+    top = top_relays(diff, 2)
+    assert [(relay["layer"], relay["bit"], relay["delta"]) for relay in top] == [("Subunit", 1, 100), ("Subunit", 6, 7)]
+    assert top[0]["rate"] == 10.0
+
+def test_diff_different_cards(tmp_path):
+    file_a = write_card(tmp_path / "a.db", ["R;L;S1BIT1;10;\n"])
+    file_b = write_card(tmp_path / "b.db", ["R;L;S1BIT1;10;\n"], card_sn="1000002")
+    with pytest.raises(ValueError):
+        diff_cards(PiDbCard(file_a).parse_file(), PiDbCard(file_b).parse_file())
+    assert pirc_diff(file_a, file_b) == 1
+
+def test_diff_cli(tmp_path, capsys):
+    file_a = write_card(tmp_path / "a.db", ["R;L;S1BIT4;1;\n"])
+    file_b = write_card(tmp_path / "b.db", ["R;L;S1BIT4;31;\n"])
+    assert pirc_diff(file_a, file_b, top=1, days=3) == 0
+    out = capsys.readouterr().out
+    assert "Interval: 3.00 days" in out
+    assert "Subunit 1 BIT4: +30 (10.00 cycles/day)" in out
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbforecast.py
+# Description:  End of life forecast tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import csv
+
+import numpy as np
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbhistory import PiDbHistory
+from pypirccua.pidbforecast import forecast_relays, forecast_history, forecast_card_data, forecast_order, LAYER_CODES
+from pypirccua.pirccli import pirc_forecast, FORECAST_COLUMNS
+
+DAY = 86400
+
+def test_forecast_relays():
+    # relay 1 wears 10/day, relay 2 does not wear, relay 3 is seen once
+    taken_at = [0, 0, 10 * DAY, 10 * DAY, 20 * DAY, 20 * DAY, 20 * DAY]
+    bits = [1, 2, 1, 2, 1, 2, 3]
+    counts = [100, 5, 200, 5, 300, 5, 7]
+    forecast = forecast_relays(taken_at, [0] * 7, [1] * 7, bits, counts, limit=1000)
+
+    assert forecast["bit"].tolist() == [1, 2, 3]
+    assert forecast["count"].tolist() == [300, 5, 7]
+    assert np.allclose(forecast["rate"][:2], [10.0, 0.0])
+    assert forecast["days"][0] == 70.0
+    assert np.isinf(forecast["days"][1])
+    assert np.isnan(forecast["days"][2])
+    assert forecast_order(forecast).tolist() == [0, 1, 2]
+
+def test_forecast_history(tmp_path):
+    card = "PILPXIDB004;40-190-002,1000001,1.01\nA;3;Loops;1;2\nS;0;1;2;3;6;0;MATRIX\n{relays}E;EOF\n"
+    history = PiDbHistory(str(tmp_path / "history.sqlite3"))
+    for day, count in ((0, 10), (5, 60)):
+        path = tmp_path / f"card{day}.db"
+        path.write_text(card.format(relays=f"R;L;S1BIT5;{count};\nR;P;L0BIT1;{day};\n"))
+        os.utime(path, (day * DAY, day * DAY))
+        history.ingest(str(path))
+
+    forecast = forecast_history(history, "40-190-002", "1000001", limit=110)
+    assert forecast["layer"].tolist() == [LAYER_CODES["L"], LAYER_CODES["P"]]
+    assert forecast["days"].tolist() == [5.0, 105.0]
+
+    data = forecast_card_data(PiDbCard(str(path)).parse_file(), forecast)
+    assert data["subunits"][0]["counts"][1, 1] == 5  # BIT5 of a 3 column matrix
+    assert data["subunits"][0]["mask"].sum() == 1
+    assert data["physical_layers"][0]["counts"][1, 0] == 105
+    history.close()
+
+    output = tmp_path / "forecast.csv"
+    assert pirc_forecast(str(tmp_path / "history.sqlite3"), 110, str(output)) == 0
+    with open(output, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == FORECAST_COLUMNS
+    assert rows[1] == ["40-190-002", "1000001", "L", "1", "5", "60", "10.0", "5.0"]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbhistory.py
+# Description:  Relay count history tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+
+from pypirccua.pidbhistory import PiDbHistory
+
+CARD = (
+    "PILPXIDB004;40-190-002,1000001,1.01\n"
+    "A;3;Loops;1;2\n"
+    "S;0;1;2;3;6;0;MATRIX\n"
+    "{relays}"
+    "E;EOF\n"
+)
+
+DAY = 86400
+
+def write_card(path, relays, day):
+    path.write_text(CARD.format(relays="".join(relays)))
+    os.utime(path, (day * DAY, day * DAY))
+    return str(path)
+
+def test_ingest_is_incremental(tmp_path):
+    history = PiDbHistory(str(tmp_path / "history.sqlite3"))
+    file_a = write_card(tmp_path / "a.db", ["R;L;S1BIT1;10;\n", "R;P;L0BIT1;3;\n"], day=1)
+
+    snapshot_id, added = history.ingest(file_a)
+    assert added
+    assert history.ingest(file_a) == (snapshot_id, False)
+
+    # same content under another name is the same snapshot
+    copy = write_card(tmp_path / "copy.db", ["R;L;S1BIT1;10;\n", "R;P;L0BIT1;3;\n"], day=5)
+    assert history.ingest(copy) == (snapshot_id, False)
+    assert len(history.snapshots()) == 1
+
+def test_history_queries(tmp_path):
+    history = PiDbHistory(":memory:")
+    history.ingest(write_card(tmp_path / "a.db", ["R;L;S1BIT1;10;\n", "R;L;S1BIT5;100;\n"], day=100))
+    history.ingest(write_card(tmp_path / "b.db", ["R;L;S1BIT1;40;\n", "R;L;S1BIT5;150;\n", "R;P;L0BIT1;7;\n"], day=110))
+
+    assert history.cards() == [("40-190-002", "1000001", 2, 110.0 * DAY)]
+    assert history.relay_series("40-190-002", "1000001", "L", 1, 1) == [(100.0 * DAY, 10), (110.0 * DAY, 40)]
+
+    # only the latest snapshot counts
+    assert history.relays_above(30) == [
+        ("40-190-002", "1000001", "L", 1, 5, 150),
+        ("40-190-002", "1000001", "L", 1, 1, 40),
+    ]
+
+    growth = history.relay_growth(days=90, now=120.0 * DAY)
+    assert [row[2:6] for row in growth] == [("L", 1, 5, 50), ("L", 1, 1, 30), ("P", 0, 1, 7)]
+    assert growth[0][6] == 10.0
+    assert history.relay_growth(days=5, now=120.0 * DAY) == []  # one snapshot in the window
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbindexer.py
+# Description:  Background folder catalog tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import threading
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbindexer import PiDbIndexer, PiDbIndexTask
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+CARD_FILE = os.path.join(DATA_DIR, "G385_60-891-006,410155,1.00.db")
+
+def index_now(indexer):
+    """Run one scan on the calling thread, returns the emitted catalog changes."""
+    task = PiDbIndexTask(indexer.inventories)
+    changes, finished = [], []
+    task.signals.catalog_changed.connect(lambda cards, removed: changes.append((cards, removed)))
+    task.signals.indexing_finished.connect(lambda *counts: finished.append(counts))
+    task.run()
+    return changes, finished[0]
+
+def test_indexer_catalog(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYPIRCCUA_CACHE_DIR", str(tmp_path / "cache"))
+    folder = tmp_path / "cards"
+    os.makedirs(folder)
+    shutil.copy(CARD_FILE, folder / "a.db")
+
+    indexer = PiDbIndexer()
+    assert indexer.set_folders([str(folder), "", str(folder)]) == []  # no catalog yet
+    assert len(indexer.inventories) == 1
+
+    changes, counts = index_now(indexer)
+    assert counts == (1, 1, 0)
+    assert [path for path, _ in changes[0][0]] == [str(folder / "a.db")]
+    assert changes[0][1] == []
+
+    # the saved catalog fills a new indexer without scanning
+    indexer = PiDbIndexer()
+    cards = indexer.set_folders([str(folder)])
+    assert [(path, entry["generation"]) for path, entry in cards] == [(str(folder / "a.db"), 385)]
+    assert index_now(indexer) == ([], (1, 0, 0))
+
+    os.remove(folder / "a.db")
+    shutil.copy(CARD_FILE, folder / "b.db")
+    changes, counts = index_now(indexer)
+    assert counts == (1, 1, 0)
+    assert [path for path, _ in changes[0][0]] == [str(folder / "b.db")]
+    assert changes[0][1] == [str(folder / "a.db")]
+
+def test_indexer_keeps_unreachable_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYPIRCCUA_CACHE_DIR", str(tmp_path / "cache"))
+    folder = tmp_path / "share"
+    os.makedirs(folder)
+    shutil.copy(CARD_FILE, folder / "a.db")
+
+    indexer = PiDbIndexer()
+    indexer.set_folders([str(folder)])
+    index_now(indexer)
+
+    shutil.rmtree(folder)
+    assert index_now(indexer) == ([], (1, 0, 0))
+
+def test_card_list_keeps_snapshots():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from pypirccua.pidbcardlist import PiDbCardList
+    app = QApplication.instance() or QApplication([])
+
+    entry = {"header": {"card_id": "60-891-006", "card_sn": "410155"}, "generation": 7}
+    card_list = PiDbCardList()
+    assert card_list.add_cards([("old.db", entry), ("new.db", entry), ("new.db", entry)]) == 2
+    assert card_list.topLevelItemCount() == 1
+    assert card_list.topLevelItem(0).child(0).childCount() == 2
+
+    # the catalog removes one snapshot, the card stays with the other
+    card_list.remove_files(["old.db"])
+    assert card_list.topLevelItemCount() == 1
+    selected = []
+    card_list.generation_selected.connect(selected.append)
+    card_list.on_item_clicked(card_list.topLevelItem(0).child(0), 0)
+    assert selected == ["new.db"]
+
+    card_list.remove_files(["new.db", "missing.db"])
+    assert card_list.topLevelItemCount() == 0 and not card_list.cards
+
+def test_indexer_folders_replaced_while_scanning(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYPIRCCUA_CACHE_DIR", str(tmp_path / "cache"))
+    for name in ("old", "new"):
+        os.makedirs(tmp_path / name)
+        shutil.copy(CARD_FILE, tmp_path / name / "a.db")
+
+    indexer = PiDbIndexer()
+    indexer.set_folders([str(tmp_path / "old")])
+    indexer.task = PiDbIndexTask(indexer.inventories)  # a scan of the old folder is running
+    indexer.set_folders([str(tmp_path / "new")])
+    assert indexer.stale
+
+    reported, finished = [], []
+    indexer.catalog_changed.connect(lambda cards, removed: reported.append([path for path, _ in cards]))
+    indexer.indexing_finished.connect(lambda *counts: finished.append(counts))
+    indexer.on_catalog_changed([(str(tmp_path / "old" / "a.db"), {})], [])
+    assert reported == []
+
+    # the new folder is scanned right after the old scan ends
+    indexer.on_indexing_finished(1, 1, 0)
+    assert finished == [] and indexer.is_indexing() and not indexer.stale
+    indexer.stop()
+
+def test_open_folder_scans_in_background(tmp_path, monkeypatch):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    monkeypatch.setenv("PYPIRCCUA_CACHE_DIR", str(tmp_path / "cache"))
+    from PyQt5.QtCore import QSettings
+    from PyQt5.QtWidgets import QApplication
+    from pypirccua.pircviewer import PircViewer
+    from pypirccua.pidbinventory import PiDbInventory
+    app = QApplication.instance() or QApplication([])
+    monkeypatch.setattr(QSettings, "value", lambda self, key, default=None: default)
+
+    folder = tmp_path / "cards"
+    os.makedirs(folder)
+    shutil.copy(CARD_FILE, folder / "a.db")
+    PiDbInventory(str(folder)).update()
+    shutil.copy(CARD_FILE, folder / "b.db")
+
+    viewer = PircViewer()
+    # listed from the saved index before the scan
+    assert viewer.load_inventory(str(folder)) == 1
+    assert set(viewer.pi_db_card_list.card_files) == {str(folder / "a.db")}
+
+    viewer.card_indexer.thread_pool.waitForDone()
+    app.processEvents()
+    assert set(viewer.pi_db_card_list.card_files) == {str(folder / "a.db"), str(folder / "b.db")}
+    assert not viewer.folder_tasks
+    viewer.close()
+
+def test_loader_cancel_releases_running(tmp_path):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from pypirccua.pidbcardloader import PiDbCardLoader
+    app = QApplication.instance() or QApplication([])
+
+    started, release = threading.Event(), threading.Event()
+    class BlockingCache:
+        def load(self, file_path):
+            started.set()
+            release.wait(5)
+            return PiDbCard(file_path).parse_file()
+
+    loader = PiDbCardLoader(BlockingCache(), max_threads=1)
+    loaded = []
+    loader.card_loaded.connect(lambda path, data: loaded.append(path))
+    loader.load([CARD_FILE, CARD_FILE])
+    assert started.wait(5)
+
+    # the running card is kept until it ends, the queued one is taken
+    loader.cancel()
+    assert len(loader.cancelled) == 1 and not loader.batch
+    release.set()
+    loader.wait()
+    app.processEvents()
+    assert not loader.cancelled and loaded == []
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbinventory.py
+# Description:  Header-only inventory tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import shutil
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbbinary import save_binary
+from pypirccua.pidbinventory import PiDbInventory, INVENTORY_FILE
+from pypirccua.pirccli import pirc_inventory
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+CARD_FILE = os.path.join(DATA_DIR, "G385_60-891-006,410155,1.00.db")
+
+def test_scan_header():
+    header_data = PiDbCard(CARD_FILE).scan_header()
+    data = PiDbCard(CARD_FILE).parse_file()
+
+    for key in ("header", "generation", "architecture"):
+        assert header_data[key] == data[key]
+    assert [subunit["layer_id"] for subunit in header_data["subunits"]] == [subunit["layer_id"] for subunit in data["subunits"]]
+    assert len(header_data["physical_layers"]) == 9
+    assert all(not layer["relays"] for layer in header_data["subunits"] + header_data["physical_layers"])
+
+def test_scan_header_binary(tmp_path):
+    binary_file = str(tmp_path / "card.pirc")
+    data = PiDbCard(CARD_FILE).parse_file()
+    save_binary(binary_file, data)
+
+    header_data = PiDbCard(binary_file).scan_header()
+    assert header_data["header"] == data["header"]
+    assert header_data["subunit_index"][1]["rows"] == 12
+    assert not header_data["subunit_index"][1]["relays"]
+
+def test_inventory_rescans_changed_files(tmp_path):
+    os.makedirs(tmp_path / "rack")
+    shutil.copy(CARD_FILE, tmp_path / "rack" / "a.db")
+    shutil.copy(CARD_FILE, tmp_path / "b.db")
+    (tmp_path / "bad.db").write_text("not a card\n")
+
+    inventory = PiDbInventory(str(tmp_path))
+    entries = inventory.update(workers=2)
+    assert sorted(entries) == ["b.db", os.path.join("rack", "a.db")]
+    assert inventory.scanned == 3
+    assert list(inventory.errors) == ["bad.db"]
+    assert entries["b.db"]["header"]["card_sn"] == "410155"
+    assert entries["b.db"]["generation"] == 385
+
+    with open(tmp_path / INVENTORY_FILE) as file:
+        assert json.load(file)["cards"] == entries
+
+    # unchanged files come from the sidecar index
+    inventory = PiDbInventory(str(tmp_path))
+    inventory.update()
+    assert inventory.scanned == 1  # the bad file only
+
+    with open(tmp_path / "b.db", "a") as file:
+        file.write("\n")
+    os.remove(tmp_path / "rack" / "a.db")
+    inventory = PiDbInventory(str(tmp_path))
+    entries = inventory.update()
+    assert inventory.scanned == 2
+    assert list(entries) == ["b.db"]
+    assert [path for path, _ in inventory.cards()] == [os.path.join(str(tmp_path), "b.db")]
+
+def test_inventory_command(tmp_path, capsys):
+    shutil.copy(CARD_FILE, tmp_path / "a.db")
+    index_path = str(tmp_path / "index.json")
+
+    assert pirc_inventory(str(tmp_path), index_path, list_cards=True) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].startswith("File,Card ID,Card S/N")
+    assert out[1].endswith("60-891-006,410155,1.00,False,385,14,9")
+    assert os.path.exists(index_path)
+    assert not os.path.exists(tmp_path / INVENTORY_FILE)
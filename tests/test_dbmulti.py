@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbmulti.py
+# Description:  Concatenated multi-card dump tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import csv
+import functools
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbreader import PiDbReader
+from pypirccua.pidbmulti import PiDbMultiCard, find_card_chunks
+from pypirccua.pidbsynth import write_synth_file
+from pypirccua.pirccli import pirc_fleet_stats, pirc_card_rows
+
+def write_dump(tmp_path, cards=3):
+    file_path = str(tmp_path / "dump.db")
+    write_synth_file(file_path, [(6, 4)], [8], cards=cards, seed=5)
+    return file_path
+
+def card_relays(card_data):
+    return [layer["relays"] for layer in card_data["subunits"] + card_data["physical_layers"]]
+
+def test_find_card_chunks():
+    buffer = b"\nPILPXIDB004;a,1,1.00\nS;0;1;1;1;1;0;PILPXIDB\nE;EOF\r\nPILPXIDB004;b,2,1.00\nR;L;S1BIT1;3;\n"
+    chunks = find_card_chunks(buffer)
+    assert [buffer[start:end].split(b";")[1] for start, end in chunks] == [b"a,1,1.00\nS", b"b,2,1.00\nR"]
+    assert chunks[0][1] == chunks[1][0] and chunks[1][1] == len(buffer)
+    assert find_card_chunks(b"") == []
+
+def test_parse_cards(tmp_path):
+    file_path = write_dump(tmp_path)
+    reader = PiDbMultiCard(file_path, workers=1)
+    assert len(reader) == 3
+
+    cards = reader.parse_cards()
+    assert [card["header"]["card_sn"] for card in cards] == ["1000000", "1000001", "1000002"]
+    for card, (start, end) in zip(cards, reader.chunks):
+        assert len(card["subunits"]) == 1 and len(card["physical_layers"]) == 1
+        assert len(card["subunits"][0]["relays"]) == 24
+        assert card["subunit_index"][1] is card["subunits"][0]
+        assert min(card["subunits"][0]["relay_lines"].values()) < 10  # lines of the chunk
+
+    # the merged parse only keeps the last card per subunit
+    merged = PiDbCard(file_path).parse_file()
+    assert card_relays(cards[-1]) == [merged["subunits"][-1]["relays"], merged["physical_layers"][-1]["relays"]]
+
+def test_chunk_read_in_place(tmp_path):
+    file_path = write_dump(tmp_path)
+    reader = PiDbMultiCard(file_path, workers=2)
+    tasks = reader.tasks()
+    assert next(tasks) == (file_path, 0, reader.chunks[0][1], None)  # made lazily
+
+    start, end = reader.chunks[1]
+    chunk = PiDbReader(file_path, start, end)
+    assert chunk.is_mapped() and chunk.offsets[0] == start and chunk.offsets[-1] == end
+    assert chunk.line(0).startswith("PILPXIDB") and chunk.line(chunk.line_count() - 1) == "E;EOF"
+    with open(file_path, "rb") as file:
+        assert chunk.line_count() == file.read()[start:end].count(b"\n")
+
+def test_parse_cards_parallel(tmp_path):
+    file_path = write_dump(tmp_path, cards=4)
+    serial = PiDbMultiCard(file_path, workers=1).parse_cards()
+    parallel = PiDbMultiCard(file_path, workers=2)
+    assert [card_relays(card) for card in parallel.iter_cards()] == [card_relays(card) for card in serial]
+
+    rows = list(parallel.map_cards(functools.partial(pirc_card_rows, file_path)))
+    assert [card_rows[0][2] for card_rows in rows] == ["1000000", "1000001", "1000002", "1000003"]
+
+def test_fleet_splits_dumps(tmp_path):
+    write_dump(tmp_path)
+    output = tmp_path / "fleet.csv"
+    assert pirc_fleet_stats(str(tmp_path), str(output), workers=1) == 0
+
+    with open(output, newline="") as file:
+        rows = list(csv.reader(file))[1:]
+    assert [row[2] for row in rows] == ["1000000", "1000000", "1000001", "1000001", "1000002", "1000002"]
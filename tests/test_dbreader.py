@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbreader.py
+# Description:  Memory-mapped reader tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import glob
+
+from pypirccua.pidbreader import PiDbReader, open_reader, tokenize_relay_bytes
+from pypirccua.pidbtokenizer import iter_records
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def test_reader_lines(tmp_path):
+    file_path = tmp_path / "card.db"
+    file_path.write_bytes(b"PILPXIDB004;40-190-002,1000000,1.01\r\nG;7\r\n\r\nE;EOF")
+
+    reader = PiDbReader(str(file_path))
+    assert reader.line_count() == 4
+    assert reader.line(0) == "PILPXIDB004;40-190-002,1000000,1.01"
+    assert reader.line(2) == ""
+    assert reader.line(3) == "E;EOF"
+
+def test_reader_empty(tmp_path):
+    file_path = tmp_path / "empty.db"
+    file_path.write_bytes(b"")
+    reader = PiDbReader(str(file_path))
+    assert reader.line_count() == 0
+    assert list(reader.iter_records()) == []
+
+def test_reader_records_match_text():
+    for file_path in glob.glob(os.path.join(DATA_DIR, "*.db")):
+        with open(file_path) as file:
+            assert list(PiDbReader(file_path).iter_records()) == list(iter_records(file))
+
+def test_open_reader_shared(tmp_path):
+    file_path = tmp_path / "card.db"
+    file_path.write_bytes(b"G;7\n")
+    reader = open_reader(str(file_path))
+    assert open_reader(str(file_path)) is reader
+
+    file_path.write_bytes(b"G;8\nE;EOF\n")
+    assert open_reader(str(file_path)).line(0) == "G;8"
+
+def test_card_view_remaps_rewritten_file(tmp_path):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from pypirccua.pidbcardview import PiDbCardView
+
+    app = QApplication.instance() or QApplication([])
+    file_path = tmp_path / "card.db"
+    file_path.write_bytes(b"G;7\nS;1;4;4;\nE;EOF\n")
+    view = PiDbCardView()
+    view.load_file(str(file_path))
+    reader = view.reader
+    assert reader.is_mapped() and open_reader(str(file_path)) is reader
+
+    # truncated in place by a station, the view is given a fresh mapping
+    with open(file_path, "r+b") as file:
+        file.truncate(4)
+    assert not reader.is_current()
+    view.on_file_changed(str(file_path))
+    assert view.reader is not reader and view.count() == 1 and view.line_text(0) == "G;7"
+
+    os.remove(file_path)
+    view.on_file_changed(str(file_path))
+    assert view.reader is None and view.file_path is None
+
+def test_tokenize_relay_bytes():
+    assert tokenize_relay_bytes(b"R;L;S1BIT12;345;") == ("L", 1, 12, 345)
+    assert tokenize_relay_bytes(b"R;X;S1BIT12;345;") is None
+    assert tokenize_relay_bytes(b"R;L;S1BIT12;") is None
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbsynth.py
+# Description:  Synthetic card generator tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import io
+
+import pytest
+import numpy as np
+
+from pypirccua.pidbcard import PiDbCard
+from pypirccua.pidbsynth import write_synth, write_synth_file, synth_counts, parse_geometry, DISTRIBUTIONS
+
+def test_synth_card(tmp_path):
+    file_path = str(tmp_path / "synth.db")
+    write_synth_file(file_path, [(12, 8), (4, 1)], [64, 32], seed=7, card_sn="410155", generation=5)
+
+    data = PiDbCard(file_path).parse_file()
+    assert data["header"]["card_sn"] == "410155"
+    assert data["generation"] == 5
+    assert [(s["rows"], s["cols"]) for s in data["subunits"]] == [(12, 8), (4, 1)]
+    assert len(data["subunits"][0]["relays"]) == 96
+    assert len(data["subunits"][1]["relays"]) == 4
+    assert [len(loop["relays"]) for loop in data["physical_layers"]] == [64, 32]
+    assert (63, 0) in data["physical_layers"][0]["relays"]  # physical bits are 0-based
+
+def test_synth_is_seedable():
+    first, second, other = io.StringIO(), io.StringIO(), io.StringIO()
+    write_synth(first, [(10, 10)], seed=1, cards=2)
+    write_synth(second, [(10, 10)], seed=1, cards=2)
+    write_synth(other, [(10, 10)], seed=2, cards=2)
+    assert first.getvalue() == second.getvalue() != other.getvalue()
+    assert first.getvalue().count("PILPXIDB004;") == 2
+
+def test_synth_fill_and_distributions():
+    text = io.StringIO()
+    write_synth(text, [(100, 100)], seed=3, fill=0.25)
+    relays = text.getvalue().count("\nR;")
+    assert 2000 < relays < 3000
+
+    rng = np.random.default_rng(0)
+    for distribution in DISTRIBUTIONS:
+        counts = synth_counts(rng, 1000, distribution, max_count=500)
+        assert counts.max() <= 500
+
+    assert parse_geometry("552x8") == (552, 8)
+    assert parse_geometry("12") == (12, 1)
+    with pytest.raises(ValueError):
+        parse_geometry("0x4")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_dbwatch.py
+# Description:  Folder watch tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+
+import pytest
+
+from pypirccua.pidbwatch import PiDbWatch, card_alerts, watch_card
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+CARD_FILE = os.path.join(DATA_DIR, "40-560-121-M-552X8,1000000,1.01.db")
+
+def test_card_alerts():
+    card_data = {
+        "subunits": [{"layer_id": 1, "rows": 2, "cols": 3, "relays": {(0, 1): 50, (1, 2): 500, (1, 0): 5}}],
+        "physical_layers": [{"loop_id": 0, "rows": 4, "cols": 1, "relays": {(3, 0): 20}}],
+    }
+    assert card_alerts(card_data, [10, 100]) == [
+        ("L", 1, 2, 50, "warning"),  # R;L;S1BIT2
+        ("L", 1, 6, 500, "critical"),
+        ("P", 0, 3, 20, "warning"),  # R;P;L0BIT3
+    ]
+
+def test_watch_card():
+    file_path, stats, alerts, error = watch_card(CARD_FILE, [4606, 4607])
+    assert error is None
+    assert (stats["card_id"], stats["generation"], stats["relays"], stats["max_count"]) == ("40-560-121-M", 75, 9216, 4608)
+    assert (stats["warning"], stats["critical"]) == (2, 2)
+    assert len(alerts) == 4
+
+    assert watch_card(__file__)[3] == "missing PILPXIDB header"
+
+def test_watch_polling(tmp_path):
+    shutil.copy(CARD_FILE, tmp_path / "old.db")
+    watch = PiDbWatch(str(tmp_path), [4606, 4607], use_inotify=False)
+    watch.skip_existing()
+    assert watch.mode() == "polling"
+    assert watch.poll() == []
+
+    shutil.copy(CARD_FILE, tmp_path / "a.db")
+    (tmp_path / "bad.db").write_text("not a card\n")
+    assert watch.poll() == []  # seen once, may still be written
+    ready = watch.poll()
+    assert ready == [str(tmp_path / "a.db"), str(tmp_path / "bad.db")]
+
+    records = list(watch.process(ready))
+    assert [record["event"] for record in records] == ["card"] + ["alert"] * 4 + ["error"]
+    assert records[-1]["file"] == str(tmp_path / "bad.db")
+    assert watch.poll() == []  # parsed files (and failures) are not reparsed
+
+    # a new dump of the same card only repeats the card statistics
+    shutil.copy(CARD_FILE, tmp_path / "b.db")
+    watch.poll()
+    records = list(watch.process(watch.poll()))
+    assert [record["event"] for record in records] == ["card"]
+
+def test_watch_inotify(tmp_path):
+    watch = PiDbWatch(str(tmp_path), use_inotify=True)
+    if watch.mode() != "inotify":
+        pytest.skip("inotify is not available")
+    try:
+        os.makedirs(tmp_path / "station")
+        shutil.copy(CARD_FILE, tmp_path / "station" / "a.db")
+        (tmp_path / "notes.txt").write_text("ignored\n")
+
+        files = []
+        for _ in range(10):
+            files += watch.wait_changes(timeout=0.5)
+            if files:
+                break
+        assert files == [str(tmp_path / "station" / "a.db")]
+        records = list(watch.process(files))
+        assert records[0]["relays"] == 9216
+        assert watch.changed(files) == []
+    finally:
+        watch.close()
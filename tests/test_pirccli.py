@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_pirccli.py
+# Description:  PiRc cli tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import csv
+
+from pypirccua.pirccli import pirc_find_db_files, pirc_fleet_stats, FLEET_COLUMNS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def test_find_db_files():
+    files = pirc_find_db_files(DATA_DIR)
+    assert len(files) == 6
+    assert files == pirc_find_db_files(os.path.join(DATA_DIR, "*.db"))
+
+def test_fleet_stats(tmp_path):
+    bad_file = tmp_path / "bad.db"
+    bad_file.write_text("not a card\n")
+    good_file = tmp_path / "good.db"
+    good_file.write_text(open(os.path.join(DATA_DIR, "G3_60-891-006,410155,1.00.db")).read())
+
+    output = tmp_path / "fleet.csv"
+    assert pirc_fleet_stats(str(tmp_path), str(output), workers=2) == 1  # bad.db is reported, batch goes on
+
+    with open(output, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == FLEET_COLUMNS
+    assert len(rows) == 1 + 14 + 9  # 14 subunits, 9 loops
+    assert rows[1][1:6] == ["60-891-006", "410155", "3", "Subunit", "1"]
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_profiler.py
+# Description:  Profiler tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+
+from pypirccua.piprofiler import PiProfiler, profiler
+from pypirccua.pidbcard import PiDbCard
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pypirccua", "data")
+
+def test_profiler_timers_and_counters(tmp_path):
+    local = PiProfiler(enabled=True)
+    for _ in range(3):
+        with local.timer("block"):
+            pass
+    local.count("lines", 10)
+    local.count("lines", 5)
+
+    summary = local.summary()
+    assert summary["timers"]["block"]["calls"] == 3
+    assert summary["counters"] == {"lines": 15}
+    assert local.summary_lines()[2].startswith("block")
+    assert local.status_text(["block", "missing"]).startswith("block ")
+
+    local.save_json(str(tmp_path / "profile.json"))
+    with open(tmp_path / "profile.json") as file:
+        assert json.load(file)["counters"]["lines"] == 15
+
+def test_profiler_disabled_is_noop():
+    local = PiProfiler()
+    with local.timer("block"):
+        local.count("lines")
+    assert local.summary() == {"timers": {}, "counters": {}}
+
+def test_parse_file_is_profiled():
+    enabled = profiler.enabled
+    profiler.reset()
+    profiler.enable()
+    try:
+        PiDbCard(os.path.join(DATA_DIR, "40-190-002,1000000,1.01.db")).parse_file()
+        summary = profiler.summary()
+    finally:
+        profiler.enable(enabled)
+        profiler.reset()
+
+    assert summary["timers"]["parse_file"]["calls"] == 1
+    assert summary["counters"]["lines parsed"] == 407
+    assert summary["counters"]["relays subunits"] > 0
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_startup.py
+# Description:  Import time (startup) budget tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import subprocess
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DATA_DIR = os.path.join(ROOT_DIR, "pypirccua", "data")
+
+# cumulative import time of 'pypirccua stats' (measured ~80 ms, numpy included)
+STARTUP_BUDGET_MS = 120
+
+# modules the cli and parser core must not import
+GUI_MODULES = ("PyQt5", "matplotlib")
+
+# archive and decompression modules, only imported for a compressed or archived card
+# (argparse loads shutil and with it bz2/lzma for the cli help formatter)
+ARCHIVE_MODULES = ("tarfile", "zipfile", "gzip", "zstandard")
+DECOMPRESS_MODULES = ARCHIVE_MODULES + ("lzma", "bz2")
+
+def import_times(*args):
+    """Run python -X importtime, returns {module: self time in us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us)
+    return modules
+
+def gui_imports(modules):
+    return [name for name in modules if name.split(".")[0] in GUI_MODULES]
+
+def banned_imports(modules, banned):
+    return [name for name in modules if name.split(".")[0] in banned]
+
+def test_stats_startup_budget():
+    file_path = os.path.join(DATA_DIR, "G3_60-891-006,410155,1.00.db")
+    modules = import_times("-m", "pypirccua", "stats", file_path)
+
+    assert "pypirccua.pirccli" in modules
+    assert gui_imports(modules) == []
+    assert banned_imports(modules, ARCHIVE_MODULES) == []
+    assert sum(modules.values()) / 1000 < STARTUP_BUDGET_MS
+
+def test_plain_card_skips_decompressors():
+    file_path = os.path.join(DATA_DIR, "G3_60-891-006,410155,1.00.db")
+    modules = import_times("-c", f"from pypirccua.pidbcard import PiDbCard; PiDbCard({file_path!r}).parse_file()")
+
+    assert "pypirccua.pidbarchive" in modules
+    assert banned_imports(modules, DECOMPRESS_MODULES) == []
+
+def test_parser_core_is_pure_python():
+    modules = import_times("-c", "import pypirccua.pidbcard")
+
+    assert "pypirccua.pidbcard" in modules
+    assert gui_imports(modules) == []
+    assert "numpy" not in modules
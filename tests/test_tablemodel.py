@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# Copyright (C) 2024, Ondrej Vanka
+#
+# File:         test_tablemodel.py
+# Description:  Relay count table model tests
+# Version:      1.00
+# Author:       Ondrej Vanka @aknavj <ondrej@vanka.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtCore import Qt
+
+import numpy as np
+
+from pypirccua.pitablemodel import PiTableModel
+from pypirccua.heatmaprange import HEATMAP_BRUSHES, heatmap_levels, get_heatmap_color, days_levels, FORECAST_RANGES
+
+def make_model():
+    layer = {"rows": 3, "cols": 2, "relays": {(0, 0): 5, (1, 1): 50, (2, 0): 500}}
+    return PiTableModel(layer, [10, 100])
+
+def test_model_data():
+    model = make_model()
+
+    assert (model.rowCount(), model.columnCount()) == (3, 2)
+    assert model.data(model.index(1, 1)) == "50"
+    assert model.data(model.index(0, 1)) is None  # no relay record
+    assert model.headerData(1, Qt.Horizontal) == "Col 2"
+    assert model.headerData(2, Qt.Vertical) == "Row 3"
+
+def test_model_heatmap():
+    model = make_model()
+
+    assert model.data(model.index(0, 0), Qt.BackgroundRole).color().name() == "#00ff00"
+    assert model.data(model.index(1, 1), Qt.BackgroundRole).color().name() == "#ffff00"
+    assert model.data(model.index(2, 0), Qt.BackgroundRole).color().name() == "#ff0000"
+
+    model.set_ranges([1000, 2000])
+    assert model.data(model.index(2, 0), Qt.BackgroundRole).color().name() == "#00ff00"
+
+def test_heatmap_levels_match_colors():
+    counts = np.array([[0, 1, 10], [11, 100, 101]], dtype=np.uint32)
+    for ranges in ([10, 100], [100, 10]):
+        levels = heatmap_levels(counts, ranges)
+        for value, level in zip(counts.ravel(), levels.ravel()):
+            assert HEATMAP_BRUSHES[level].color() == get_heatmap_color(int(value), ranges)
+
+def test_days_levels():
+    days = np.array([[0, 90, 91], [365, 366, 36500]], dtype=np.int64)
+    assert days_levels(days, FORECAST_RANGES).tolist() == [[3, 3, 2], [2, 1, 1]]
+
+    layer = {"rows": 1, "cols": 2, "relays": {}, "counts": days[0:1, 1:3], "mask": np.ones((1, 2), dtype=bool)}
+    model = PiTableModel(layer, FORECAST_RANGES, levels_func=days_levels)
+    assert model.data(model.index(0, 0), Qt.BackgroundRole).color().name() == "#ff0000"